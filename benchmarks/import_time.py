@@ -0,0 +1,51 @@
+"""
+Measure the cold import time of pyteamcity entry points
+
+Every import runs in a fresh interpreter; the median of `--runs` runs is
+reported, e.g.
+
+    python benchmarks/import_time.py --runs 20
+"""
+
+import argparse
+import subprocess
+import sys
+
+STATEMENTS = [
+    'pass',
+    'import pyteamcity',
+    'import pyteamcity.future',
+    'from pyteamcity.future import TeamCity',
+    'from pyteamcity import TeamCity',
+]
+
+
+def time_import(statement):
+    code = ('import time\n'
+            't = time.time()\n'
+            '%s\n'
+            'print(time.time() - t)' % statement)
+    output = subprocess.check_output([sys.executable, '-c', code])
+    return float(output)
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    for statement in STATEMENTS:
+        timings = [time_import(statement) for _ in range(args.runs)]
+        print('%8.1f ms  %s' % (median(timings) * 1000, statement))
+
+
+if __name__ == '__main__':
+    main()
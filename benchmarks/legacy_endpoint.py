@@ -0,0 +1,53 @@
+"""
+Measure the client-side overhead of a legacy endpoint call
+
+The session answers every request from memory, so the timings only cover
+URL building, request preparation and response decoding, e.g.
+
+    python benchmarks/legacy_endpoint.py --number 20000
+"""
+
+import argparse
+import json
+import timeit
+
+import requests
+
+from pyteamcity.legacy import TeamCity
+
+
+class InMemorySession(object):
+    """Stands in for `requests.Session`, returning the same response"""
+
+    def __init__(self, data):
+        self.response = requests.Response()
+        self.response.status_code = 200
+        self.response.headers['Content-Type'] = 'application/json'
+        self.response._content = json.dumps(data).encode('utf-8')
+
+    def send(self, request):
+        return self.response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--number', type=int, default=10000)
+    args = parser.parse_args()
+
+    tc = TeamCity('user', 'password', 'teamcity.example.com', 8111,
+                  session=InMemorySession({'id': 42, 'state': 'finished'}))
+    cases = [
+        ('get_build_by_build_id(url)',
+         lambda: tc.get_build_by_build_id(42, return_type='url')),
+        ('get_build_by_build_id',
+         lambda: tc.get_build_by_build_id(42)),
+        ('get_all_builds(url)',
+         lambda: tc._get_all_builds(start=100, return_type='url')),
+    ]
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=args.number, repeat=3))
+        print('%8.2f us/call  %s' % (seconds / args.number * 1e6, name))
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,30 @@
-from .legacy import *
+import sys
+
+__all__ = [
+    'ConnectionError',
+    'GET',
+    'HTTPError',
+    'POST',
+    'TTLCache',
+    'TeamCity',
+    'endpoint',
+]
+
+if sys.version_info >= (3, 7):
+    # The legacy client (and requests with it) is only imported on first
+    # access of one of its names, so `import pyteamcity.future` stays cheap
+    def __getattr__(name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        import importlib
+        legacy = importlib.import_module('.legacy', __name__)
+        try:
+            return getattr(legacy, name)
+        except AttributeError:
+            raise AttributeError(
+                'module %r has no attribute %r' % (__name__, name))
+
+    def __dir__():
+        return sorted(set(globals()) | set(__all__))
+else:
+    from .legacy import *  # noqa
@@ -2,5 +2,30 @@
 @todo: docstrings for classes
 """
 
-from .page_joiner import PageJoiner  # noqa
-from .teamcity import TeamCity  # noqa
+import sys
+
+__all__ = ['FederatedTeamCity', 'PageJoiner', 'TeamCity']
+
+if sys.version_info >= (3, 7):
+    _LAZY = {
+        'FederatedTeamCity': 'federated',
+        'PageJoiner': 'page_joiner',
+        'TeamCity': 'teamcity',
+    }
+
+    def __getattr__(name):
+        if name not in _LAZY:
+            raise AttributeError(
+                'module %r has no attribute %r' % (__name__, name))
+        import importlib
+        module = importlib.import_module('.' + _LAZY[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(__all__))
+else:
+    from .federated import FederatedTeamCity  # noqa
+    from .page_joiner import PageJoiner  # noqa
+    from .teamcity import TeamCity  # noqa
@@ -1,7 +1,11 @@
+import collections
+
 import requests
 
+from .core.concurrency import run_concurrently
 from .core.parameter import Parameter
 from .core.queryset import QuerySet
+from .core.utils import raise_on_status
 
 from .agent_pool import AgentPoolQuerySet
 
@@ -107,6 +111,8 @@ class Agent(object):
         return prepped
 
     def _get_url(self):
+        if self.href:
+            return self.teamcity.base_base_url + self.href
         return AgentQuerySet(self.teamcity).get(id=self.id, just_url=True)
 
     def enable(self, dry_run=False):
@@ -124,9 +130,64 @@ class Agent(object):
         return self.teamcity.session.send(req)
 
 
+class AgentUtilization(object):
+    """
+    Busy/idle snapshot of a set of agents
+
+    An agent is busy when it runs a build and idle when it could run one
+    (enabled, connected and authorized) but does not; the others are
+    unavailable. `by_build_type` counts busy agents per running build type
+    id and `by_pool` maps each pool name to a counter of busy, idle and
+    unavailable agents.
+    """
+
+    def __init__(self, agents):
+        self.agents = agents
+        self.busy = []
+        self.idle = []
+        self.unavailable = []
+        self.by_build_type = collections.Counter()
+        self.by_pool = collections.defaultdict(collections.Counter)
+        for agent in agents:
+            build = agent._data_dict.get('build')
+            pool = agent._data_dict.get('pool', {}).get('name')
+            if build:
+                state = 'busy'
+                self.by_build_type[build.get('buildTypeId')] += 1
+                self.busy.append(agent)
+            elif agent.enabled and agent.connected and agent.authorized:
+                state = 'idle'
+                self.idle.append(agent)
+            else:
+                state = 'unavailable'
+                self.unavailable.append(agent)
+            self.by_pool[pool][state] += 1
+
+    def __repr__(self):
+        return '<%s.%s: busy=%r idle=%r unavailable=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.num_busy,
+            self.num_idle,
+            len(self.unavailable))
+
+    @property
+    def num_total(self):
+        return len(self.agents)
+
+    @property
+    def num_busy(self):
+        return len(self.busy)
+
+    @property
+    def num_idle(self):
+        return len(self.idle)
+
+
 class AgentQuerySet(QuerySet):
     uri = '/app/rest/agents/'
     _entity_factory = Agent
+    _list_key = 'agent'
 
     def filter(self, id=None, name=None,
                connected=None, authorized=None, enabled=None):
@@ -145,3 +206,61 @@ class AgentQuerySet(QuerySet):
     def __iter__(self):
         return (self._entity_factory.from_dict(d, self)
                 for d in self._data()['agent'])
+
+    def utilization(self):
+        """
+        `AgentUtilization` of the matching agents, including the build each
+        one is running, from a single projected request
+        """
+        query_set = self._clone().fields(
+            'count,nextHref,agent(id,name,href,enabled,connected,authorized,'
+            'pool(id,name),build(id,buildTypeId,state))')
+        agents = [self._entity_factory.from_dict(d, query_set)
+                  for page in query_set._pages()
+                  for d in page.get('agent', [])]
+        return AgentUtilization(agents)
+
+    def _agents_for_update(self):
+        query_set = self._clone().fields('count,nextHref,agent(id,name,href)')
+        return [self._entity_factory.from_dict(d, query_set)
+                for page in query_set._pages()
+                for d in page.get('agent', [])]
+
+    def _send_all(self, requests_by_agent, dry_run, workers):
+        if dry_run:
+            return [req for _, req in requests_by_agent]
+
+        def send(item):
+            res = self.teamcity.session.send(item[1])
+            raise_on_status(res)
+            return res
+
+        results = run_concurrently(send, requests_by_agent, workers=workers,
+                                   rate_limiter=self.teamcity.rate_limiter)
+        for result in results:
+            result.item = result.item[0]
+        return results
+
+    def update(self, enabled=None, dry_run=False, workers=8):
+        """
+        Enable or disable all matching agents concurrently
+
+        Returns a `Result` per agent (holding the response or the error), or
+        the list of prepared requests with `dry_run=True`.
+        """
+        if enabled is None:
+            raise ValueError('Nothing to update: pass enabled=True or False')
+        enabled_str = 'true' if enabled else 'false'
+        requests_by_agent = [
+            (agent, agent.set_enabled(enabled_str, dry_run=True))
+            for agent in self._agents_for_update()]
+        return self._send_all(requests_by_agent, dry_run, workers)
+
+    def delete(self, dry_run=False, workers=8):
+        """
+        Delete all matching agents concurrently; see `update`
+        """
+        requests_by_agent = [
+            (agent, agent.delete(dry_run=True))
+            for agent in self._agents_for_update()]
+        return self._send_all(requests_by_agent, dry_run, workers)
@@ -47,6 +47,7 @@ class AgentPool(object):
 class AgentPoolQuerySet(QuerySet):
     uri = '/app/rest/agentPools/'
     _entity_factory = AgentPool
+    _list_key = 'agentPool'
 
     def filter(self, id=None, name=None):
         if id is not None:
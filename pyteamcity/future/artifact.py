@@ -3,9 +3,46 @@ import os
 
 from . import exceptions
 from .core.utils import parse_date_string, raise_on_status
+from .core.zip_stream import iter_zip_entries
+
+
+def _makedirs(path):
+    if path and not os.path.isdir(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+
+
+def _safe_join(dest, name):
+    path = os.path.normpath(os.path.join(dest, name))
+    # Compare absolute paths: `dest` may be relative, e.g. '.'
+    root = os.path.join(os.path.abspath(dest), '')
+    if os.path.isabs(name) or not os.path.abspath(path).startswith(root):
+        raise exceptions.ArchiveError(
+            'Refusing to write %r outside of %r' % (name, dest))
+    return path
+
+
+def _tee(chunks, f):
+    """
+    Yield `chunks`, writing each to the file `f` on the way
+    """
+    for chunk in chunks:
+        f.write(chunk)
+        yield chunk
 
 
 class Artifact(object):
+    # `download(mode='auto')` switches to archive mode for directories with
+    # at least `archive_min_files` files whose average size is at most
+    # `archive_max_average_size` bytes; the per-request latency dominates
+    # for those, while large files are better fetched individually.
+    archive_min_files = 10
+    archive_max_average_size = 1024 * 1024
+    chunk_size = 64 * 1024
+
     def __init__(self, build, path=''):
         self.build = build
         self.path = path
@@ -61,15 +98,38 @@ class Artifact(object):
             self.name,
             self.size)
 
+    def _cache_key(self, file_data=None):
+        teamcity = self.build.build_query_set.teamcity
+        cache = teamcity.artifact_cache
+        if cache is None or self.build.state != 'finished':
+            return None
+        if file_data is None:
+            file_data = self._data
+            path = self.path
+        else:
+            path = file_data.get('fullName', file_data['name'])
+        return cache.key(server=teamcity.base_base_url,
+                         build_id=self.build.id,
+                         path=path,
+                         size=file_data.get('size'),
+                         modification_time=file_data.get('modificationTime'))
+
     def content(self):
         if not self.isfile():
             raise exceptions.IllegalOperation(
                 'Calling the `content` method on a non-file artifact'
                 ' (%r) is not allowed' % self)
         teamcity = self.build.build_query_set.teamcity
+        key = self._cache_key()
+        if key is not None:
+            data = teamcity.artifact_cache.get(key)
+            if data is not None:
+                return data
         url = teamcity.base_base_url + self.content_href
         res = teamcity.session.get(url)
         raise_on_status(res)
+        if key is not None:
+            teamcity.artifact_cache.put(key, res.content)
         return res.content
 
     def get_artifact_by_path(self, path):
@@ -105,3 +165,154 @@ class Artifact(object):
 
     def dirs(self, pattern=None):
         return [x for x in self.listdir(pattern) if x.isdir()]
+
+    def list_files(self, pattern=None):
+        """
+        Metadata of all files below this artifact, from one recursive listing
+        """
+        teamcity = self.build.build_query_set.teamcity
+        url = self.build.api_url + '/artifacts/children/' + self.path
+        locator = 'recursive:true'
+        if pattern is not None:
+            locator += ',pattern:(%s)' % pattern
+        res = teamcity.session.get(url, params={'locator': locator})
+        raise_on_status(res)
+        data = res.json()
+        return [f for f in data.get('file', []) if 'content' in f]
+
+    def _relative_name(self, file_data):
+        name = file_data.get('fullName', file_data['name'])
+        prefix = self.path.strip('/')
+        if prefix and name.startswith(prefix + '/'):
+            name = name[len(prefix) + 1:]
+        return name
+
+    def _stream_to_file(self, href, path, cache_key=None):
+        teamcity = self.build.build_query_set.teamcity
+        cache = teamcity.artifact_cache
+        if cache_key is not None and cache.materialize(cache_key, path):
+            return path
+
+        url = teamcity.base_base_url + href
+        res = teamcity.session.get(url, stream=True)
+        raise_on_status(res)
+        chunks = res.iter_content(self.chunk_size)
+        if cache_key is not None:
+            cache.put_stream(cache_key, chunks)
+            if cache.materialize(cache_key, path):
+                return path
+            # Evicted straight away because it alone exceeds the budget
+            res = teamcity.session.get(url, stream=True)
+            raise_on_status(res)
+            chunks = res.iter_content(self.chunk_size)
+
+        _makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        return path
+
+    def choose_download_mode(self, files):
+        if len(files) < self.archive_min_files:
+            return 'file'
+        total_size = sum(f.get('size', 0) for f in files)
+        if total_size / len(files) > self.archive_max_average_size:
+            return 'file'
+        return 'archive'
+
+    def download(self, dest, pattern=None, mode='auto'):
+        """
+        Download this artifact to `dest` and return the written paths
+
+        A file artifact is written to `dest`, or into it if `dest` is an
+        existing directory. A directory artifact is mirrored below `dest`,
+        restricted to the files matching the TeamCity `pattern` if given.
+        `mode` is 'file' to fetch files one by one, 'archive' to fetch one
+        zip and extract it as it arrives, or 'auto' to pick one of these
+        from the file count and sizes in the listing. With an artifact
+        cache and a finished build, files the cache already has are taken
+        from it and the others are added to it, in either mode.
+        """
+        if mode not in ('auto', 'file', 'archive'):
+            raise ValueError('Unknown download mode: %r' % mode)
+
+        if self.isfile():
+            if os.path.isdir(dest):
+                dest = os.path.join(dest, self.name)
+            return [self._stream_to_file(self.content_href, dest,
+                                         cache_key=self._cache_key())]
+
+        teamcity = self.build.build_query_set.teamcity
+        caching = (teamcity.artifact_cache is not None and
+                   self.build.state == 'finished')
+        if mode == 'archive' and not caching:
+            return self.download_archive(dest, pattern=pattern)
+
+        files = self.list_files(pattern)
+        paths = []
+        if caching:
+            # Only what the cache does not have yet needs fetching
+            missing = []
+            for f in files:
+                path = _safe_join(dest, self._relative_name(f))
+                if teamcity.artifact_cache.materialize(
+                        self._cache_key(file_data=f), path):
+                    paths.append(path)
+                else:
+                    missing.append(f)
+            files = missing
+            if not files:
+                return paths
+        if mode == 'auto':
+            mode = self.choose_download_mode(files)
+        if mode == 'archive':
+            return paths + self.download_archive(
+                dest, pattern=pattern, files=files if caching else None)
+
+        for f in files:
+            path = _safe_join(dest, self._relative_name(f))
+            paths.append(self._stream_to_file(
+                f['content']['href'], path,
+                cache_key=self._cache_key(file_data=f)))
+        return paths
+
+    def download_archive(self, dest, pattern=None, files=None):
+        """
+        Download this directory as a single zip and extract it below `dest`
+        while it is being received. Returns the written paths.
+
+        If `files` (entries of `list_files`) is given, only those are
+        extracted, and also stored in the artifact cache as they are.
+        """
+        teamcity = self.build.build_query_set.teamcity
+        url = self.build.api_url + '/artifacts/archived/' + self.path
+        params = {}
+        if pattern is not None:
+            params['locator'] = 'pattern:(%s)' % pattern
+        res = teamcity.session.get(url, params=params, stream=True)
+        raise_on_status(res)
+
+        wanted = None
+        if files is not None:
+            wanted = dict((self._relative_name(f), f) for f in files)
+        paths = []
+        _makedirs(dest)
+        for entry, data in iter_zip_entries(res.iter_content(self.chunk_size)):
+            path = _safe_join(dest, entry.name)
+            if entry.isdir():
+                _makedirs(path)
+                continue
+            if wanted is not None and entry.name not in wanted:
+                continue
+            _makedirs(os.path.dirname(path))
+            with open(path, 'wb') as f:
+                key = None
+                if wanted is not None:
+                    key = self._cache_key(file_data=wanted[entry.name])
+                if key is not None:
+                    teamcity.artifact_cache.put_stream(key, _tee(data, f))
+                else:
+                    for piece in data:
+                        f.write(piece)
+            paths.append(path)
+        return paths
@@ -0,0 +1,210 @@
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+
+# ioctl request number of FICLONE on Linux (see ioctl_ficlone(2))
+FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    import fcntl
+
+    with open(src, 'rb') as fsrc:
+        with open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+
+class ArtifactCache(object):
+    """
+    Local store for artifacts of finished builds, which never change
+
+    Entries are keyed by server, build id, artifact path, size and
+    modification time, and kept as plain files below `root` so that every
+    process on the host shares them. When `max_size` (in bytes) is set, the
+    least recently used entries are evicted once the store grows past it,
+    down to `evict_to` of `max_size`. The size is tracked as entries are
+    added, so the store is only scanned when it is over budget.
+
+    `link_mode` decides how entries are materialized into a destination:
+    'reflink' (copy-on-write clone where the file system supports it),
+    'copy', or 'hardlink' (fastest, but the destination shares the cached
+    inode: an in-place edit there corrupts the cache, so only use it for
+    read-only destinations). Hard links and reflinks fall back to a plain
+    copy when they are not possible.
+    """
+
+    link_modes = ('hardlink', 'reflink', 'copy')
+    evict_to = 0.9
+
+    def __init__(self, root, max_size=None, link_mode='reflink'):
+        if link_mode not in self.link_modes:
+            raise ValueError('Unknown link mode: %r' % link_mode)
+        self.root = root
+        self.max_size = max_size
+        self.link_mode = link_mode
+        self._size = None
+        if not os.path.isdir(root):
+            os.makedirs(root)
+
+    def __repr__(self):
+        return '<%s.%s: root=%r max_size=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.root,
+            self.max_size)
+
+    @staticmethod
+    def key(server, build_id, path, size, modification_time):
+        parts = [server, build_id, path.lstrip('/'), size, modification_time]
+        text = '\0'.join(str(part) for part in parts)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key[2:])
+
+    def get_path(self, key):
+        """
+        Path of the cached entry for `key`, or None; marks it as recently used
+        """
+        path = self._path(key)
+        try:
+            os.utime(path, None)
+        except OSError:
+            return None
+        return path
+
+    def get(self, key):
+        path = self.get_path(key)
+        if path is None:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def put(self, key, data):
+        return self.put_stream(key, [data])
+
+    def put_stream(self, key, chunks):
+        """
+        Store the byte strings in `chunks` under `key` and return its path
+
+        The data is written to a temporary file that is renamed into place,
+        so concurrent readers never see a partial entry.
+        """
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            replaced = self._entry_size(path)
+            os.rename(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        if self.max_size is not None:
+            if self._size is None:
+                self.evict()
+            else:
+                self._size += size - replaced
+                if self._size > self.max_size:
+                    self.evict()
+        return path
+
+    @staticmethod
+    def _entry_size(path):
+        try:
+            return os.stat(path).st_size
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return 0
+
+    def materialize(self, key, dest):
+        """
+        Place the cached entry for `key` at `dest`; returns `dest` or None
+        """
+        src = self.get_path(key)
+        if src is None:
+            return None
+        dest_dir = os.path.dirname(dest)
+        if dest_dir and not os.path.isdir(dest_dir):
+            os.makedirs(dest_dir)
+        if os.path.lexists(dest):
+            os.unlink(dest)
+
+        if self.link_mode == 'hardlink':
+            try:
+                os.link(src, dest)
+                return dest
+            except (OSError, AttributeError):
+                pass
+        if self.link_mode in ('hardlink', 'reflink'):
+            try:
+                _reflink(src, dest)
+                return dest
+            except (IOError, OSError, ImportError):
+                pass
+        shutil.copyfile(src, dest)
+        return dest
+
+    def entries(self):
+        """
+        List of `(last_used, size, path)` for all entries, least recently
+        used first
+        """
+        ret = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.startswith('.tmp-'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError as e:
+                    if e.errno == errno.ENOENT:
+                        continue
+                    raise
+                ret.append((st.st_mtime, st.st_size, path))
+        ret.sort()
+        return ret
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """
+        Scan the store and, when it is over `max_size`, remove the least
+        recently used entries until it is down to `evict_to` of it
+        """
+        if self.max_size is None:
+            return
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_size:
+            target = self.max_size * self.evict_to
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except OSError as e:
+                    if e.errno != errno.ENOENT:
+                        raise
+                total -= size
+        self._size = total
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.unlink(path)
+        self._size = 0
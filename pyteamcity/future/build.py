@@ -156,10 +156,24 @@ class Build(object):
         raise_on_status(res)
         return self
 
+    def dependency_graph(self, direction='up', depth=None, workers=8,
+                         kind='snapshot'):
+        """
+        `BuildGraph` of the dependencies of this build (`direction='up'`)
+        or of the builds depending on it (`'down'`), following at most
+        `depth` levels of snapshot, artifact or both kinds of dependencies
+        (`kind='snapshot'|'artifact'|'both'`)
+        """
+        from .build_graph import expand_dependency_graph
+        return expand_dependency_graph(self, direction=direction,
+                                       depth=depth, workers=workers,
+                                       kind=kind)
+
 
 class BuildQuerySet(QuerySet):
     uri = '/app/rest/builds/'
     _entity_factory = Build
+    _list_key = 'build'
 
     def filter(self,
                id=None,
@@ -169,6 +183,7 @@ class BuildQuerySet(QuerySet):
                since_build=None, since_date=None, status=None,
                agent_name=None, personal=None,
                canceled=None, failed_to_start=None, running=None,
+               state=None,
                start=None, count=None, lookup_limit=None):
         if id is not None:
             self._add_pred('id', id)
@@ -207,6 +222,8 @@ class BuildQuerySet(QuerySet):
             self._add_pred('failedToStart', failed_to_start)
         if running is not None:
             self._add_pred('running', running)
+        if state is not None:
+            self._add_pred('state', state)
         if start is not None:
             self._add_pred('start', start)
         if count is not None:
@@ -229,3 +246,29 @@ class BuildQuerySet(QuerySet):
     def __iter__(self):
         return (Build.from_dict(d, self, teamcity=self.teamcity)
                 for d in self._data()['build'])
+
+    def sync_to(self, db_path, page_size=1000):
+        """
+        Incrementally mirror the matching builds into the SQLite database
+        at `db_path` and return the `BuildMirror`
+        """
+        from .build_mirror import BuildMirror
+        return BuildMirror(self, db_path, page_size=page_size).sync()
+
+    def statistics(self, keys=None, workers=8):
+        """
+        Statistic values (`BuildDuration`, `TimeSpentInQueue`, ...) of the
+        matching builds as a `BuildStatistics` of NumPy arrays; requires
+        numpy
+        """
+        from .build_statistics import DEFAULT_KEYS, fetch_build_statistics
+        return fetch_build_statistics(self, keys=keys or DEFAULT_KEYS,
+                                      workers=workers)
+
+    def watcher(self, **kwargs):
+        """
+        `BuildWatcher` emitting events for the matching builds
+        """
+        from .build_watcher import BuildWatcher
+
+        return BuildWatcher(self.teamcity, query_set=self, **kwargs)
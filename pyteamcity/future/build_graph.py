@@ -0,0 +1,218 @@
+import collections
+
+from .core.concurrency import run_concurrently
+
+GRAPH_FIELDS = ('count,nextHref,build(id,number,buildTypeId,state,status,'
+                'branchName,href,queuedDate,startDate,finishDate)')
+
+DEPENDENCY_DIMENSIONS = collections.OrderedDict([
+    ('snapshot', 'snapshotDependency'),
+    ('artifact', 'artifactDependency'),
+])
+
+
+class BuildGraph(object):
+    """
+    Dependency graph of builds
+
+    An edge goes from a build to each build it depends on, whichever
+    direction the graph was expanded in; `edge_kind` tells whether it is a
+    snapshot dependency, an artifact dependency or both.
+    `topological_order` lists dependencies before the builds depending on
+    them; `critical_path` is the chain with the longest total run time.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.builds = collections.OrderedDict([(root.id, root)])
+        self._dependencies = collections.defaultdict(set)
+        self._dependents = collections.defaultdict(set)
+        self._edge_kinds = collections.defaultdict(set)
+
+    def __repr__(self):
+        return '<%s.%s: root=%r builds=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.root.id,
+            len(self.builds))
+
+    def __len__(self):
+        return len(self.builds)
+
+    def __iter__(self):
+        return iter(self.builds.values())
+
+    def __contains__(self, build):
+        return getattr(build, 'id', build) in self.builds
+
+    def _add(self, build):
+        """
+        Return the build already in the graph with the id of `build`, adding
+        `build` first if there is none
+        """
+        return self.builds.setdefault(build.id, build)
+
+    def _add_edge(self, build, dependency, kind='snapshot'):
+        self._dependencies[build.id].add(dependency.id)
+        self._dependents[dependency.id].add(build.id)
+        self._edge_kinds[(build.id, dependency.id)].add(kind)
+
+    def edge_kind(self, build, dependency):
+        """
+        `'snapshot'`, `'artifact'` or `'both'` for the edge from `build` to
+        `dependency`; None if there is no such edge
+        """
+        kinds = self._edge_kinds.get((getattr(build, 'id', build),
+                                      getattr(dependency, 'id', dependency)))
+        if not kinds:
+            return None
+        return next(iter(kinds)) if len(kinds) == 1 else 'both'
+
+    def dependencies(self, build):
+        """
+        Builds that `build` directly depends on
+        """
+        return [self.builds[build_id] for build_id in
+                sorted(self._dependencies.get(getattr(build, 'id', build),
+                                              ()))]
+
+    def dependents(self, build):
+        """
+        Builds directly depending on `build`
+        """
+        return [self.builds[build_id] for build_id in
+                sorted(self._dependents.get(getattr(build, 'id', build), ()))]
+
+    @property
+    def edges(self):
+        return [(build_id, dependency_id)
+                for build_id in sorted(self._dependencies)
+                for dependency_id in sorted(self._dependencies[build_id])]
+
+    @property
+    def typed_edges(self):
+        """
+        `edges` as `(build_id, dependency_id, kind)`
+        """
+        return [(build_id, dependency_id,
+                 self.edge_kind(build_id, dependency_id))
+                for build_id, dependency_id in self.edges]
+
+    def topological_order(self):
+        remaining = dict((build_id, len(self._dependencies.get(build_id, ())))
+                         for build_id in self.builds)
+        ready = sorted(build_id for build_id, count in remaining.items()
+                       if count == 0)
+        ret = []
+        while ready:
+            build_id = ready.pop(0)
+            ret.append(self.builds[build_id])
+            for dependent_id in sorted(self._dependents.get(build_id, ())):
+                remaining[dependent_id] -= 1
+                if remaining[dependent_id] == 0:
+                    ready.append(dependent_id)
+        return ret
+
+    @staticmethod
+    def duration(build):
+        """
+        Run time of `build` in seconds; 0 unless it started and finished
+        """
+        if not build.start_date_string or not build.finish_date_string:
+            return 0.0
+        return (build.finish_date - build.start_date).total_seconds()
+
+    def _longest_paths(self):
+        longest = {}
+        previous = {}
+        for build in self.topological_order():
+            best = None
+            for dependency_id in self._dependencies.get(build.id, ()):
+                if best is None or longest[dependency_id] > longest[best]:
+                    best = dependency_id
+            longest[build.id] = self.duration(build) + (
+                longest[best] if best is not None else 0.0)
+            previous[build.id] = best
+        return longest, previous
+
+    def critical_path(self):
+        """
+        Chain of builds, dependencies first, with the longest total run time
+        """
+        longest, previous = self._longest_paths()
+        if not longest:
+            return []
+        build_id = max(sorted(longest), key=lambda k: longest[k])
+        ret = []
+        while build_id is not None:
+            ret.append(self.builds[build_id])
+            build_id = previous[build_id]
+        return list(reversed(ret))
+
+    @property
+    def critical_path_duration(self):
+        longest, _ = self._longest_paths()
+        return max(longest.values()) if longest else 0.0
+
+
+def expand_dependency_graph(build, direction='up', depth=None, workers=8,
+                            kind='snapshot'):
+    """
+    Build the `BuildGraph` of `build` by querying the direct dependencies
+    (`direction='up'`) or dependents (`'down'`) of each frontier of the
+    graph concurrently, down to `depth` levels
+
+    `kind` is `'snapshot'`, `'artifact'` or `'both'`; with `'both'` every
+    build is queried once per kind of dependency.
+    """
+    from .build import Build, BuildQuerySet
+
+    if direction not in ('up', 'down'):
+        raise ValueError("direction must be 'up' or 'down'")
+    if kind == 'both':
+        kinds = list(DEPENDENCY_DIMENSIONS)
+    elif kind in DEPENDENCY_DIMENSIONS:
+        kinds = [kind]
+    else:
+        raise ValueError("kind must be 'snapshot', 'artifact' or 'both'")
+    teamcity = build.teamcity
+    relation = 'to' if direction == 'up' else 'from'
+
+    def fetch(item):
+        build_id, edge_kind = item
+        query_set = BuildQuerySet(teamcity)
+        query_set._add_pred(
+            DEPENDENCY_DIMENSIONS[edge_kind],
+            '(%s:(id:%s),recursive:false)' % (relation, build_id))
+        query_set._add_pred('defaultFilter', 'false')
+        query_set.fields(GRAPH_FIELDS)
+        return [(d, query_set) for page in query_set._pages()
+                for d in page.get('build', [])]
+
+    graph = BuildGraph(build)
+    frontier = [build.id]
+    level = 0
+    while frontier and (depth is None or level < depth):
+        next_frontier = []
+        results = run_concurrently(
+            fetch, [(build_id, edge_kind) for build_id in frontier
+                    for edge_kind in kinds],
+            workers=workers, rate_limiter=teamcity.rate_limiter)
+        for result in results:
+            if not result.ok:
+                raise result.error
+            build_id, edge_kind = result.item
+            node = graph.builds[build_id]
+            for d, query_set in result.value:
+                is_new = d['id'] not in graph.builds
+                other = graph._add(
+                    Build.from_dict(d, query_set, teamcity=teamcity))
+                if direction == 'up':
+                    graph._add_edge(node, other, edge_kind)
+                else:
+                    graph._add_edge(other, node, edge_kind)
+                if is_new:
+                    next_frontier.append(other.id)
+        frontier = next_frontier
+        level += 1
+    return graph
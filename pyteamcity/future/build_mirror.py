@@ -0,0 +1,203 @@
+import sqlite3
+
+import pytz
+
+from . import exceptions
+from .core.utils import parse_date_string
+
+BUILD_FIELDS = ','.join([
+    'id', 'number', 'buildTypeId', 'state', 'status', 'branchName', 'href',
+    'queuedDate', 'startDate', 'finishDate',
+    'buildType(id,name,projectId,projectName)',
+    'agent(id,name)',
+    'triggered(user(id,username,name))',
+])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY,
+    number TEXT,
+    build_type_id TEXT,
+    state TEXT,
+    status TEXT,
+    branch_name TEXT,
+    href TEXT,
+    queued_date TEXT,
+    start_date TEXT,
+    finish_date TEXT,
+    agent_id INTEGER,
+    user_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS builds_build_type_id ON builds (build_type_id);
+CREATE INDEX IF NOT EXISTS builds_state ON builds (state);
+CREATE INDEX IF NOT EXISTS builds_status ON builds (status);
+CREATE INDEX IF NOT EXISTS builds_finish_date ON builds (finish_date);
+CREATE INDEX IF NOT EXISTS builds_agent_id ON builds (agent_id);
+CREATE INDEX IF NOT EXISTS builds_user_id ON builds (user_id);
+
+CREATE TABLE IF NOT EXISTS build_types (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    project_id TEXT,
+    project_name TEXT
+);
+CREATE INDEX IF NOT EXISTS build_types_project_id ON build_types (project_id);
+
+CREATE TABLE IF NOT EXISTS agents (
+    id INTEGER PRIMARY KEY,
+    name TEXT
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT,
+    name TEXT
+);
+CREATE INDEX IF NOT EXISTS users_username ON users (username);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _utc_iso(date_string):
+    if not date_string:
+        return None
+    return parse_date_string(date_string).astimezone(pytz.utc).isoformat()
+
+
+class BuildMirror(object):
+    """
+    Local SQLite copy of the builds matched by a `BuildQuerySet`
+
+    Each `sync` only fetches builds newer than the highest finished build
+    id seen so far (the watermark) with a trimmed `fields=` projection, and
+    re-checks the builds that were still queued or running on the previous
+    sync. Queued builds are mirrored too (`state:any`), so one that finishes
+    after a newer build is not skipped by the watermark.
+    Dates are stored as ISO 8601 strings in UTC so they sort and compare
+    correctly in SQL.
+    """
+
+    def __init__(self, query_set, db_path, page_size=1000):
+        self.query_set = query_set
+        self.teamcity = query_set.teamcity
+        self.db_path = db_path
+        self.page_size = page_size
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(SCHEMA)
+        self.fetched = 0
+        self.rechecked = 0
+
+    def __repr__(self):
+        return '<%s.%s: db_path=%r watermark=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.db_path,
+            self.watermark)
+
+    def close(self):
+        self.connection.close()
+
+    def execute(self, sql, parameters=()):
+        return self.connection.execute(sql, parameters)
+
+    @property
+    def watermark(self):
+        row = self.execute(
+            "SELECT value FROM sync_state WHERE key = 'watermark'").fetchone()
+        return int(row[0]) if row else None
+
+    def _set_watermark(self, build_id):
+        self.execute(
+            "INSERT OR REPLACE INTO sync_state (key, value)"
+            " VALUES ('watermark', ?)", (str(build_id),))
+
+    def _new_builds_query_set(self, watermark):
+        query_set = self.query_set._clone()
+        if ('running' not in query_set._locator and
+                'state' not in query_set._locator):
+            query_set.filter(state='any')
+        if watermark is not None:
+            query_set.filter(since_build='id:%d' % watermark)
+        query_set.filter(count=self.page_size)
+        return query_set.fields('count,nextHref,build(%s)' % BUILD_FIELDS)
+
+    def _upsert(self, d):
+        build_type = d.get('buildType')
+        if build_type:
+            self.execute(
+                'INSERT OR REPLACE INTO build_types'
+                ' (id, name, project_id, project_name) VALUES (?, ?, ?, ?)',
+                (build_type.get('id'), build_type.get('name'),
+                 build_type.get('projectId'), build_type.get('projectName')))
+        agent = d.get('agent') or {}
+        if agent.get('id') is not None:
+            self.execute(
+                'INSERT OR REPLACE INTO agents (id, name) VALUES (?, ?)',
+                (agent['id'], agent.get('name')))
+        user = d.get('triggered', {}).get('user') or {}
+        if user.get('id') is not None:
+            self.execute(
+                'INSERT OR REPLACE INTO users (id, username, name)'
+                ' VALUES (?, ?, ?)',
+                (user['id'], user.get('username'), user.get('name')))
+        self.execute(
+            'INSERT OR REPLACE INTO builds'
+            ' (id, number, build_type_id, state, status, branch_name, href,'
+            '  queued_date, start_date, finish_date, agent_id, user_id)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (d['id'], d.get('number'), d.get('buildTypeId'),
+             d.get('state'), d.get('status'), d.get('branchName'),
+             d.get('href'),
+             _utc_iso(d.get('queuedDate')),
+             _utc_iso(d.get('startDate')),
+             _utc_iso(d.get('finishDate')),
+             agent.get('id'), user.get('id')))
+
+    def _recheck(self, build_id):
+        query_set = self.query_set.__class__(self.teamcity)
+        query_set.fields(BUILD_FIELDS)
+        try:
+            build = query_set.get(id=build_id)
+        except exceptions.HTTPError as e:
+            if e.status_code != 404:
+                raise
+            self.execute('DELETE FROM builds WHERE id = ?', (build_id,))
+            return
+        self._upsert(build._data_dict)
+
+    def sync(self):
+        """
+        Fetch new and still-running builds; returns self
+        """
+        watermark = self.watermark
+        unfinished = [row[0] for row in self.execute(
+            "SELECT id FROM builds WHERE state != 'finished'")]
+
+        seen = set()
+        highest_finished = watermark
+        self.fetched = 0
+        query_set = self._new_builds_query_set(watermark)
+        with self.connection:
+            for page in query_set._pages():
+                for d in page.get('build', []):
+                    self._upsert(d)
+                    seen.add(d['id'])
+                    if d.get('state') == 'finished' and (
+                            highest_finished is None or
+                            d['id'] > highest_finished):
+                        highest_finished = d['id']
+                self.fetched += page.get('count', 0)
+
+            self.rechecked = 0
+            for build_id in unfinished:
+                if build_id not in seen:
+                    self._recheck(build_id)
+                    self.rechecked += 1
+
+            if highest_finished is not None:
+                self._set_watermark(highest_finished)
+        return self
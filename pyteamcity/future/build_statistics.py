@@ -0,0 +1,119 @@
+from .core.concurrency import run_concurrently
+from .core.utils import raise_on_status
+
+DEFAULT_KEYS = ('BuildDuration', 'TimeSpentInQueue', 'FailedTestCount',
+                'ArtifactsSize')
+STATISTICS_FIELDS = 'count,build(id,state,href,statistics(property(name,value)))'
+
+
+def _to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+class BuildStatistics(object):
+    """
+    Statistic values of many builds as NumPy arrays
+
+    `ids` holds the build ids and each column (`statistics[key]`) the
+    values of one statistic in the same order, NaN where a build does not
+    report it.
+    """
+
+    def __init__(self, ids, columns):
+        self.ids = ids
+        self.columns = columns
+
+    def __repr__(self):
+        return '<%s.%s: builds=%r keys=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            len(self.ids),
+            sorted(self.columns))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, key):
+        return self.columns[key]
+
+    def keys(self):
+        return self.columns.keys()
+
+
+def fetch_build_statistics(query_set, keys=DEFAULT_KEYS, workers=8,
+                           chunk_size=100):
+    """
+    Fetch the statistics of the builds matched by `query_set` into a
+    `BuildStatistics`
+
+    The build ids are listed first. Statistics of builds not in
+    `teamcity.statistics_cache` are then requested concurrently,
+    `chunk_size` builds per request, through `item:(id:...)` locators with
+    a nested `statistics` projection; builds for which the server does not
+    expand it are fetched from their `/statistics` resource. Statistics of
+    finished builds never change and are kept in the cache for good.
+    """
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('BuildQuerySet.statistics requires numpy')
+
+    teamcity = query_set.teamcity
+    cache = teamcity.statistics_cache
+
+    listing = query_set._clone().fields('count,nextHref,build(id,state,href)')
+    builds = [d for page in listing._pages() for d in page.get('build', [])]
+    missing = [d for d in builds if d['id'] not in cache]
+
+    def fetch_chunk(chunk):
+        chunk_query_set = query_set.__class__(teamcity)
+        for d in chunk:
+            chunk_query_set._add_pred('item', '(id:%s)' % d['id'])
+        chunk_query_set.fields(STATISTICS_FIELDS)
+        return chunk_query_set._fetch().get('build', [])
+
+    def fetch_one(d):
+        url = teamcity.base_base_url + d['href'] + '/statistics'
+        res = teamcity.session.get(url)
+        raise_on_status(res)
+        return res.json()
+
+    def run(func, items):
+        results = run_concurrently(func, items, workers=workers,
+                                   rate_limiter=teamcity.rate_limiter)
+        for result in results:
+            if not result.ok:
+                raise result.error
+        return results
+
+    values = {}
+    unexpanded = []
+    chunks = [missing[i:i + chunk_size]
+              for i in range(0, len(missing), chunk_size)]
+    for result in run(fetch_chunk, chunks):
+        for d in result.value:
+            if 'statistics' in d and 'property' in d['statistics']:
+                values[d['id']] = d['statistics']['property']
+            else:
+                unexpanded.append(d)
+    for result in run(fetch_one, unexpanded):
+        values[result.item['id']] = result.value.get('property', [])
+
+    states = dict((d['id'], d.get('state')) for d in builds)
+    for build_id, properties in values.items():
+        stats = dict((p['name'], p.get('value')) for p in properties)
+        values[build_id] = stats
+        if states.get(build_id) == 'finished':
+            cache[build_id] = stats
+
+    ids = numpy.array([d['id'] for d in builds], dtype=numpy.int64)
+    columns = {}
+    for key in keys:
+        columns[key] = numpy.array(
+            [_to_number((values.get(d['id']) or cache.get(d['id'], {}))
+                        .get(key)) for d in builds],
+            dtype=numpy.float64)
+    return BuildStatistics(ids, columns)
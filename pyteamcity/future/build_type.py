@@ -1,6 +1,8 @@
 from .core.parameter import Parameter
 from .core.queryset import QuerySet
-from .core.utils import raise_on_status
+from .core.utils import parse_date_string, raise_on_status
+
+LATEST_BUILD_FIELDS = 'id,number,status,state,branchName,finishDate,href'
 
 
 class BuildType(object):
@@ -95,9 +97,57 @@ class BuildType(object):
         raise_on_status(res)
 
 
+class BuildTypeStatus(object):
+    """
+    A build type with its latest build, one row of `latest_status`
+    """
+
+    def __init__(self, build_type_id, name, project_id,
+                 build_id=None, number=None, status=None, state=None,
+                 branch_name=None, finish_date_string=None):
+        self.build_type_id = build_type_id
+        self.name = name
+        self.project_id = project_id
+        self.build_id = build_id
+        self.number = number
+        self.status = status
+        self.state = state
+        self.branch_name = branch_name
+        self.finish_date_string = finish_date_string
+
+    def __repr__(self):
+        return '<%s.%s: build_type_id=%r status=%r build_id=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.build_type_id,
+            self.status,
+            self.build_id)
+
+    @classmethod
+    def from_dict(cls, d):
+        builds = d.get('builds', {}).get('build') or [{}]
+        build = builds[0]
+        return cls(
+            build_type_id=d.get('id'),
+            name=d.get('name'),
+            project_id=d.get('projectId'),
+            build_id=build.get('id'),
+            number=build.get('number'),
+            status=build.get('status'),
+            state=build.get('state'),
+            branch_name=build.get('branchName'),
+            finish_date_string=build.get('finishDate'))
+
+    @property
+    def finish_date(self):
+        if self.finish_date_string:
+            return parse_date_string(self.finish_date_string)
+
+
 class BuildTypeQuerySet(QuerySet):
     uri = '/app/rest/buildTypes/'
     _entity_factory = BuildType
+    _list_key = 'buildType'
 
     def filter(self, id=None, name=None,
                project_id=None, affected_project_id=None,
@@ -122,3 +172,44 @@ class BuildTypeQuerySet(QuerySet):
     def __iter__(self):
         return (BuildType.from_dict(d, self)
                 for d in self._data()['buildType'])
+
+    def latest_status(self, branch=None, project=None, running=None,
+                      page_size=1000):
+        """
+        Latest build of every matching build type, as a list of
+        `BuildTypeStatus` (with `status` None for build types without
+        builds)
+
+        The builds are embedded in the build type list through a nested
+        `builds($locator(count:1,...))` projection, so this costs one
+        request per `page_size` build types. `branch` and `running` are
+        build locator values; by default the latest finished build of the
+        default branch is used. `project` restricts the result to the
+        build types of a project and its subprojects.
+        """
+        build_locator = ['count:1']
+        if branch is not None:
+            build_locator.append('branch:%s' % branch)
+        if running is not None:
+            build_locator.append('running:%s' % running)
+
+        query_set = self._clone()
+        if project is not None:
+            query_set.filter(affected_project_id=project)
+        if page_size:
+            query_set._add_pred('count', page_size)
+        query_set.fields(
+            'count,nextHref,buildType(id,name,projectId,'
+            'builds($locator(%s),build(%s)))' % (
+                ','.join(build_locator), LATEST_BUILD_FIELDS))
+        return [BuildTypeStatus.from_dict(d)
+                for page in query_set._pages()
+                for d in page.get('buildType', [])]
+
+    def parameter_resolver(self):
+        """
+        Load the parameters of all projects, all templates and the matching
+        build types into a `ParameterResolver`
+        """
+        from .parameter_resolver import ParameterResolver
+        return ParameterResolver(self)
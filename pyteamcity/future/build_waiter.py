@@ -0,0 +1,111 @@
+import time
+
+from . import exceptions
+from .build import Build, BuildQuerySet
+
+WAIT_FIELDS = ('id,number,buildTypeId,state,status,branchName,href,'
+               'queuedDate,startDate,finishDate')
+
+
+class BuildWaiter(object):
+    """
+    Wait for many queued or running builds with one query per poll
+
+    Iterating yields a `Build` each time one of them changes state
+    (queued -> running -> finished); `wait()` consumes the iterator and
+    returns the final builds in the order they were given. All pending ids
+    are fetched together through `item:(id:...)` locators, `chunk_size` ids
+    per request, with a minimal `fields=` projection.
+    """
+
+    def __init__(self, teamcity, builds, timeout=None, poll=5.0,
+                 chunk_size=100, sleep=time.sleep, clock=time.time):
+        self.teamcity = teamcity
+        self.ids = [getattr(build, 'id', build) for build in builds]
+        self.timeout = timeout
+        self.poll = poll
+        self.chunk_size = chunk_size
+        self.sleep = sleep
+        self.clock = clock
+        self.states = dict((build_id, None) for build_id in self.ids)
+        self.builds = {}
+
+    def __repr__(self):
+        return '<%s.%s: pending=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            len(self.pending))
+
+    @property
+    def pending(self):
+        return [build_id for build_id in self.ids
+                if self.states[build_id] not in ('finished', 'deleted')]
+
+    def _query_set(self):
+        return BuildQuerySet(self.teamcity).fields(
+            'count,nextHref,build(%s)' % WAIT_FIELDS)
+
+    def _fetch_chunk(self, ids):
+        query_set = self._query_set()
+        for build_id in ids:
+            query_set._add_pred('item', '(id:%s)' % build_id)
+        try:
+            return [d for page in query_set._pages()
+                    for d in page.get('build', [])]
+        except exceptions.HTTPError as e:
+            if e.status_code != 404:
+                raise
+        # At least one build is gone (e.g. removed from the queue); look
+        # them up one by one to find out which
+        ret = []
+        for build_id in ids:
+            try:
+                ret.append(self._query_set().get(id=build_id)._data_dict)
+            except exceptions.HTTPError as e:
+                if e.status_code != 404:
+                    raise
+                self.states[build_id] = 'deleted'
+        return ret
+
+    def _poll_once(self):
+        pending = self.pending
+        build_query_set = BuildQuerySet(self.teamcity)
+        changed = []
+        for i in range(0, len(pending), self.chunk_size):
+            for d in self._fetch_chunk(pending[i:i + self.chunk_size]):
+                build_id = d['id']
+                if build_id not in self.states:
+                    continue
+                build = Build.from_dict(d, build_query_set,
+                                        teamcity=self.teamcity)
+                self.builds[build_id] = build
+                if self.states[build_id] != build.state:
+                    self.states[build_id] = build.state
+                    changed.append(build)
+        return changed
+
+    def __iter__(self):
+        deadline = None
+        if self.timeout is not None:
+            deadline = self.clock() + self.timeout
+        while True:
+            for build in self._poll_once():
+                yield build
+            if not self.pending:
+                return
+            if deadline is not None and self.clock() >= deadline:
+                raise exceptions.WaitTimeout(
+                    'Builds still not finished: %s'
+                    % ', '.join(str(build_id) for build_id in self.pending))
+            self.sleep(self.poll)
+
+    def wait(self):
+        """
+        Block until all builds finished; returns the final `Build` objects
+        (None for builds that were deleted)
+        """
+        for _ in self:
+            pass
+        return [self.builds.get(build_id)
+                if self.states[build_id] != 'deleted' else None
+                for build_id in self.ids]
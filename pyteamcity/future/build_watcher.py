@@ -0,0 +1,241 @@
+import time
+
+from . import exceptions
+from .build import Build, BuildQuerySet
+
+WATCH_FIELDS = ('id,number,buildTypeId,state,status,branchName,href,'
+                'startDate,finishDate')
+
+
+class BuildEvent(object):
+    def __init__(self, build):
+        self.build = build
+
+    def __repr__(self):
+        return '<%s.%s: build=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.build)
+
+
+class BuildStarted(BuildEvent):
+    pass
+
+
+class BuildFinished(BuildEvent):
+    pass
+
+
+class BuildStatusChanged(BuildEvent):
+    def __init__(self, build, previous_status):
+        super(BuildStatusChanged, self).__init__(build)
+        self.previous_status = previous_status
+
+    def __repr__(self):
+        return '<%s.%s: build=%r previous_status=%r status=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.build,
+            self.previous_status,
+            self.build.status)
+
+
+class BuildWatcher(object):
+    """
+    Poll TeamCity for build starts, finishes and status changes
+
+    Only deltas are requested: builds after the last one seen
+    (`sinceBuild`, queued ones included) and the currently running builds,
+    both with a minimal `fields=` projection. Builds seen while queued are
+    re-checked (`item:(id:...)` locators) until they start, so one that
+    starts and finishes between two polls is not skipped by `sinceBuild`.
+    The poll interval shrinks towards `min_interval` while there is
+    activity and grows towards `max_interval` while there is none, so a
+    single watcher can cheaply serve many subscribers.
+
+    `query_set` restricts what is watched, e.g.
+    `tc.builds.filter(project='id:MyProject')`; its `running` and `state`
+    dimensions are replaced by the watcher's own.
+    """
+
+    def __init__(self, teamcity, query_set=None,
+                 min_interval=1.0, max_interval=60.0, backoff=1.5,
+                 sleep=time.sleep):
+        self.teamcity = teamcity
+        if query_set is None:
+            query_set = BuildQuerySet(teamcity)
+        query_set = query_set._clone()
+        for dim in ('running', 'state'):
+            query_set._locator.remove(dim)
+        self.query_set = query_set
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.sleep = sleep
+        self.last_seen_id = None
+        self.running = {}
+        self.queued = set()
+        self._subscribers = []
+
+    def __repr__(self):
+        return '<%s.%s: last_seen_id=%r running=%r interval=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.last_seen_id,
+            len(self.running),
+            self.interval)
+
+    def subscribe(self, callback, event_types=(BuildEvent,)):
+        """
+        Call `callback(event)` for every event that is an instance of one of
+        `event_types`
+        """
+        self._subscribers.append((callback, tuple(event_types)))
+
+    def _query_set(self, **kwargs):
+        query_set = self.query_set._clone().filter(**kwargs)
+        return query_set.fields('count,nextHref,build(%s)' % WATCH_FIELDS)
+
+    def _fetch(self, **kwargs):
+        ret = []
+        query_set = self._query_set(**kwargs)
+        for page in query_set._pages():
+            for d in page.get('build', []):
+                ret.append(Build.from_dict(d, query_set,
+                                           teamcity=self.teamcity))
+        return ret
+
+    def _fetch_one(self, build_id):
+        query_set = BuildQuerySet(self.teamcity).fields(WATCH_FIELDS)
+        try:
+            return query_set.get(id=build_id)
+        except exceptions.HTTPError as e:
+            if e.status_code != 404:
+                raise
+
+    def _fetch_items(self, ids, chunk_size=100):
+        """
+        Builds with `ids`, leaving out those that no longer exist
+        """
+        ret = []
+        for i in range(0, len(ids), chunk_size):
+            chunk = ids[i:i + chunk_size]
+            query_set = BuildQuerySet(self.teamcity).fields(
+                'count,nextHref,build(%s)' % WATCH_FIELDS)
+            for build_id in chunk:
+                query_set._add_pred('item', '(id:%s)' % build_id)
+            try:
+                ret.extend(Build.from_dict(d, query_set,
+                                           teamcity=self.teamcity)
+                           for page in query_set._pages()
+                           for d in page.get('build', []))
+                continue
+            except exceptions.HTTPError as e:
+                if e.status_code != 404:
+                    raise
+            # At least one build is gone (e.g. removed from the queue)
+            for build_id in chunk:
+                build = self._fetch_one(build_id)
+                if build is not None:
+                    ret.append(build)
+        return ret
+
+    def _prime(self):
+        latest = self._query_set(state='any', count=1)._fetch()
+        builds = latest.get('build', [])
+        self.last_seen_id = builds[0]['id'] if builds else 0
+        for build in self._fetch(running=True):
+            self.running[build.id] = build.status
+        self.queued = set(build.id for build in self._fetch(state='queued'))
+
+    def poll(self):
+        """
+        Query the changes since the previous poll and return the events
+        """
+        if self.last_seen_id is None:
+            self._prime()
+            return []
+
+        events = []
+        kwargs = {'state': 'any'}
+        if self.last_seen_id:
+            kwargs['since_build'] = 'id:%d' % self.last_seen_id
+        new_builds = sorted(self._fetch(**kwargs), key=lambda b: b.id)
+        for build in new_builds:
+            self.last_seen_id = max(self.last_seen_id, build.id)
+        queued = self.queued
+        self.queued = set()
+        for build in new_builds:
+            if build.state == 'queued':
+                self.queued.add(build.id)
+                continue
+            events.append(BuildStarted(build))
+            if build.state == 'finished':
+                events.append(BuildFinished(build))
+            else:
+                self.running[build.id] = build.status
+
+        new_ids = set(b.id for b in new_builds)
+        still_running = set()
+        for build in self._fetch(running=True):
+            still_running.add(build.id)
+            queued.discard(build.id)
+            if build.id in new_ids:
+                continue
+            previous_status = self.running.get(build.id)
+            if build.id not in self.running:
+                events.append(BuildStarted(build))
+            elif previous_status != build.status:
+                events.append(BuildStatusChanged(build, previous_status))
+            self.running[build.id] = build.status
+
+        # Builds that were queued and are not running now: still queued,
+        # removed from the queue, or started and finished since last time
+        for build in sorted(self._fetch_items(sorted(queued - new_ids)),
+                            key=lambda b: b.id):
+            if build.state == 'queued':
+                self.queued.add(build.id)
+            elif build.state == 'finished' and build.start_date_string:
+                events.append(BuildStarted(build))
+                events.append(BuildFinished(build))
+
+        for build_id in sorted(set(self.running) - still_running):
+            del self.running[build_id]
+            build = self._fetch_one(build_id)
+            if build is not None and build.state == 'finished':
+                events.append(BuildFinished(build))
+
+        if events:
+            self.interval = max(self.min_interval,
+                                self.interval / self.backoff)
+        else:
+            self.interval = min(self.max_interval,
+                                self.interval * self.backoff)
+        return events
+
+    def dispatch(self, events):
+        for event in events:
+            for callback, event_types in self._subscribers:
+                if isinstance(event, event_types):
+                    callback(event)
+
+    def events(self):
+        """
+        Generator of events, polling forever at the adaptive interval
+        """
+        while True:
+            for event in self.poll():
+                yield event
+            self.sleep(self.interval)
+
+    def run(self, max_polls=None):
+        """
+        Poll and dispatch events to the subscribers
+        """
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            self.dispatch(self.poll())
+            polls += 1
+            if max_polls is None or polls < max_polls:
+                self.sleep(self.interval)
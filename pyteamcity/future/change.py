@@ -1,6 +1,14 @@
+import collections
+
 from .core.queryset import QuerySet
 from .core.utils import parse_date_string
 
+CHANGE_FILES_FIELDS = ('count,nextHref,change(id,version,username,date,href,'
+                       'webUrl,comment,files(file(relative-file,changeType)),'
+                       'vcsRootInstance(id,vcs-root-id))')
+BUILD_TYPE_VCS_ROOTS_FIELDS = (
+    'count,nextHref,buildType(id,vcs-root-entries(vcs-root-entry(id)))')
+
 
 class Change(object):
     def __init__(self, id,
@@ -30,6 +38,19 @@ class Change(object):
             self.date.isoformat(),
         )
 
+    @property
+    def files(self):
+        """
+        Paths of the files touched by the change (only present when the
+        change was fetched with its files, e.g. through `with_files()`)
+        """
+        return [f.get('relative-file') or f.get('file')
+                for f in self._data_dict.get('files', {}).get('file', [])]
+
+    @property
+    def vcs_root_id(self):
+        return self._data_dict.get('vcsRootInstance', {}).get('vcs-root-id')
+
     @classmethod
     def from_dict(cls, d, query_set=None):
         return cls(
@@ -43,9 +64,66 @@ class Change(object):
             data_dict=d)
 
 
+class ChangeAnalytics(object):
+    """
+    Running totals over changes: how often each file was touched, changes
+    per committer and, given the VCS roots of each build type, how many
+    changes each build type was exposed to
+
+    Changes are folded in one page at a time and only the counters are
+    kept, so arbitrarily long histories fit in memory.
+    """
+
+    def __init__(self, build_types_by_vcs_root=None):
+        self.build_types_by_vcs_root = build_types_by_vcs_root or {}
+        self.num_changes = 0
+        self.file_counts = collections.Counter()
+        self.committer_counts = collections.Counter()
+        self.build_type_counts = collections.Counter()
+
+    def __repr__(self):
+        return '<%s.%s: changes=%r files=%r committers=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.num_changes,
+            len(self.file_counts),
+            len(self.committer_counts))
+
+    def add(self, d):
+        self.num_changes += 1
+        self.committer_counts[d.get('username')] += 1
+        files = d.get('files', {}).get('file', [])
+        self.file_counts.update(
+            set(f.get('relative-file') or f.get('file') for f in files))
+        vcs_root_id = d.get('vcsRootInstance', {}).get('vcs-root-id')
+        self.build_type_counts.update(
+            self.build_types_by_vcs_root.get(vcs_root_id, ()))
+
+    def add_page(self, page):
+        for d in page.get('change', []):
+            self.add(d)
+
+    def hot_files(self, n=10):
+        """
+        `(path, number of changes)` of the `n` most changed files
+        """
+        return self.file_counts.most_common(n)
+
+    def changes_per_committer(self):
+        return dict(self.committer_counts)
+
+    def build_type_impact(self, n=None):
+        """
+        `(build type id, number of changes)` of the build types using the
+        VCS roots of the changes, most affected first
+        """
+        return self.build_type_counts.most_common(n)
+
+
 class ChangeQuerySet(QuerySet):
     uri = '/app/rest/changes/'
     _entity_factory = Change
+    _list_key = 'change'
 
     def filter(self,
                id=None,
@@ -77,3 +155,43 @@ class ChangeQuerySet(QuerySet):
     def __iter__(self):
         return (self.__class__._entity_factory.from_dict(d, self)
                 for d in self._data()['change'])
+
+    def with_files(self):
+        """
+        Fetch the files (and VCS root) of the changes inline, with one
+        request per page instead of one per change
+        """
+        return self._clone().fields(CHANGE_FILES_FIELDS)
+
+    def _build_types_by_vcs_root(self):
+        from .build_type import BuildTypeQuerySet
+
+        query_set = BuildTypeQuerySet(self.teamcity).fields(
+            BUILD_TYPE_VCS_ROOTS_FIELDS)
+        ret = collections.defaultdict(list)
+        for page in query_set._pages():
+            for d in page.get('buildType', []):
+                entries = d.get('vcs-root-entries', {})
+                for entry in entries.get('vcs-root-entry', []):
+                    ret[entry['id']].append(d['id'])
+        return ret
+
+    def analytics(self, page_size=1000, build_types=True):
+        """
+        Fold the matching changes, with their files, into a
+        `ChangeAnalytics`, one page of `page_size` changes at a time
+
+        With `build_types`, the VCS roots of all build types are loaded
+        first (one request) to compute `build_type_impact`.
+        """
+        build_types_by_vcs_root = None
+        if build_types:
+            build_types_by_vcs_root = self._build_types_by_vcs_root()
+        analytics = ChangeAnalytics(build_types_by_vcs_root)
+
+        query_set = self.with_files()
+        if page_size and 'count' not in query_set._locator:
+            query_set._add_pred('count', page_size)
+        for page in query_set._pages():
+            analytics.add_page(page)
+        return analytics
@@ -0,0 +1,86 @@
+import threading
+import time
+
+
+class RateLimiter(object):
+    """
+    Thread-safe limiter spacing calls `1 / rate` seconds apart
+    """
+
+    def __init__(self, rate, clock=time.time, sleep=time.sleep):
+        self.rate = rate
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._next = None
+
+    def __repr__(self):
+        return '<%s.%s: rate=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.rate)
+
+    def acquire(self):
+        with self._lock:
+            now = self.clock()
+            if self._next is None or self._next < now:
+                self._next = now
+            delay = self._next - now
+            self._next += 1.0 / self.rate
+        if delay > 0:
+            self.sleep(delay)
+
+
+class Result(object):
+    """
+    Outcome of applying an operation to one item of a batch
+    """
+
+    def __init__(self, item, value=None, error=None):
+        self.item = item
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return '<%s.%s: item=%r value=%r>' % (
+                self.__module__,
+                self.__class__.__name__,
+                self.item,
+                self.value)
+        return '<%s.%s: item=%r error=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.item,
+            self.error)
+
+
+def _call(func, item, rate_limiter=None):
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+    try:
+        return Result(item, value=func(item))
+    except Exception as e:
+        return Result(item, error=e)
+
+
+def run_concurrently(func, items, workers=8, rate_limiter=None):
+    """
+    Call `func(item)` for every item on up to `workers` threads, and no
+    faster than `rate_limiter` allows
+
+    Returns a list of `Result` in the order of `items`; an exception raised
+    for one item is stored in its result instead of aborting the batch.
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [_call(func, item, rate_limiter) for item in items]
+
+    from concurrent import futures
+    with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(
+            lambda item: _call(func, item, rate_limiter), items))
@@ -0,0 +1,245 @@
+import collections
+import csv
+import json
+import sys
+import threading
+
+from six.moves import queue
+
+_DONE = object()
+
+
+def _projection(fields):
+    """
+    `fields=` projection of dotted field names, e.g.
+    `['id', 'buildType.name', 'buildType.projectName']` ->
+    `'id,buildType(name,projectName)'`
+    """
+    tree = collections.OrderedDict()
+    for field in fields:
+        node = tree
+        for part in field.split('.'):
+            node = node.setdefault(part, collections.OrderedDict())
+
+    def render(node):
+        return ','.join(
+            name + ('(%s)' % render(children) if children else '')
+            for name, children in node.items())
+
+    return render(tree)
+
+
+def _lookup(d, field):
+    for part in field.split('.'):
+        if not isinstance(d, dict):
+            return None
+        d = d.get(part)
+    return d
+
+
+def _prefetch(iterable):
+    """
+    Iterate over `iterable` on a background thread, one item ahead of the
+    consumer
+    """
+    items = queue.Queue(maxsize=1)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((_DONE, None))
+        except Exception:
+            put((_DONE, sys.exc_info()[1]))
+
+    thread = threading.Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        # Let a fetch in progress finish rather than leave it running
+        stop.set()
+        thread.join()
+
+
+class JsonLinesWriter(object):
+    def __init__(self, path, fields):
+        self.fields = fields
+        self.file = open(path, 'w')
+
+    def write(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(row, sort_keys=True) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class CsvWriter(object):
+    def __init__(self, path, fields):
+        if not fields:
+            raise ValueError('CSV export needs the list of fields')
+        self.fields = fields
+        if sys.version_info[0] == 2:
+            self.file = open(path, 'wb')
+        else:
+            self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(fields)
+
+    def write(self, rows):
+        self.writer.writerows(
+            [json.dumps(value) if isinstance(value, (dict, list)) else value
+             for value in (row[field] for field in self.fields)]
+            for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter(object):
+    """
+    Needs pyarrow. Column types come from `schema` (a `pyarrow.Schema` or a
+    dict of field name -> pyarrow type) where given, else from the first
+    batch, columns that are empty in it becoming strings. A later batch
+    that does not fit these types without loss raises ValueError.
+    """
+
+    def __init__(self, path, fields, schema=None):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('Parquet export requires pyarrow')
+        if not fields:
+            raise ValueError('Parquet export needs the list of fields')
+        self.pyarrow = pyarrow
+        self.path = path
+        self.fields = fields
+        self.types = {}
+        if schema is not None:
+            if isinstance(schema, pyarrow.Schema):
+                schema = dict(zip(schema.names, schema.types))
+            self.types.update(schema)
+        self.schema = None
+        self.writer = None
+
+    def _column(self, field, values):
+        pyarrow = self.pyarrow
+        try:
+            array = pyarrow.array(values)
+        except pyarrow.ArrowException as e:
+            raise ValueError('Column %r: %s' % (field, e))
+        if field not in self.types:
+            self.types[field] = (pyarrow.string()
+                                 if pyarrow.types.is_null(array.type)
+                                 else array.type)
+        type_ = self.types[field]
+        if array.type == type_ or pyarrow.types.is_null(array.type):
+            return array.cast(type_)
+        error = None
+        if pyarrow.types.is_string(type_):
+            error = 'values are not strings'
+        else:
+            try:
+                return array.cast(type_, safe=True)
+            except pyarrow.ArrowException as e:
+                error = str(e)
+        raise ValueError(
+            'Column %r changed type from %s to %s (%s); pass its type in '
+            '`schema`' % (field, type_, array.type, error))
+
+    def _table(self, rows):
+        pyarrow = self.pyarrow
+        arrays = [self._column(field, [row[field] for row in rows])
+                  for field in self.fields]
+        if self.schema is None:
+            self.schema = pyarrow.schema([
+                pyarrow.field(field, self.types[field])
+                for field in self.fields])
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema)
+        return pyarrow.Table.from_arrays(arrays, schema=self.schema)
+
+    def write(self, rows):
+        if rows:
+            table = self._table(rows)
+            self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is None:
+            # Nothing was exported; still leave a valid, empty file
+            self.schema = self.pyarrow.schema(
+                [self.pyarrow.field(field, self.types.get(
+                    field, self.pyarrow.string())) for field in self.fields])
+            self.writer = self.pyarrow.parquet.ParquetWriter(
+                self.path, self.schema)
+        self.writer.close()
+
+
+WRITERS = {
+    'jsonl': JsonLinesWriter,
+    'csv': CsvWriter,
+    'parquet': ParquetWriter,
+}
+
+
+def export(query_set, path, format='jsonl', fields=None, page_size=1000,
+           schema=None):
+    """
+    Write the entities matched by `query_set` to `path`; returns the
+    number of rows written
+
+    See `QuerySet.export`.
+    """
+    if format not in WRITERS:
+        raise ValueError('Unknown export format %r (expected one of %s)' % (
+            format, ', '.join(sorted(WRITERS))))
+    list_key = query_set._list_key
+    if list_key is None:
+        raise ValueError('%s cannot be exported' % type(query_set).__name__)
+    if schema is not None:
+        if format != 'parquet':
+            raise ValueError('`schema` only applies to Parquet export')
+        writer = WRITERS[format](path, fields, schema=schema)
+    else:
+        writer = WRITERS[format](path, fields)
+
+    query_set = query_set._clone()
+    if page_size and 'count' not in query_set._locator:
+        query_set._add_pred('count', page_size)
+    if fields:
+        query_set.fields('count,nextHref,%s(%s)' % (
+            list_key, _projection(fields)))
+
+    num_rows = 0
+    try:
+        for page in _prefetch(query_set._pages()):
+            items = page.get(list_key, [])
+            if fields:
+                rows = [dict((field, _lookup(d, field)) for field in fields)
+                        for d in items]
+            else:
+                rows = items
+            writer.write(rows)
+            num_rows += len(rows)
+    finally:
+        writer.close()
+    return num_rows
@@ -8,5 +8,16 @@ class Locator(object):
         # @todo: Check for invalid dims
         self._preds.append((dim, value))
 
+    def __contains__(self, dim):
+        return any(d == dim for d, _ in self._preds)
+
+    def copy(self):
+        locator = self.__class__()
+        locator._preds = list(self._preds)
+        return locator
+
+    def remove(self, dim):
+        self._preds = [(d, v) for d, v in self._preds if d != dim]
+
     def __str__(self):
         return ','.join(['%s:%s' % p for p in self._preds])
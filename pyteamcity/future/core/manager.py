@@ -1,7 +1,23 @@
 class Manager(object):
+    # Query set methods that change every matching entity; they need an
+    # explicit `all()` or `filter(...)` so that a slip such as
+    # `tc.agents.delete()` cannot act on everything
+    unproxied = ('cancel_all', 'delete', 'update')
+
     def __init__(self, teamcity, query_set_factory):
         self.teamcity = teamcity
         self.query_set_factory = query_set_factory
 
     def all(self):
         return self.query_set_factory(teamcity=self.teamcity)
+
+    def __getattr__(self, name):
+        # Make query set methods such as `filter` or `sync_to` available
+        # directly on the manager, like `tc.builds.filter(...)`
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name in self.unproxied:
+            raise AttributeError(
+                '%s must be called on a query set, e.g. .all().%s() or '
+                '.filter(...).%s()' % (name, name, name))
+        return getattr(self.all(), name)
@@ -1,4 +1,5 @@
 import itertools
+import time
 
 import requests
 
@@ -9,19 +10,40 @@ from .locator import Locator
 class QuerySet(object):
     base_url = None
     _entity_factory = None
+    _list_key = None
+    _deadline = None
 
     def __init__(self, teamcity):
         self.teamcity = teamcity
         self.base_url = self.teamcity.base_url + self.__class__.uri
         self._locator = Locator()
+        self._fields = None
         self._data_dict = {}
 
     def _add_pred(self, name, value):
         return self._locator.add_pred(name, value)
 
+    def _clone(self):
+        query_set = self.__class__(self.teamcity)
+        query_set._locator = self._locator.copy()
+        query_set._fields = self._fields
+        query_set._deadline = self._deadline
+        return query_set
+
+    def fields(self, fields):
+        """
+        Only fetch `fields`, a TeamCity `fields=` projection such as
+        `count,nextHref,build(id,status)`
+        """
+        self._fields = fields
+        return self
+
     def _get_url(self, details=False, href=None):
         if href is not None:
-            return 'http://' + self.teamcity.server + href
+            url = self.teamcity.base_base_url + href
+            if self._fields and 'fields=' not in href:
+                url += ('&' if '?' in url else '?') + 'fields=' + self._fields
+            return url
 
         url = self.base_url
 
@@ -32,11 +54,29 @@ class QuerySet(object):
             else:
                 url += '?locator=' + locator_str
 
+        if self._fields:
+            url += ('&' if '?' in url else '?') + 'fields=' + self._fields
+
         return url
 
+    def _request_kwargs(self):
+        """
+        `timeout` of the next request when `_deadline` (a `time.time()`
+        value) is set
+        """
+        if self._deadline is None:
+            return {}
+        remaining = self._deadline - time.time()
+        if remaining <= 0:
+            raise exceptions.WaitTimeout('Deadline passed before %s' % self.url)
+        return {'timeout': remaining}
+
     def _fetch(self, details=False, href=None):
         self.url = self._get_url(details=details, href=href)
-        res = self.teamcity.session.get(self.url)
+        try:
+            res = self.teamcity.session.get(self.url, **self._request_kwargs())
+        except requests.Timeout:
+            raise exceptions.WaitTimeout('No answer from %s in time' % self.url)
 
         try:
             res.raise_for_status()
@@ -60,6 +100,50 @@ class QuerySet(object):
 
         return self._data_dict
 
+    def _pages(self):
+        """
+        Yield the raw data of each page, following `nextHref`
+        """
+        data = self._fetch()
+        while True:
+            yield data
+            if 'nextHref' not in data:
+                break
+            data = self._fetch(href=data['nextHref'])
+
+    def _iter_all(self):
+        """
+        All matching entities, following `nextHref` page by page
+        """
+        for page in self._pages():
+            query_set = self._clone()
+            query_set._data_dict = page
+            for entity in query_set:
+                yield entity
+
+    def export(self, path, format='jsonl', fields=None, page_size=1000,
+               schema=None):
+        """
+        Write the matching entities to `path` as JSON lines, CSV or Parquet
+        (`format` `'jsonl'`, `'csv'` or `'parquet'`); returns the number of
+        rows written
+
+        `fields` lists the columns, dotted for nested values (e.g.
+        `['id', 'status', 'buildType.name']`), and is turned into a
+        `fields=` projection so the server only sends those; it is required
+        for CSV and Parquet. Without it each JSON line is the raw entity.
+        Pages of `page_size` are written as they arrive while the next one
+        is fetched, so only a couple of pages are in memory at once.
+        Parquet needs pyarrow (the `parquet` extra); the column types are
+        taken from `schema` (a `pyarrow.Schema` or a dict of field name ->
+        pyarrow type) or else from the first page, and a later page that
+        does not fit them raises ValueError.
+        """
+        from .export import export
+
+        return export(self, path, format=format, fields=fields,
+                      page_size=page_size, schema=schema)
+
     @classmethod
     def _from_dict(cls, d, query_set):
         return cls._entity_factory.from_dict(d, query_set)
@@ -1,9 +1,9 @@
-import dateutil.parser
-
 from .. import exceptions
 
 
 def parse_date_string(date_string):
+    # dateutil is slow to import and only needed once dates are accessed
+    import dateutil.parser
     return dateutil.parser.parse(date_string)
 
 
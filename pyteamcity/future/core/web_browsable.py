@@ -1,6 +1,4 @@
-import webbrowser
-
-
 class WebBrowsable(object):
     def open_web_browser(self):
+        import webbrowser
         webbrowser.open(self.web_url)
@@ -0,0 +1,238 @@
+"""
+Incremental reader for zip archives that arrive as a stream of chunks.
+
+`zipfile` needs a seekable file because it starts from the central
+directory at the end of the archive.  TeamCity builds the archive on the
+fly, so here we walk the local file headers instead and hand out each
+entry's data as soon as it has been received.
+"""
+
+import struct
+import zlib
+
+from .. import exceptions
+
+LOCAL_FILE_HEADER = b'PK\x03\x04'
+CENTRAL_DIRECTORY_HEADER = b'PK\x01\x02'
+END_OF_CENTRAL_DIRECTORY = b'PK\x05\x06'
+DATA_DESCRIPTOR = b'PK\x07\x08'
+
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+
+ZIP64_EXTRA_ID = 0x0001
+ZIP64_PLACEHOLDER = 0xffffffff
+
+# What may follow a data descriptor
+_NEXT_SIGNATURES = (LOCAL_FILE_HEADER, CENTRAL_DIRECTORY_HEADER,
+                    END_OF_CENTRAL_DIRECTORY, b'PK\x06\x06')
+
+_local_header = struct.Struct('<4sHHHHHIIIHH')
+
+
+class _ChunkReader(object):
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buf = b''
+
+    def _fill(self):
+        for chunk in self._chunks:
+            if chunk:
+                self._buf += chunk
+                return True
+        return False
+
+    def read(self, n):
+        while len(self._buf) < n:
+            if not self._fill():
+                raise exceptions.ArchiveError('Truncated zip stream')
+        data, self._buf = self._buf[:n], self._buf[n:]
+        return data
+
+    def read_some(self, limit=None):
+        if not self._buf and not self._fill():
+            return b''
+        if limit is None or limit >= len(self._buf):
+            data, self._buf = self._buf, b''
+        else:
+            data, self._buf = self._buf[:limit], self._buf[limit:]
+        return data
+
+    def peek(self, n):
+        while len(self._buf) < n:
+            if not self._fill():
+                break
+        return self._buf[:n]
+
+    def unread(self, data):
+        self._buf = data + self._buf
+
+
+class ZipEntry(object):
+    def __init__(self, name, method, flags, crc, compressed_size, size,
+                 zip64):
+        self.name = name
+        self.method = method
+        self.flags = flags
+        self.crc = crc
+        self.compressed_size = compressed_size
+        self.size = size
+        self.zip64 = zip64
+
+    def isdir(self):
+        return self.name.endswith('/')
+
+    def __repr__(self):
+        return '<%s.%s: name=%r size=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.name,
+            self.size)
+
+
+def _zip64_extra(extra, size, compressed_size):
+    """
+    `(zip64, size, compressed_size)` with the 64-bit sizes of the ZIP64
+    extra field in `extra` replacing the 32-bit placeholders
+    """
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, length = struct.unpack('<HH', extra[offset:offset + 4])
+        if header_id == ZIP64_EXTRA_ID:
+            data = extra[offset + 4:offset + 4 + length]
+            # Only the fields whose header value is the placeholder are
+            # present, in this order
+            if size == ZIP64_PLACEHOLDER and len(data) >= 8:
+                size, = struct.unpack('<Q', data[:8])
+                data = data[8:]
+            if compressed_size == ZIP64_PLACEHOLDER and len(data) >= 8:
+                compressed_size, = struct.unpack('<Q', data[:8])
+            return True, size, compressed_size
+        offset += 4 + length
+    return False, size, compressed_size
+
+
+def _read_entry_header(reader):
+    header = reader.read(_local_header.size)
+    (_, _, flags, method, _, _,
+     crc, compressed_size, size,
+     name_length, extra_length) = _local_header.unpack(header)
+    name = reader.read(name_length)
+    extra = reader.read(extra_length)
+    if flags & FLAG_UTF8:
+        name = name.decode('utf-8')
+    else:
+        name = name.decode('cp437')
+    zip64, size, compressed_size = _zip64_extra(extra, size, compressed_size)
+    return ZipEntry(
+        name=name, method=method, flags=flags, crc=crc,
+        compressed_size=compressed_size, size=size, zip64=zip64)
+
+
+def _iter_stored(reader, entry):
+    if entry.flags & FLAG_DATA_DESCRIPTOR:
+        raise exceptions.ArchiveError(
+            'Cannot stream stored entry %r without known size' % entry.name)
+    remaining = entry.compressed_size
+    while remaining:
+        data = reader.read_some(remaining)
+        if not data:
+            raise exceptions.ArchiveError('Truncated zip stream')
+        remaining -= len(data)
+        yield data
+
+
+def _iter_deflated(reader):
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    while not decompressor.eof:
+        data = reader.read_some()
+        if not data:
+            raise exceptions.ArchiveError('Truncated zip stream')
+        try:
+            out = decompressor.decompress(data)
+        except zlib.error as e:
+            raise exceptions.ArchiveError(str(e))
+        if out:
+            yield out
+    reader.unread(decompressor.unused_data)
+
+
+def _read_data_descriptor(reader, entry, size):
+    """
+    Read the data descriptor following an entry of `size` bytes
+
+    Its sizes are 8 bytes each for ZIP64 entries, but writers such as
+    Java's `ZipOutputStream` also use those for large entries without a
+    ZIP64 extra field, so the layout is told by what follows it.
+    """
+    if reader.peek(4) == DATA_DESCRIPTOR:
+        reader.read(4)
+    data = reader.peek(24)
+
+    def fits(size_format):
+        length = struct.calcsize(size_format)
+        if len(data) < length + 4:
+            return False
+        _, _, size_field = struct.unpack(size_format, data[:length])
+        return (size_field == size and
+                data[length:length + 4] in _NEXT_SIGNATURES)
+
+    if fits('<III'):
+        size_format = '<III'
+    elif fits('<IQQ') or entry.zip64:
+        size_format = '<IQQ'
+    else:
+        size_format = '<III'
+    entry.crc, entry.compressed_size, entry.size = struct.unpack(
+        size_format, reader.read(struct.calcsize(size_format)))
+
+
+def _iter_entry_data(reader, entry):
+    if entry.method == METHOD_STORED:
+        pieces = _iter_stored(reader, entry)
+    elif entry.method == METHOD_DEFLATED:
+        pieces = _iter_deflated(reader)
+    else:
+        raise exceptions.ArchiveError(
+            'Unsupported compression method %d for %r'
+            % (entry.method, entry.name))
+
+    crc = 0
+    size = 0
+    for piece in pieces:
+        crc = zlib.crc32(piece, crc)
+        size += len(piece)
+        yield piece
+
+    if entry.flags & FLAG_DATA_DESCRIPTOR:
+        _read_data_descriptor(reader, entry, size)
+    if crc & 0xffffffff != entry.crc:
+        raise exceptions.ArchiveError('Bad CRC-32 for %r' % entry.name)
+
+
+def iter_zip_entries(chunks):
+    """
+    Yield `(entry, data)` for each member of a zip archive read from the
+    iterable of byte strings `chunks`.
+
+    `data` is an iterator over the decompressed content of the entry and
+    must be consumed before advancing to the next entry (anything left
+    over is skipped).
+    """
+    reader = _ChunkReader(chunks)
+    while True:
+        signature = reader.peek(4)
+        if signature in (CENTRAL_DIRECTORY_HEADER,
+                         END_OF_CENTRAL_DIRECTORY, b''):
+            return
+        if signature != LOCAL_FILE_HEADER:
+            raise exceptions.ArchiveError(
+                'Unexpected zip signature %r' % signature)
+        entry = _read_entry_header(reader)
+        data = _iter_entry_data(reader, entry)
+        yield entry, data
+        for _ in data:
+            pass
@@ -18,6 +18,14 @@ class ArtifactSizeExceeded(Error):
     pass
 
 
+class WaitTimeout(Error):
+    pass
+
+
+class ArchiveError(Error):
+    pass
+
+
 class ArtifactNotFound(Error):
     def __init__(self, path):
         self.path = path
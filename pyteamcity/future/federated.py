@@ -0,0 +1,245 @@
+import collections
+import heapq
+import itertools
+import time
+
+from . import exceptions
+from .core.manager import Manager
+
+
+class _Descending(object):
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class FederatedQuerySet(object):
+    """
+    The same query run on several TeamCity servers at once
+
+    `filter` and `fields` are applied on every server. Iterating runs the
+    query on all servers concurrently, following every page of results,
+    and returns the entities of the servers that answered within `timeout`
+    seconds, each tagged with the name of its server as `origin`. With
+    `order_by` (an attribute name, `-` prefixed for descending order) the
+    sorted results of each server are merged with `heapq.merge`, entities
+    without a value last; otherwise they are grouped by server. Servers
+    that failed or timed out are left out and listed in `errors`.
+    """
+
+    def __init__(self, federation, query_sets, order_by=None):
+        self.federation = federation
+        self.query_sets = query_sets
+        self.order_by = order_by
+        self.errors = {}
+
+    def __repr__(self):
+        return '<%s.%s: servers=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            list(self.query_sets))
+
+    def filter(self, **kwargs):
+        for query_set in self.query_sets.values():
+            query_set.filter(**kwargs)
+        return self
+
+    def fields(self, fields):
+        for query_set in self.query_sets.values():
+            query_set.fields(fields)
+        return self
+
+    def sort(self, order_by):
+        self.order_by = order_by
+        return self
+
+    @property
+    def partial(self):
+        """
+        True if the last query is missing the results of some server
+        """
+        return bool(self.errors)
+
+    def map(self, func):
+        """
+        Call `func(query_set)` for the query set of every server
+        concurrently; returns `{server name: result}` of the servers that
+        answered in time (see `errors` for the others)
+        """
+        ret = collections.OrderedDict()
+        self.errors = {}
+        for name, value, error in self.federation._run(
+                func, self.query_sets):
+            if error is None:
+                ret[name] = value
+            else:
+                self.errors[name] = error
+        return ret
+
+    def as_completed(self):
+        """
+        Generator of `(server name, entities)` in the order the servers
+        answer
+        """
+        self.errors = {}
+        for name, value, error in self.federation._run(
+                self._fetch, self.query_sets, as_completed=True):
+            if error is None:
+                yield name, value
+            else:
+                self.errors[name] = error
+
+    def _fetch(self, query_set):
+        return list(query_set._iter_all())
+
+    @staticmethod
+    def _count(query_set):
+        query_set = query_set._clone().fields('count,nextHref')
+        return sum(page.get('count', 0) for page in query_set._pages())
+
+    def _sort_value(self, entity):
+        try:
+            return getattr(entity, self.order_by.lstrip('-'))
+        except (TypeError, ValueError):  # e.g. the date of a running build
+            return None
+
+    def __iter__(self):
+        streams = []
+        for name, values in self.map(self._fetch).items():
+            for entity in values:
+                entity.origin = name
+            streams.append(values)
+        if not self.order_by:
+            return itertools.chain(*streams)
+
+        descending = self.order_by.startswith('-')
+        sorted_streams = []
+        missing = []
+        for i, values in enumerate(streams):
+            keyed = []
+            for j, entity in enumerate(values):
+                value = self._sort_value(entity)
+                if value is None:
+                    missing.append(entity)
+                    continue
+                if descending:
+                    value = _Descending(value)
+                # The positions keep ties stable and entities uncompared
+                keyed.append((value, i, j, entity))
+            keyed.sort()
+            sorted_streams.append(keyed)
+        merged = (item[-1] for item in heapq.merge(*sorted_streams))
+        # Entities without a value go last, in server order
+        return itertools.chain(merged, missing)
+
+    def __len__(self):
+        return sum(self.map(self._count).values())
+
+
+class FederatedManager(object):
+    def __init__(self, federation, name):
+        self.federation = federation
+        self.name = name
+
+    def all(self):
+        return FederatedQuerySet(
+            self.federation,
+            collections.OrderedDict(
+                (server, getattr(teamcity, self.name).all())
+                for server, teamcity in self.federation.servers.items()))
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.all(), name)
+
+
+class FederatedTeamCity(object):
+    """
+    Several TeamCity servers queried as one
+
+    `servers` maps a name (e.g. the region) to a `TeamCity` client; the
+    managers of `TeamCity` (`builds`, `agents`, ...) are available with
+    the same query set API, e.g.
+    `federation.builds.filter(status='FAILURE').sort('-finish_date')`.
+    Each server is queried on its own thread; servers that have not
+    answered after `timeout` seconds are reported in the query set's
+    `errors` instead of holding up the others.
+    """
+
+    def __init__(self, servers, timeout=30.0):
+        self.servers = collections.OrderedDict(
+            sorted(servers.items()) if isinstance(servers, dict)
+            else servers)
+        self.timeout = timeout
+
+    def __repr__(self):
+        return '<%s.%s: servers=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            list(self.servers))
+
+    def __getattr__(self, name):
+        if name.startswith('_') or not self.servers:
+            raise AttributeError(name)
+        if not all(isinstance(getattr(teamcity, name, None), Manager)
+                   for teamcity in self.servers.values()):
+            raise AttributeError(name)
+        return FederatedManager(self, name)
+
+    def _run(self, func, items, as_completed=False):
+        """
+        Generator of `(name, value, error)` for `func(items[name])` run
+        concurrently for every name
+
+        `items` are query sets; their requests are given a deadline of
+        `timeout` seconds, so the threads of servers that do not answer
+        stop when the wait for them ends.
+        """
+        from concurrent import futures
+
+        deadline = time.time() + self.timeout
+        for item in items.values():
+            item._deadline = deadline
+        executor = futures.ThreadPoolExecutor(max_workers=len(items) or 1)
+        try:
+            submitted = collections.OrderedDict(
+                (name, executor.submit(func, item))
+                for name, item in items.items())
+            names = dict((future, name)
+                         for name, future in submitted.items())
+            done = set()
+            try:
+                for future in futures.as_completed(names,
+                                                   timeout=self.timeout):
+                    done.add(future)
+                    if as_completed:
+                        yield self._outcome(names[future], future)
+            except futures.TimeoutError:
+                pass
+            for name, future in submitted.items():
+                if future not in done:
+                    future.cancel()
+                    yield name, None, exceptions.WaitTimeout(
+                        'No answer from %s after %ss' % (name, self.timeout))
+                elif not as_completed:
+                    yield self._outcome(name, future)
+        finally:
+            # The requests still running time out at the deadline
+            executor.shutdown(wait=True)
+            for item in items.values():
+                item._deadline = None
+
+    @staticmethod
+    def _outcome(name, future):
+        error = future.exception()
+        if error is not None:
+            return name, None, error
+        return name, future.result(), None
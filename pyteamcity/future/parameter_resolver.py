@@ -0,0 +1,170 @@
+import re
+
+from .build_type import BuildType, BuildTypeQuerySet
+from .core.parameter import Parameter
+from .project import ProjectQuerySet
+
+PROPERTY_FIELDS = 'parameters(property(name,value,inherited,type(rawValue)))'
+PROJECT_FIELDS = 'count,nextHref,project(id,parentProjectId,%s)' % (
+    PROPERTY_FIELDS)
+BUILD_TYPE_FIELDS = ('count,nextHref,buildType(id,name,projectId,projectName,'
+                     'href,templateFlag,templates(buildType(id)),%s)' % (
+                         PROPERTY_FIELDS))
+
+_REFERENCE_RE = re.compile(r'%([^%\s]*)%')
+
+
+def _own_parameters(d):
+    """
+    Parameters defined on the project or build type `d` itself, leaving
+    out those TeamCity reports as inherited
+    """
+    ret = {}
+    for param in d.get('parameters', {}).get('property', []):
+        if param.get('inherited'):
+            continue
+        ret[param['name']] = Parameter(ptype=param.get('type'),
+                                       value=param.get('value'))
+    return ret
+
+
+class ParameterResolver(object):
+    """
+    Effective parameters of build types, computed locally
+
+    Parameters of all projects, of all templates (wherever they are
+    defined) and of the build types matched by `query_set` are loaded with
+    one `fields=` request each.
+    A build type's effective parameters are those of the root project, each
+    project down to its own, its templates (the first one attached wins)
+    and finally its own definitions. `%name%` references in values are
+    expanded against the same set; unknown references (e.g. to predefined
+    build parameters) are left alone and `%%` stands for a literal `%`.
+    """
+
+    def __init__(self, query_set):
+        self.query_set = query_set
+        self.teamcity = query_set.teamcity
+        self._projects = {}
+        self._build_types = {}
+        self._templates = {}
+        self._project_cache = {}
+        self._cache = {}
+        self.load()
+
+    def __repr__(self):
+        return '<%s.%s: projects=%r build_types=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            len(self._projects),
+            len(self._build_types))
+
+    def load(self):
+        """
+        (Re)load all parameters from the server
+        """
+        projects = ProjectQuerySet(self.teamcity).fields(PROJECT_FIELDS)
+        self._projects = dict(
+            (d['id'], d)
+            for page in projects._pages() for d in page.get('project', []))
+
+        # Templates may come from any parent project, whatever `query_set`
+        # is restricted to
+        templates = BuildTypeQuerySet(self.teamcity).filter(
+            template_flag='true').fields(BUILD_TYPE_FIELDS)
+        self._templates = dict(
+            (d['id'], BuildType.from_dict(d, templates))
+            for page in templates._pages()
+            for d in page.get('buildType', []))
+
+        build_types = self.query_set._clone()
+        if 'templateFlag' not in build_types._locator:
+            build_types.filter(template_flag='any')
+        build_types.fields(BUILD_TYPE_FIELDS)
+        self._build_types = dict(
+            (d['id'], BuildType.from_dict(d, build_types))
+            for page in build_types._pages()
+            for d in page.get('buildType', []))
+        self._project_cache = {}
+        self._cache = {}
+
+    @staticmethod
+    def _id(entity):
+        return getattr(entity, 'id', entity)
+
+    def project_parameters(self, project):
+        """
+        Unexpanded parameters of `project`, including inherited ones
+        """
+        project_id = self._id(project)
+        if project_id not in self._project_cache:
+            d = self._projects.get(project_id)
+            if d is None:
+                ret = {}
+            else:
+                ret = dict(self.project_parameters(d.get('parentProjectId')))
+                ret.update(_own_parameters(d))
+            self._project_cache[project_id] = ret
+        return self._project_cache[project_id]
+
+    def raw_parameters(self, build_type):
+        """
+        Unexpanded effective parameters of `build_type`
+        """
+        build_type = self._build_types[self._id(build_type)]
+        ret = dict(self.project_parameters(build_type.project_id))
+        templates = build_type._data_dict.get('templates', {})
+        for template in reversed(templates.get('buildType', [])):
+            template = self._templates.get(template['id'])
+            if template is not None:
+                ret.update(_own_parameters(template._data_dict))
+        ret.update(_own_parameters(build_type._data_dict))
+        return ret
+
+    def parameters(self, build_type):
+        """
+        Effective parameters of `build_type` (a `BuildType` or an id) as a
+        dict of name -> `Parameter`, with references expanded
+        """
+        build_type_id = self._id(build_type)
+        if build_type_id not in self._cache:
+            raw = self.raw_parameters(build_type_id)
+            self._cache[build_type_id] = dict(
+                (name, Parameter(ptype=param.ptype,
+                                 value=self._expand(name, raw, ())))
+                for name, param in raw.items())
+        return self._cache[build_type_id]
+
+    def _expand(self, name, raw, seen):
+        value = raw[name].value
+        if value is None or '%' not in value:
+            return value
+        seen = seen + (name,)
+
+        def replace(match):
+            ref = match.group(1)
+            if not ref:
+                return '%'
+            if ref not in raw or ref in seen:
+                return match.group(0)
+            return self._expand(ref, raw, seen) or ''
+
+        return _REFERENCE_RE.sub(replace, value)
+
+    def build_types(self, templates=False):
+        return [build_type for build_type in self._build_types.values()
+                if templates or not build_type.template_flag]
+
+    def find(self, name, value=None):
+        """
+        Build types whose effective parameter `name` is defined (or, when
+        `value` is given, equals `value` after expansion)
+        """
+        ret = []
+        for build_type in self.build_types():
+            param = self.parameters(build_type).get(name)
+            if param is None:
+                continue
+            if value is None or param.value == value:
+                ret.append(build_type)
+        return ret
@@ -98,6 +98,7 @@ class Project(WebBrowsable):
 class ProjectQuerySet(QuerySet):
     uri = '/app/rest/projects/'
     _entity_factory = Project
+    _list_key = 'project'
 
     def filter(self, id=None, name=None):
         if id is not None:
@@ -109,6 +110,14 @@ class ProjectQuerySet(QuerySet):
     def __iter__(self):
         return (Project.from_dict(d, self) for d in self._data()['project'])
 
+    def tree(self):
+        """
+        Load the matching projects into a `ProjectTree` index of the
+        hierarchy
+        """
+        from .project_tree import ProjectTree
+        return ProjectTree(self)
+
     def create(self, name, id=None, parent_project_locator='id:_Root'):
         url = self.base_url
         attrs_dict = {'name': name}
@@ -0,0 +1,166 @@
+import collections
+
+from .project import Project
+
+TREE_FIELDS = 'count,nextHref,project(id,name,parentProjectId,archived,href)'
+
+
+class ProjectTreeChanges(object):
+    """
+    Ids of the projects added, removed and changed (renamed, moved or
+    (un)archived) by a `ProjectTree.refresh`
+    """
+
+    def __init__(self, added=(), removed=(), changed=()):
+        self.added = list(added)
+        self.removed = list(removed)
+        self.changed = list(changed)
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return '<%s.%s: added=%r removed=%r changed=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.added,
+            self.removed,
+            self.changed)
+
+
+class ProjectTree(object):
+    """
+    In-memory index of the project hierarchy
+
+    All projects are loaded with one request (following `nextHref` if the
+    server pages) and a `fields=` projection of id, name, parentProjectId
+    and archived. `children` is a lookup, `ancestors` and `path` walk the
+    parent links, and `descendants` visits only the subtree.
+
+    `refresh` fetches the projects again and only updates the entries that
+    changed.
+    """
+
+    def __init__(self, query_set):
+        self.query_set = query_set
+        self.teamcity = query_set.teamcity
+        self._projects = {}
+        self._children = collections.defaultdict(list)
+        self.roots = []
+        self.refresh()
+
+    def __repr__(self):
+        return '<%s.%s: projects=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            len(self._projects))
+
+    def __len__(self):
+        return len(self._projects)
+
+    def __iter__(self):
+        return iter(self._projects.values())
+
+    def __contains__(self, project):
+        return self._id(project) in self._projects
+
+    def __getitem__(self, project):
+        return self._projects[self._id(project)]
+
+    @staticmethod
+    def _id(project):
+        return getattr(project, 'id', project)
+
+    def _fetch(self):
+        query_set = self.query_set._clone().fields(TREE_FIELDS)
+        return collections.OrderedDict(
+            (d['id'], Project.from_dict(d, query_set))
+            for page in query_set._pages()
+            for d in page.get('project', []))
+
+    @staticmethod
+    def _key(project):
+        return (project.name, project.parent_project_id,
+                project._data_dict.get('archived', False))
+
+    def _link(self, project):
+        parent_id = project.parent_project_id
+        if parent_id is None:
+            self.roots.append(project.id)
+        else:
+            self._children[parent_id].append(project.id)
+
+    def _unlink(self, project):
+        parent_id = project.parent_project_id
+        if parent_id is None:
+            self.roots.remove(project.id)
+        else:
+            siblings = self._children[parent_id]
+            siblings.remove(project.id)
+            if not siblings:
+                del self._children[parent_id]
+
+    def refresh(self):
+        """
+        Reload the projects; returns the `ProjectTreeChanges`
+        """
+        projects = self._fetch()
+        changes = ProjectTreeChanges(
+            added=[project_id for project_id in projects
+                   if project_id not in self._projects],
+            removed=[project_id for project_id in self._projects
+                     if project_id not in projects],
+            changed=[project_id for project_id, project in projects.items()
+                     if project_id in self._projects and
+                     self._key(project) !=
+                     self._key(self._projects[project_id])])
+
+        for project_id in changes.removed + changes.changed:
+            self._unlink(self._projects.pop(project_id))
+        for project_id in changes.added + changes.changed:
+            project = projects[project_id]
+            self._projects[project_id] = project
+            self._link(project)
+        return changes
+
+    def children(self, project):
+        """
+        Direct subprojects of `project` (a `Project` or a project id)
+        """
+        return [self._projects[child_id]
+                for child_id in self._children.get(self._id(project), [])]
+
+    def descendants(self, project):
+        """
+        All projects below `project`, breadth first
+        """
+        ret = []
+        queue = collections.deque([self._id(project)])
+        while queue:
+            for child_id in self._children.get(queue.popleft(), []):
+                ret.append(self._projects[child_id])
+                queue.append(child_id)
+        return ret
+
+    def parent(self, project):
+        parent_id = self[project].parent_project_id
+        return self._projects.get(parent_id)
+
+    def ancestors(self, project):
+        """
+        Parent, grandparent, ... of `project` up to the root project
+        """
+        ret = []
+        parent = self.parent(project)
+        while parent is not None:
+            ret.append(parent)
+            parent = self.parent(parent)
+        return ret
+
+    def path(self, project):
+        """
+        Projects from the root project down to `project` itself
+        """
+        return list(reversed(self.ancestors(project))) + [self[project]]
@@ -0,0 +1,192 @@
+import collections
+import math
+
+from . import exceptions
+from .build import BuildQuerySet
+from .core.utils import parse_date_string
+from .queued_build import QueuedBuild, QueuedBuildQuerySet
+
+QUEUE_FIELDS = 'id,buildTypeId,queuedDate,waitReason,branchName,href'
+STARTED_FIELDS = 'id,state,queuedDate,startDate,canceledInfo(timestamp)'
+
+
+class QueueEvent(object):
+    def __init__(self, queued_build):
+        self.queued_build = queued_build
+
+    def __repr__(self):
+        return '<%s.%s: queued_build=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.queued_build)
+
+
+class QueuedBuildAdded(QueueEvent):
+    pass
+
+
+class QueuedBuildRemoved(QueueEvent):
+    """
+    The build left the queue without starting (e.g. it was canceled)
+    """
+
+
+class QueuedBuildStarted(QueueEvent):
+    def __init__(self, queued_build, wait_time):
+        super(QueuedBuildStarted, self).__init__(queued_build)
+        self.wait_time = wait_time
+
+    def __repr__(self):
+        return '<%s.%s: queued_build=%r wait_time=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.queued_build,
+            self.wait_time)
+
+
+class RollingPercentiles(object):
+    """
+    Percentiles (nearest-rank) over the last `window` values
+    """
+
+    def __init__(self, window=1000):
+        self.values = collections.deque(maxlen=window)
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, value):
+        self.values.append(value)
+
+    def percentile(self, p):
+        return self.percentiles([p])[p]
+
+    def percentiles(self, ps=(50, 90, 99)):
+        if not self.values:
+            return dict((p, None) for p in ps)
+        values = sorted(self.values)
+        ret = {}
+        for p in ps:
+            rank = int(math.ceil(p / 100.0 * len(values)))
+            ret[p] = values[max(rank, 1) - 1]
+        return ret
+
+
+class QueueMonitor(object):
+    """
+    Diff successive snapshots of the build queue
+
+    Each `poll` fetches the queue with a minimal `fields=` projection and
+    compares it with the previous snapshot (keyed by queued build id),
+    returning `QueuedBuildAdded`, `QueuedBuildStarted` and
+    `QueuedBuildRemoved` events. Wait times (seconds from queuing to
+    start) of started builds are kept in `RollingPercentiles` per build
+    type (`wait_times_by_build_type`) and per the last wait reason seen
+    while queued (`wait_times_by_reason`). The builds that left the queue
+    are looked up together through `item:(id:...)` locators, `chunk_size`
+    ids per request.
+    """
+
+    def __init__(self, teamcity, query_set=None, window=1000,
+                 chunk_size=100):
+        self.teamcity = teamcity
+        if query_set is None:
+            query_set = QueuedBuildQuerySet(teamcity)
+        self.query_set = query_set
+        self.window = window
+        self.chunk_size = chunk_size
+        self.snapshot = None
+        self.wait_times_by_build_type = collections.defaultdict(
+            lambda: RollingPercentiles(window))
+        self.wait_times_by_reason = collections.defaultdict(
+            lambda: RollingPercentiles(window))
+
+    def __repr__(self):
+        return '<%s.%s: queued=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            len(self.snapshot or {}))
+
+    def _fetch_snapshot(self):
+        query_set = self.query_set._clone()
+        query_set.fields('count,nextHref,build(%s)' % QUEUE_FIELDS)
+        snapshot = collections.OrderedDict()
+        for page in query_set._pages():
+            for d in page.get('build', []):
+                snapshot[d['id']] = QueuedBuild.from_dict(
+                    d, teamcity=self.teamcity)
+        return snapshot
+
+    def _fetch_build(self, build_id):
+        query_set = BuildQuerySet(self.teamcity).fields(STARTED_FIELDS)
+        try:
+            return query_set.get(id=build_id)._data_dict
+        except exceptions.HTTPError as e:
+            if e.status_code != 404:
+                raise
+
+    def _fetch_builds(self, ids):
+        """
+        Data of the builds with `ids` as a dict by id, leaving out those
+        that no longer exist
+        """
+        ret = {}
+        for i in range(0, len(ids), self.chunk_size):
+            chunk = ids[i:i + self.chunk_size]
+            query_set = BuildQuerySet(self.teamcity).fields(
+                'count,nextHref,build(%s)' % STARTED_FIELDS)
+            for build_id in chunk:
+                query_set._add_pred('item', '(id:%s)' % build_id)
+            try:
+                for page in query_set._pages():
+                    for d in page.get('build', []):
+                        ret[d['id']] = d
+                continue
+            except exceptions.HTTPError as e:
+                if e.status_code != 404:
+                    raise
+            # At least one build is gone; look them up one by one
+            for build_id in chunk:
+                d = self._fetch_build(build_id)
+                if d is not None:
+                    ret[build_id] = d
+        return ret
+
+    def _left_queue(self, queued_build, d):
+        if (d is None or 'canceledInfo' in d or not d.get('startDate') or
+                d.get('state') not in ('running', 'finished')):
+            return QueuedBuildRemoved(queued_build)
+
+        start_date = parse_date_string(d['startDate'])
+        queued_date = parse_date_string(
+            d.get('queuedDate') or queued_build.queued_date_string)
+        wait_time = (start_date - queued_date).total_seconds()
+        self.wait_times_by_build_type[queued_build.build_type_id].add(
+            wait_time)
+        reason = queued_build._data_dict.get('waitReason')
+        if reason:
+            self.wait_times_by_reason[reason].add(wait_time)
+        return QueuedBuildStarted(queued_build, wait_time)
+
+    def poll(self):
+        """
+        Fetch the queue and return the events since the previous poll
+
+        The first poll only records the snapshot.
+        """
+        snapshot = self._fetch_snapshot()
+        previous, self.snapshot = self.snapshot, snapshot
+        if previous is None:
+            return []
+
+        events = []
+        for build_id, queued_build in snapshot.items():
+            if build_id not in previous:
+                events.append(QueuedBuildAdded(queued_build))
+        left = [queued_build for build_id, queued_build in previous.items()
+                if build_id not in snapshot]
+        builds = self._fetch_builds([queued_build.id for queued_build in left])
+        for queued_build in left:
+            events.append(
+                self._left_queue(queued_build, builds.get(queued_build.id)))
+        return events
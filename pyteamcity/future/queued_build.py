@@ -1,3 +1,10 @@
+import collections
+import json
+from xml.sax.saxutils import quoteattr
+
+import six
+
+from .core.concurrency import run_concurrently
 from .core.parameter import Parameter
 from .core.queryset import QuerySet
 from .core.utils import parse_date_string, raise_on_status
@@ -81,9 +88,9 @@ class QueuedBuild(WebBrowsable):
     def cancel(self, comment):
         xml = """
             <buildCancelRequest
-               comment='{comment}'
+               comment={comment}
                readdIntoQueue='false' />
-            """.format(comment=comment)
+            """.format(comment=quoteattr(comment))
         url = self.teamcity.base_base_url + self.href
         res = self.teamcity.session.post(
             url=url,
@@ -96,6 +103,7 @@ class QueuedBuild(WebBrowsable):
 class QueuedBuildQuerySet(QuerySet):
     uri = '/app/rest/buildQueue/'
     _entity_factory = QueuedBuild
+    _list_key = 'build'
 
     def filter(self,
                id=None,
@@ -124,21 +132,31 @@ class QueuedBuildQuerySet(QuerySet):
         return (self._entity_factory.from_dict(d, self)
                 for d in self._data().get('build', []))
 
+    def monitor(self, **kwargs):
+        """
+        `QueueMonitor` diffing snapshots of the matching queued builds
+        """
+        from .queue_monitor import QueueMonitor
+
+        return QueueMonitor(self.teamcity, query_set=self, **kwargs)
+
     def trigger_build(self,
                       build_type_id, branch=None, comment=None,
                       parameters=None, agent_id=None):
         """
         Trigger a new build
         """
-        url = self.teamcity.base_url + self.uri
-        data = self._get_build_node(
-            build_type_id, branch,
-            comment, parameters, agent_id)
+        template = BuildRequestTemplate(
+            build_type_id, branch=branch, comment=comment,
+            parameters=parameters, agent_id=agent_id)
+        return self._post_build(template.body())
 
+    def _post_build(self, body):
+        url = self.teamcity.base_url + self.uri
         res = self.teamcity.session.post(
             url,
-            headers={'Content-Type': 'application/xml'},
-            data=data)
+            headers={'Content-Type': 'application/json'},
+            data=body)
         raise_on_status(res)
 
         queued_build_data = res.json()
@@ -147,35 +165,143 @@ class QueuedBuildQuerySet(QuerySet):
             teamcity=self.teamcity)
         return queued_build
 
-    def _get_build_node(
-            self,
-            build_type_id, branch=None,
-            comment=None, parameters=None, agent_id=None):
-        build_attributes = ''
+    def build_template(self, build_type_id, branch=None, comment=None,
+                       parameters=None, agent_id=None):
+        """
+        Precompiled request body shared by many `trigger_builds` items
+        """
+        return BuildRequestTemplate(
+            build_type_id, branch=branch, comment=comment,
+            parameters=parameters, agent_id=agent_id)
 
-        if branch:
-            build_attributes = 'branchName="%s"' % branch
+    def trigger_builds(self, builds, template=None, workers=8):
+        """
+        Trigger many builds concurrently
 
-        if build_attributes:
-            data = '<build %s>\n' % build_attributes
-        else:
-            data = '<build>\n'
+        Each item of `builds` is a dict of `trigger_build` keyword arguments
+        (or just a build type id). With a `template`, items only need the
+        values that differ from it; their `parameters` are added to the
+        template's ones. Returns a `Result` per item, in order, holding the
+        `QueuedBuild` or the exception raised for that item.
+        """
+        def trigger(item):
+            if not isinstance(item, dict):
+                item = {'build_type_id': item}
+            if template is not None:
+                body = template.body(**item)
+            else:
+                body = BuildRequestTemplate(**item).body()
+            return self._post_build(body)
 
-        data += '    <buildType id="%s"/>\n' % build_type_id
+        return run_concurrently(trigger, builds, workers=workers,
+                                rate_limiter=self.teamcity.rate_limiter)
 
-        if agent_id:
-            data += '    <agent id="%s"/>\n' % agent_id
+    def cancel_all(self, comment, workers=8):
+        """
+        Cancel all matching queued builds concurrently, within the rate limit
+        of the `TeamCity` instance
 
-        if comment:
-            data += '    <comment><text>%s</text></comment>\n' % comment
+        Returns a `CancelReport`; builds that left the queue before they
+        could be canceled are listed as `gone`.
+        """
+        query_set = self._clone().fields('count,nextHref,build(id,href)')
+        queued_builds = [
+            QueuedBuild.from_dict(d, query_set)
+            for page in query_set._pages()
+            for d in page.get('build', [])]
+        results = run_concurrently(
+            lambda queued_build: queued_build.cancel(comment),
+            queued_builds, workers=workers,
+            rate_limiter=self.teamcity.rate_limiter)
+        return CancelReport(results)
 
-        if parameters:
-            data += '    <properties>\n'
-            data += ''.join([
-                '        <property name="%s" value="%s"/>\n' % (name, value)
-                for name, value in parameters.items()])
-            data += '    </properties>\n'
 
-        data += '</build>\n'
+class CancelReport(object):
+    def __init__(self, results):
+        self.results = results
+        self.canceled = []
+        self.gone = []
+        self.errors = {}
+        for result in results:
+            build_id = result.item.id
+            if result.ok:
+                self.canceled.append(build_id)
+            elif getattr(result.error, 'status_code', None) == 404:
+                self.gone.append(build_id)
+            else:
+                self.errors[build_id] = result.error
+
+    def __repr__(self):
+        return '<%s.%s: canceled=%r gone=%r errors=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            len(self.canceled),
+            len(self.gone),
+            len(self.errors))
+
+
+class BuildRequestTemplate(object):
+    """
+    JSON body of a `/buildQueue` POST, serialized once
 
-        return data
+    `body()` returns the cached body; overrides only serialize the parts
+    that differ and splice them with the precompiled fragments.
+    """
+
+    def __init__(self, build_type_id, branch=None, comment=None,
+                 parameters=None, agent_id=None):
+        self.build_type_id = build_type_id
+        self.branch = branch
+        self.comment = comment
+        self.agent_id = agent_id
+        self.parameters = dict(parameters or {})
+        self._build_type_json = json.dumps({'id': build_type_id})
+        self._property_json = collections.OrderedDict(
+            (name, self._property(name, value))
+            for name, value in sorted(self.parameters.items()))
+        self._body = self._render(
+            branch, comment, agent_id, self._property_json)
+
+    def __repr__(self):
+        return '<%s.%s: build_type_id=%r parameters=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.build_type_id,
+            sorted(self.parameters))
+
+    @staticmethod
+    def _property(name, value):
+        return json.dumps({'name': name, 'value': six.text_type(value)})
+
+    def _render(self, branch, comment, agent_id, property_json):
+        parts = ['"buildType": ' + self._build_type_json]
+        if branch:
+            parts.append('"branchName": ' + json.dumps(branch))
+        if agent_id:
+            parts.append('"agent": ' + json.dumps({'id': agent_id}))
+        if comment:
+            parts.append('"comment": ' + json.dumps({'text': comment}))
+        if property_json:
+            parts.append('"properties": {"property": [%s]}'
+                         % ', '.join(property_json.values()))
+        return '{' + ', '.join(parts) + '}'
+
+    def body(self, build_type_id=None, branch=None, comment=None,
+             parameters=None, agent_id=None):
+        if build_type_id not in (None, self.build_type_id):
+            raise ValueError(
+                'Template is for build type %r, not %r'
+                % (self.build_type_id, build_type_id))
+        if branch is comment is parameters is agent_id is None:
+            return self._body
+
+        property_json = self._property_json
+        if parameters:
+            property_json = collections.OrderedDict(property_json)
+            for name, value in sorted(parameters.items()):
+                property_json[name] = self._property(name, value)
+        return self._render(
+            self.branch if branch is None else branch,
+            self.comment if comment is None else comment,
+            self.agent_id if agent_id is None else agent_id,
+            property_json)
@@ -2,16 +2,19 @@ import os
 
 import requests
 
+from .core.concurrency import RateLimiter
 from .core.manager import Manager
 from .core.utils import parse_date_string, raise_on_status
 
 from .agent import AgentQuerySet
 from .agent_pool import AgentPoolQuerySet
 from .build import BuildQuerySet
+from .build_waiter import BuildWaiter
 from .build_type import BuildTypeQuerySet
 from .change import ChangeQuerySet
 from .project import ProjectQuerySet
 from .queued_build import QueuedBuildQuerySet
+from .test_occurrence import TestOccurrenceQuerySet
 from .user import UserQuerySet
 from .user_group import UserGroupQuerySet
 from .vcs_root import VCSRootQuerySet
@@ -42,11 +45,14 @@ class TeamCity(object):
     protocol = None
     session = None
     projects = None
+    artifact_cache = None
+    rate_limiter = None
+    statistics_cache = None
 
     def __init__(self,
                  username=None, password=None,
                  protocol='http', server='127.0.0.1', port=None,
-                 session=None):
+                 session=None, artifact_cache=None, rate_limit=None):
         self.username = username
         self.password = password
         self.protocol = protocol
@@ -55,6 +61,12 @@ class TeamCity(object):
         self.session = session or requests.Session()
         self.session.auth = (username, password)
         self.session.headers['Accept'] = 'application/json'
+        self.artifact_cache = artifact_cache
+        # Requests per second allowed for bulk (concurrent) operations
+        if rate_limit:
+            self.rate_limiter = RateLimiter(rate_limit)
+        # Statistics of finished builds, by build id
+        self.statistics_cache = {}
         self.projects = Manager(
             teamcity=self,
             query_set_factory=ProjectQuerySet)
@@ -85,6 +97,9 @@ class TeamCity(object):
         self.changes = Manager(
             teamcity=self,
             query_set_factory=ChangeQuerySet)
+        self.test_occurrences = Manager(
+            teamcity=self,
+            query_set_factory=TestOccurrenceQuerySet)
 
         self.base_base_url = "%s://%s" % (
             self.protocol, self.server)
@@ -111,6 +126,16 @@ class TeamCity(object):
             password=os.environ.get('TEAMCITY_PASSWORD'),
             server=os.environ.get('TEAMCITY_HOST'))
 
+    def wait_for_builds(self, builds, timeout=None, poll=5.0, **kwargs):
+        """
+        `BuildWaiter` for `builds` (queued builds, builds or ids)
+
+        Iterate over it to get each build as it changes state, or call its
+        `wait()` method for the final builds.
+        """
+        return BuildWaiter(self, builds, timeout=timeout, poll=poll,
+                           **kwargs)
+
     def plugins(self):
         url = self.base_url + '/app/rest/server/plugins'
         res = self.session.get(url)
@@ -0,0 +1,220 @@
+import array
+
+from .core.queryset import QuerySet
+
+HISTORY_FIELDS = 'count,nextHref,testOccurrence(status,test(id,name),build(id))'
+
+_OUTCOMES = {'SUCCESS': 1, 'FAILURE': 0}
+
+
+class TestOccurrence(object):
+    __test__ = False  # not a pytest test class
+
+    def __init__(self, id, name, status, duration,
+                 test_id, build_id, href,
+                 query_set, data_dict=None):
+        self.id = id
+        self.name = name
+        self.status = status
+        self.duration = duration
+        self.test_id = test_id
+        self.build_id = build_id
+        self.href = href
+        self.query_set = query_set
+        self._data_dict = data_dict
+
+    def __repr__(self):
+        return '<%s.%s: name=%r status=%r build_id=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            self.name,
+            self.status,
+            self.build_id)
+
+    @classmethod
+    def from_dict(cls, d, query_set=None):
+        return cls(
+            id=d.get('id'),
+            name=d.get('name') or d.get('test', {}).get('name'),
+            status=d.get('status'),
+            duration=d.get('duration'),
+            test_id=d.get('test', {}).get('id'),
+            build_id=d.get('build', {}).get('id'),
+            href=d.get('href'),
+            query_set=query_set,
+            data_dict=d)
+
+
+class TestHistory(object):
+    """
+    Pass/fail history of many tests, stored compactly
+
+    Every test keeps an `array` of build ids and a `bytearray` of outcomes
+    (1 passed, 0 failed); occurrences with another status (e.g. ignored
+    tests) are skipped. Nothing else is retained per occurrence.
+    """
+    __test__ = False
+
+    def __init__(self):
+        self.names = {}
+        self._build_ids = {}
+        self._outcomes = {}
+        self._sorted = set()
+
+    def __repr__(self):
+        return '<%s.%s: tests=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            len(self.names))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, test_id):
+        return test_id in self.names
+
+    def add(self, test_id, name, build_id, status):
+        outcome = _OUTCOMES.get(status)
+        if outcome is None:
+            return
+        if test_id not in self.names:
+            self.names[test_id] = name
+            self._build_ids[test_id] = array.array('l')
+            self._outcomes[test_id] = bytearray()
+        self._build_ids[test_id].append(build_id)
+        self._outcomes[test_id].append(outcome)
+        self._sorted.discard(test_id)
+
+    def add_page(self, page):
+        for d in page.get('testOccurrence', []):
+            test = d.get('test', {})
+            self.add(test.get('id'), test.get('name'),
+                     d.get('build', {}).get('id'), d.get('status'))
+
+    def outcomes(self, test_id):
+        """
+        Outcomes of `test_id` (1 passed, 0 failed) from the oldest build to
+        the newest
+        """
+        if test_id not in self._sorted:
+            pairs = sorted(zip(self._build_ids[test_id],
+                               self._outcomes[test_id]))
+            self._build_ids[test_id] = array.array(
+                'l', (build_id for build_id, _ in pairs))
+            self._outcomes[test_id] = bytearray(
+                outcome for _, outcome in pairs)
+            self._sorted.add(test_id)
+        return self._outcomes[test_id]
+
+    def runs(self, test_id):
+        return len(self._outcomes[test_id])
+
+    def failures(self, test_id):
+        outcomes = self._outcomes[test_id]
+        return len(outcomes) - sum(outcomes)
+
+    def flips(self, test_id):
+        """
+        Number of times `test_id` went from passing to failing or back
+        """
+        outcomes = self.outcomes(test_id)
+        return sum(1 for i in range(1, len(outcomes))
+                   if outcomes[i] != outcomes[i - 1])
+
+    def flip_rate(self, test_id):
+        """
+        Flips per pair of consecutive runs, between 0 (stable) and 1 (flips
+        every time)
+        """
+        runs = self.runs(test_id)
+        if runs < 2:
+            return 0.0
+        return self.flips(test_id) / float(runs - 1)
+
+    def current_failure_streak(self, test_id):
+        """
+        Number of consecutive failures up to the newest build
+        """
+        streak = 0
+        for outcome in reversed(self.outcomes(test_id)):
+            if outcome:
+                break
+            streak += 1
+        return streak
+
+    def longest_failure_streak(self, test_id):
+        longest = streak = 0
+        for outcome in self.outcomes(test_id):
+            streak = 0 if outcome else streak + 1
+            longest = max(longest, streak)
+        return longest
+
+    def flaky(self, min_flip_rate=0.1, min_runs=5):
+        """
+        `(test_id, flip_rate)` of tests with at least `min_runs` runs that
+        flip at least `min_flip_rate` of the time, flakiest first
+        """
+        ret = []
+        for test_id in self.names:
+            if self.runs(test_id) < min_runs:
+                continue
+            rate = self.flip_rate(test_id)
+            if rate >= min_flip_rate:
+                ret.append((test_id, rate))
+        return sorted(ret, key=lambda item: (-item[1], item[0]))
+
+
+class TestOccurrenceQuerySet(QuerySet):
+    __test__ = False
+    uri = '/app/rest/testOccurrences/'
+    _entity_factory = TestOccurrence
+    _list_key = 'testOccurrence'
+
+    def filter(self,
+               build=None, build_type=None, test=None, status=None,
+               affected_project=None, muted=None, currently_failing=None,
+               start=None, count=None):
+        if build is not None:
+            self._add_pred('build', build)
+        if build_type is not None:
+            self._add_pred('buildType', build_type)
+        if test is not None:
+            self._add_pred('test', test)
+        if status is not None:
+            self._add_pred('status', status)
+        if affected_project is not None:
+            self._add_pred('affectedProject', affected_project)
+        if muted is not None:
+            self._add_pred('muted', muted)
+        if currently_failing is not None:
+            self._add_pred('currentlyFailing', currently_failing)
+        if start is not None:
+            self._add_pred('start', start)
+        if count is not None:
+            self._add_pred('count', count)
+        return self
+
+    def __iter__(self):
+        # Stream page by page instead of loading every occurrence first
+        for page in self._pages():
+            for d in page.get('testOccurrence', []):
+                yield TestOccurrence.from_dict(d, self)
+
+    def _iter_all(self):
+        return iter(self)
+
+    def history(self, history=None, page_size=1000):
+        """
+        Fold the matching occurrences into a `TestHistory` (a new one, or
+        `history` to extend it), one page of `page_size` at a time with a
+        minimal `fields=` projection
+        """
+        if history is None:
+            history = TestHistory()
+        query_set = self._clone()
+        if page_size and 'count' not in query_set._locator:
+            query_set._add_pred('count', page_size)
+        query_set.fields(HISTORY_FIELDS)
+        for page in query_set._pages():
+            history.add_page(page)
+        return history
@@ -1,3 +1,4 @@
+import pytest
 import responses
 
 from pyteamcity.future import TeamCity
@@ -166,3 +167,122 @@ def test_unit_filter_by_enabled():
 
     agents = tc.agents.all().filter(enabled=False)
     assert agents._get_url().endswith('/agents/?locator=enabled:False')
+
+
+def test_unit_get_url_from_href():
+    agent = Agent.from_dict(
+        {'id': 34, 'href': '/guestAuth/app/rest/agents/id:34'},
+        AgentQuerySet(tc))
+    assert agent._get_url() == tc.relative_url('app/rest/agents/id:34')
+
+
+@responses.activate
+def test_unit_bulk_update_and_delete():
+    agents_json = {
+        "count": 3,
+        "agent": [
+            {"id": 69, "name": "tcagent101",
+             "href": "/guestAuth/app/rest/agents/id:69"},
+            {"id": 67, "name": "tcagent102",
+             "href": "/guestAuth/app/rest/agents/id:67"},
+            {"id": 70, "name": "tcagent103",
+             "href": "/guestAuth/app/rest/agents/id:70"},
+        ],
+    }
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/agents/'),
+        json=agents_json, status=200,
+        content_type='application/json',
+    )
+    for agent_id, status in [(69, 200), (67, 200), (70, 500)]:
+        responses.add(
+            responses.PUT,
+            tc.relative_url('app/rest/agents/id:%d/enabled' % agent_id),
+            body='false', status=status,
+            content_type='text/plain',
+        )
+        responses.add(
+            responses.DELETE,
+            tc.relative_url('app/rest/agents/id:%d' % agent_id),
+            body='', status=status,
+        )
+
+    # Mass changes need an explicit query set
+    for name in ('update', 'delete'):
+        with pytest.raises(AttributeError):
+            getattr(tc.agents, name)
+    assert callable(tc.agents.all().delete)
+    with pytest.raises(AttributeError):
+        tc.queued_builds.cancel_all
+
+    agents = tc.agents.filter(connected=True)
+    with pytest.raises(ValueError):
+        agents.update()
+    assert len(responses.calls) == 0
+    plan = agents.update(enabled=False, dry_run=True)
+    assert [req.url for req in plan] == [
+        tc.relative_url('app/rest/agents/id:%d/enabled' % agent_id)
+        for agent_id in (69, 67, 70)]
+    assert all(req.body == 'false' for req in plan)
+    assert len(responses.calls) == 1
+    assert 'connected:True' in responses.calls[0].request.url
+    assert 'fields=count,nextHref,agent(id,name,href)' in \
+        responses.calls[0].request.url
+
+    results = tc.agents.filter(connected=True).update(
+        enabled=False, workers=3)
+    assert [r.item.id for r in results] == [69, 67, 70]
+    assert [r.ok for r in results] == [True, True, False]
+
+    plan = tc.agents.all().delete(dry_run=True)
+    assert [req.method for req in plan] == ['DELETE'] * 3
+    results = tc.agents.all().delete()
+    assert [r.item.name for r in results if not r.ok] == ['tcagent103']
+
+
+@responses.activate
+def test_unit_utilization():
+    default_pool = {"id": 0, "name": "Default"}
+    linux_pool = {"id": 1, "name": "Linux"}
+    agents_json = {
+        "count": 5,
+        "agent": [
+            {"id": 1, "name": "a1", "enabled": True, "connected": True,
+             "authorized": True, "pool": default_pool,
+             "build": {"id": 10, "buildTypeId": "Dummysvc_Py27",
+                       "state": "running"}},
+            {"id": 2, "name": "a2", "enabled": True, "connected": True,
+             "authorized": True, "pool": default_pool,
+             "build": {"id": 11, "buildTypeId": "Dummysvc_Py27",
+                       "state": "running"}},
+            {"id": 3, "name": "a3", "enabled": True, "connected": True,
+             "authorized": True, "pool": linux_pool,
+             "build": {"id": 12, "buildTypeId": "Other",
+                       "state": "running"}},
+            {"id": 4, "name": "a4", "enabled": True, "connected": True,
+             "authorized": True, "pool": linux_pool},
+            {"id": 5, "name": "a5", "enabled": False, "connected": True,
+             "authorized": True, "pool": linux_pool},
+        ],
+    }
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/agents/'),
+        json=agents_json, status=200,
+        content_type='application/json',
+    )
+
+    utilization = tc.agents.utilization()
+    assert len(responses.calls) == 1
+    assert 'build(id,buildTypeId,state)' in responses.calls[0].request.url
+    assert utilization.num_total == 5
+    assert utilization.num_busy == 3
+    assert utilization.num_idle == 1
+    assert [agent.name for agent in utilization.idle] == ['a4']
+    assert [agent.name for agent in utilization.unavailable] == ['a5']
+    assert utilization.by_build_type == {'Dummysvc_Py27': 2, 'Other': 1}
+    assert utilization.by_pool['Default'] == {'busy': 2}
+    assert utilization.by_pool['Linux'] == {
+        'busy': 1, 'idle': 1, 'unavailable': 1}
+    assert 'busy=3' in repr(utilization)
@@ -2,6 +2,7 @@ import pytest
 import responses
 
 from pyteamcity.future import exceptions, TeamCity
+from pyteamcity.future.artifact import Artifact
 
 tc = TeamCity()
 
@@ -299,3 +300,195 @@ def test_listdir_failure():
             status=500,
         )
         build.artifacts.listdir('listdir_failure_*')
+
+
+def _make_zip(files, seekable=True):
+    import io
+    import zipfile
+
+    class Unseekable(io.RawIOBase):
+        def __init__(self):
+            self.buf = io.BytesIO()
+
+        def writable(self):
+            return True
+
+        def write(self, b):
+            return self.buf.write(b)
+
+    out = io.BytesIO() if seekable else Unseekable()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, content in files:
+            zf.writestr(name, content)
+    return out.getvalue() if seekable else out.buf.getvalue()
+
+
+def _add_dir_artifact(build_id=1216841):
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/builds/id:%d' % build_id),
+        json={"id": build_id, "href": "/guestAuth/app/rest/builds/id:%d" % build_id},
+        status=200, content_type='application/json',
+    )
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/builds/id:%d/artifacts/metadata/dist' % build_id),
+        json={"name": "dist", "modificationTime": "20160810T172802-0700"},
+        status=200, content_type='application/json',
+    )
+    build = tc.builds.all().get(id=build_id)
+    return Artifact(build=build, path='dist')
+
+
+def _listing(names, size):
+    prefix = '/guestAuth/app/rest/builds/id:1216841/artifacts/content/'
+    return {
+        "count": len(names),
+        "file": [{"name": name.split('/')[-1], "fullName": 'dist/' + name,
+                  "size": size,
+                  "content": {"href": prefix + 'dist/' + name}}
+                 for name in names] + [{"name": "sub", "fullName": "dist/sub"}],
+    }
+
+
+@responses.activate
+def test_download_archive_mode(tmpdir):
+    names = ['f%d.txt' % i for i in range(12)] + ['sub/g.txt']
+    files = [(name, ('content of %s' % name).encode()) for name in names]
+    dist = _add_dir_artifact()
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/builds/id:1216841/artifacts/children/dist'),
+        json=_listing(names, 20), status=200,
+        content_type='application/json',
+    )
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/builds/id:1216841/artifacts/archived/dist'),
+        body=_make_zip(files, seekable=False), status=200,
+        content_type='application/zip',
+    )
+
+    dest = str(tmpdir.join('out'))
+    paths = dist.download(dest, pattern='**/*.txt')
+    assert len(paths) == len(names)
+    assert tmpdir.join('out', 'sub', 'g.txt').read() == 'content of sub/g.txt'
+    assert 'archived' in responses.calls[-1].request.url
+    assert 'pattern' in responses.calls[-1].request.url
+
+
+@responses.activate
+def test_download_file_mode(tmpdir):
+    names = ['big.bin', 'sub/other.bin']
+    dist = _add_dir_artifact()
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/builds/id:1216841/artifacts/children/dist'),
+        json=_listing(names, 50 * 1024 * 1024), status=200,
+        content_type='application/json',
+    )
+    for name in names:
+        responses.add(
+            responses.GET,
+            tc.relative_url('app/rest/builds/id:1216841'
+                            '/artifacts/content/dist/' + name),
+            body=name.encode(), status=200,
+        )
+
+    paths = dist.download(str(tmpdir))
+    assert sorted(paths) == sorted(str(tmpdir.join(n)) for n in names)
+    assert tmpdir.join('sub', 'other.bin').read() == 'sub/other.bin'
+
+    # Into the current directory
+    with tmpdir.mkdir('cwd').as_cwd():
+        assert sorted(dist.download('.')) == sorted(names)
+    assert tmpdir.join('cwd', 'sub', 'other.bin').read() == 'sub/other.bin'
+
+    with pytest.raises(ValueError):
+        dist.download(str(tmpdir), mode='bogus')
+
+
+def test_iter_zip_entries():
+    from pyteamcity.future.core.zip_stream import iter_zip_entries
+
+    files = [('a.txt', b'a' * 1000), ('dir/', b''), ('dir/b.txt', b'bbb')]
+    for seekable in (True, False):
+        data = _make_zip(files, seekable=seekable)
+        chunks = [data[i:i + 7] for i in range(0, len(data), 7)]
+        got = [(entry.name, b''.join(content))
+               for entry, content in iter_zip_entries(chunks)]
+        assert got == files
+
+    data = bytearray(_make_zip(files))
+    data[40] ^= 0xff
+    with pytest.raises(exceptions.ArchiveError):
+        list(iter_zip_entries([bytes(data)]))
+    with pytest.raises(exceptions.ArchiveError):
+        for entry, content in iter_zip_entries([bytes(data)[:50]]):
+            list(content)
+
+
+def test_iter_zip_entries_zip64_stored():
+    import io
+    import zipfile
+
+    from pyteamcity.future.core.zip_stream import iter_zip_entries
+
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_STORED) as zf:
+        with zf.open('big.bin', 'w', force_zip64=True) as f:
+            f.write(b'x' * 100)
+        zf.writestr('small.txt', b'abc')
+    data = out.getvalue()
+    # The local header only has placeholders; the sizes are in the extra
+    assert b'\xff\xff\xff\xff' in data[:30]
+    got = [(entry.name, entry.zip64, b''.join(content))
+           for entry, content in iter_zip_entries([data])]
+    assert got == [('big.bin', True, b'x' * 100),
+                   ('small.txt', False, b'abc')]
+
+
+def _local_entry(name, content, descriptor_format):
+    # Deflated entry with a data descriptor and no ZIP64 extra field, as
+    # written by Java's ZipOutputStream
+    import struct
+    import zlib
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    compressed = compressor.compress(content) + compressor.flush()
+    crc = zlib.crc32(content) & 0xffffffff
+    header = struct.pack('<4sHHHHHIIIHH', b'PK\x03\x04', 20, 0x08, 8, 0, 0,
+                         0, 0, 0, len(name), 0)
+    descriptor = b'PK\x07\x08' + struct.pack(
+        descriptor_format, crc, len(compressed), len(content))
+    return header + name.encode() + compressed + descriptor
+
+
+def test_iter_zip_entries_zip64_data_descriptor():
+    from pyteamcity.future.core.zip_stream import iter_zip_entries
+
+    data = (_local_entry('a.bin', b'a' * 1000, '<IQQ') +
+            _local_entry('b.txt', b'bbb', '<III') +
+            _local_entry('c.txt', b'c' * 10, '<IQQ') +
+            b'PK\x05\x06' + b'\0' * 18)
+    chunks = [data[i:i + 5] for i in range(0, len(data), 5)]
+    got = [(entry.name, b''.join(content))
+           for entry, content in iter_zip_entries(chunks)]
+    assert got == [('a.bin', b'a' * 1000), ('b.txt', b'bbb'),
+                   ('c.txt', b'c' * 10)]
+
+
+def test_safe_join_rejects_escaping_paths():
+    from pyteamcity.future.artifact import _safe_join
+
+    assert _safe_join('out', 'a/b.txt') == 'out/a/b.txt'
+    assert _safe_join('.', 'a/b.txt') == 'a/b.txt'
+    assert _safe_join('/', 'a/b.txt') == '/a/b.txt'
+    with pytest.raises(exceptions.ArchiveError):
+        _safe_join('out', '../etc/passwd')
+    with pytest.raises(exceptions.ArchiveError):
+        _safe_join('out', '/etc/passwd')
+    with pytest.raises(exceptions.ArchiveError):
+        _safe_join('.', '../b.txt')
+    with pytest.raises(exceptions.ArchiveError):
+        _safe_join('out', '../outside/b.txt')
@@ -0,0 +1,214 @@
+import os
+import time
+
+import mock
+import pytest
+import responses
+
+from pyteamcity.future import TeamCity
+from pyteamcity.future.artifact import Artifact
+from pyteamcity.future.artifact_cache import ArtifactCache
+
+
+def _add_file_artifact(tc, state='finished'):
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/builds/id:1216841'),
+        json={"id": 1216841, "state": state,
+              "href": "/guestAuth/app/rest/builds/id:1216841"},
+        status=200, content_type='application/json',
+    )
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/builds/id:1216841'
+                        '/artifacts/metadata/app.tar.gz'),
+        json={"name": "app.tar.gz", "size": 7,
+              "modificationTime": "20160810T172802-0700",
+              "content": {"href": "/guestAuth/app/rest/builds/id:1216841"
+                                  "/artifacts/content/app.tar.gz"}},
+        status=200, content_type='application/json',
+    )
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/builds/id:1216841'
+                        '/artifacts/content/app.tar.gz'),
+        body=b'tarball', status=200,
+    )
+    build = tc.builds.all().get(id=1216841)
+    return Artifact(build=build, path='app.tar.gz')
+
+
+def _content_calls():
+    return [call for call in responses.calls
+            if '/artifacts/content/' in call.request.url]
+
+
+@responses.activate
+def test_content_is_served_from_cache(tmpdir):
+    cache = ArtifactCache(str(tmpdir.join('cache')))
+    tc = TeamCity(artifact_cache=cache)
+    artifact = _add_file_artifact(tc)
+
+    assert artifact.content() == b'tarball'
+    assert artifact.content() == b'tarball'
+    assert len(_content_calls()) == 1
+
+    dest = str(tmpdir.join('deploy', 'app.tar.gz'))
+    assert artifact.download(dest) == [dest]
+    assert open(dest, 'rb').read() == b'tarball'
+    assert len(_content_calls()) == 1
+
+
+@responses.activate
+def test_running_builds_are_not_cached(tmpdir):
+    cache = ArtifactCache(str(tmpdir.join('cache')))
+    tc = TeamCity(artifact_cache=cache)
+    artifact = _add_file_artifact(tc, state='running')
+
+    artifact.content()
+    artifact.content()
+    assert len(_content_calls()) == 2
+    assert cache.entries() == []
+
+
+def _add_dir_artifact(tc, names):
+    import io
+    import zipfile
+
+    prefix = '/guestAuth/app/rest/builds/id:1216841/artifacts/content/'
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/builds/id:1216841'),
+        json={"id": 1216841, "state": "finished",
+              "href": "/guestAuth/app/rest/builds/id:1216841"},
+        status=200, content_type='application/json',
+    )
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/builds/id:1216841/artifacts/metadata/dist'),
+        json={"name": "dist", "modificationTime": "20160810T172802-0700"},
+        status=200, content_type='application/json',
+    )
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/builds/id:1216841/artifacts/children/dist'),
+        json={"file": [{"name": name, "fullName": 'dist/' + name, "size": 5,
+                        "modificationTime": "20160810T172802-0700",
+                        "content": {"href": prefix + 'dist/' + name}}
+                       for name in names]},
+        status=200, content_type='application/json',
+    )
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as zf:
+        for name in names:
+            zf.writestr(name, name.encode())
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/builds/id:1216841/artifacts/archived/dist'),
+        body=buf.getvalue(), status=200, content_type='application/zip',
+    )
+    build = tc.builds.all().get(id=1216841)
+    return Artifact(build=build, path='dist')
+
+
+@responses.activate
+def test_archive_download_uses_cache(tmpdir):
+    cache = ArtifactCache(str(tmpdir.join('cache')))
+    tc = TeamCity(artifact_cache=cache)
+    names = ['f%d.txt' % i for i in range(12)]
+    dist = _add_dir_artifact(tc, names)
+
+    paths = dist.download(str(tmpdir.join('a')))
+    assert len(paths) == 12
+    assert 'archived' in responses.calls[-1].request.url
+    assert len(cache.entries()) == 12
+    assert tmpdir.join('a', 'f3.txt').read() == 'f3.txt'
+
+    # Everything is cached: only the listing is requested
+    num_calls = len(responses.calls)
+    paths = dist.download(str(tmpdir.join('b')), mode='archive')
+    assert sorted(paths) == sorted(str(tmpdir.join('b', n)) for n in names)
+    assert len(responses.calls) == num_calls + 1
+    assert 'children' in responses.calls[-1].request.url
+    assert tmpdir.join('b', 'f3.txt').read() == 'f3.txt'
+
+    # Only the entries missing from the cache are extracted
+    os.unlink(cache.get_path(dist._cache_key(
+        file_data=dist.list_files()[3])))
+    dest = tmpdir.join('c')
+    paths = dist.download(str(dest), mode='archive')
+    assert 'archived' in responses.calls[-1].request.url
+    assert len(paths) == 12
+    assert dest.join('f3.txt').read() == 'f3.txt'
+    assert len(cache.entries()) == 12
+
+
+@pytest.mark.parametrize('link_mode', ['hardlink', 'reflink', 'copy'])
+def test_materialize(tmpdir, link_mode):
+    cache = ArtifactCache(str(tmpdir.join('cache')), link_mode=link_mode)
+    key = cache.key('http://tc', 1, 'a/b.txt', 3, '20160810T172802-0700')
+    assert cache.materialize(key, str(tmpdir.join('x'))) is None
+
+    cache.put(key, b'abc')
+    dest = str(tmpdir.join('out', 'b.txt'))
+    assert cache.materialize(key, dest) == dest
+    assert open(dest, 'rb').read() == b'abc'
+    # Materializing again replaces the existing file
+    assert cache.materialize(key, dest) == dest
+    if link_mode == 'hardlink':
+        assert os.path.samefile(dest, cache.get_path(key))
+
+
+def test_lru_eviction(tmpdir):
+    cache = ArtifactCache(str(tmpdir), max_size=10)
+    keys = [cache.key('http://tc', 1, 'f%d' % i, 4, 't') for i in range(3)]
+
+    cache.put(keys[0], b'0000')
+    cache.put(keys[1], b'1111')
+    old = time.time() - 100
+    os.utime(cache.get_path(keys[1]), (old, old))
+    os.utime(cache.get_path(keys[0]), (old - 10, old - 10))
+    cache.get(keys[0])  # now the most recently used
+    cache.put(keys[2], b'2222')
+
+    assert cache.get(keys[0]) == b'0000'
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) == b'2222'
+    assert cache.size() == 8
+
+    cache.clear()
+    assert cache.entries() == []
+
+
+def test_eviction_does_not_scan_on_every_put(tmpdir):
+    cache = ArtifactCache(str(tmpdir), max_size=100)
+    with mock.patch.object(cache, 'entries', wraps=cache.entries) as m:
+        for i in range(20):
+            cache.put(cache.key('http://tc', 1, 'f%d' % i, 10, 't'),
+                      b'x' * 10)
+    # One scan to learn the initial size, then one per eviction; each
+    # eviction frees room for a few more entries
+    assert m.call_count < 10
+    assert cache.size() <= 100
+
+
+def test_default_link_mode_does_not_share_inodes(tmpdir):
+    cache = ArtifactCache(str(tmpdir.join('cache')))
+    assert cache.link_mode != 'hardlink'
+    key = cache.key('http://tc', 1, 'a', 3, 't')
+    cache.put(key, b'abc')
+    dest = str(tmpdir.join('b'))
+    cache.materialize(key, dest)
+    with open(dest, 'wb') as f:
+        f.write(b'xyz')
+    assert cache.get(key) == b'abc'
+
+
+def test_key_depends_on_size_and_modification_time():
+    key = ArtifactCache.key('http://tc', 1, 'a', 3, 't1')
+    assert key == ArtifactCache.key('http://tc', 1, '/a', 3, 't1')
+    assert key != ArtifactCache.key('http://tc', 1, 'a', 4, 't1')
+    assert key != ArtifactCache.key('http://tc', 1, 'a', 3, 't2')
+    assert key != ArtifactCache.key('http://tc2', 1, 'a', 3, 't1')
+    with pytest.raises(ValueError):
+        ArtifactCache('/tmp', link_mode='symlink')
@@ -1,4 +1,5 @@
 import datetime
+import json
 
 import pytest
 import responses
@@ -643,3 +644,172 @@ def test_download_build_log():
 
         with pytest.raises(exceptions.ArtifactSizeExceeded):
             build.get_build_log(content_length=log_content_length - 1)
+
+
+def _graph_build(build_id, minutes):
+    return {'id': build_id, 'buildTypeId': 'bt%d' % build_id,
+            'state': 'finished', 'status': 'SUCCESS',
+            'href': '/httpAuth/app/rest/builds/id:%d' % build_id,
+            'startDate': '20161001T100000+0000',
+            'finishDate': '20161001T10%02d00+0000' % minutes}
+
+
+@responses.activate
+def test_dependency_graph():
+    import re
+
+    # 10 -> 9 -> 7 and 10 -> 8 -> 7
+    builds = dict((build_id, _graph_build(build_id, minutes))
+                  for build_id, minutes in [(7, 10), (8, 5), (9, 20),
+                                            (10, 1)])
+    dependencies = {10: [8, 9], 9: [7], 8: [7], 7: []}
+    dependents = {7: [8, 9], 8: [10], 9: [10], 10: []}
+
+    def callback(request):
+        assert 'defaultFilter:false' in request.url
+        assert 'recursive:false' in request.url
+        match = re.search(r'snapshotDependency:\((to|from):\(id:(\d+)\)',
+                          request.url)
+        relation = dependencies if match.group(1) == 'to' else dependents
+        found = [builds[i] for i in relation[int(match.group(2))]]
+        return (200, {}, json.dumps({'count': len(found), 'build': found}))
+
+    responses.add_callback(
+        responses.GET, tc.relative_url('app/rest/builds/'),
+        callback=callback, content_type='application/json')
+
+    from pyteamcity.future.build import Build
+    root = Build.from_dict(builds[10], teamcity=tc)
+    graph = root.dependency_graph()
+    assert len(graph) == 4
+    # 7 is reached twice but only expanded once
+    assert len(responses.calls) == 4
+    assert graph.edges == [(8, 7), (9, 7), (10, 8), (10, 9)]
+    assert [b.id for b in graph.topological_order()] == [7, 8, 9, 10]
+    assert [b.id for b in graph.dependencies(10)] == [8, 9]
+    assert [b.id for b in graph.dependents(7)] == [8, 9]
+    assert [b.id for b in graph.critical_path()] == [7, 9, 10]
+    assert graph.critical_path_duration == 31 * 60
+    assert graph.builds[10] is root
+
+    responses.calls.reset()
+    graph = Build.from_dict(builds[10], teamcity=tc).dependency_graph(
+        depth=1)
+    assert sorted(b.id for b in graph) == [8, 9, 10]
+    assert len(responses.calls) == 1
+
+    graph = Build.from_dict(builds[7], teamcity=tc).dependency_graph(
+        direction='down')
+    assert graph.edges == [(8, 7), (9, 7), (10, 8), (10, 9)]
+    assert [b.id for b in graph.topological_order()] == [7, 8, 9, 10]
+
+    with pytest.raises(ValueError):
+        root.dependency_graph(direction='sideways')
+
+
+@responses.activate
+def test_dependency_graph_artifact_dependencies():
+    import re
+
+    builds = dict((build_id, _graph_build(build_id, 1))
+                  for build_id in (7, 8, 9, 10))
+    # 10 takes a snapshot of 9 and artifacts of 8 and 9; 9 artifacts of 7
+    dependencies = {
+        'snapshotDependency': {10: [9], 9: [], 8: [], 7: []},
+        'artifactDependency': {10: [8, 9], 9: [7], 8: [], 7: []},
+    }
+
+    def callback(request):
+        match = re.search(r'(\w+Dependency):\(to:\(id:(\d+)\)',
+                          request.url)
+        found = [builds[i] for i in
+                 dependencies[match.group(1)][int(match.group(2))]]
+        return (200, {}, json.dumps({'count': len(found), 'build': found}))
+
+    responses.add_callback(
+        responses.GET, tc.relative_url('app/rest/builds/'),
+        callback=callback, content_type='application/json')
+
+    from pyteamcity.future.build import Build
+    root = Build.from_dict(builds[10], teamcity=tc)
+    graph = root.dependency_graph(kind='both')
+    assert graph.typed_edges == [(9, 7, 'artifact'), (10, 8, 'artifact'),
+                                 (10, 9, 'both')]
+    assert graph.edge_kind(10, 9) == 'both'
+    assert graph.edge_kind(9, 10) is None
+
+    responses.calls.reset()
+    graph = root.dependency_graph(kind='artifact', depth=1)
+    assert graph.typed_edges == [(10, 8, 'artifact'), (10, 9, 'artifact')]
+    assert len(responses.calls) == 1
+    assert 'artifactDependency:(to:(id:10),recursive:false)' in \
+        responses.calls[0].request.url
+
+    graph = root.dependency_graph()
+    assert graph.typed_edges == [(10, 9, 'snapshot')]
+
+    with pytest.raises(ValueError):
+        root.dependency_graph(kind='source')
+
+
+@responses.activate
+def test_statistics():
+    numpy = pytest.importorskip('numpy')
+    import re
+
+    teamcity = TeamCity(username='user', password='password')
+    listing = [
+        {'id': 1, 'state': 'finished', 'href': '/httpAuth/app/rest/builds/id:1'},
+        {'id': 2, 'state': 'finished', 'href': '/httpAuth/app/rest/builds/id:2'},
+        {'id': 3, 'state': 'running', 'href': '/httpAuth/app/rest/builds/id:3'},
+    ]
+    statistics = {
+        1: [{'name': 'BuildDuration', 'value': '1000'},
+            {'name': 'FailedTestCount', 'value': '2'}],
+        2: [{'name': 'BuildDuration', 'value': '3000'}],
+        3: [{'name': 'BuildDuration', 'value': '500'}],
+    }
+
+    def builds_callback(request):
+        if 'statistics(' not in request.url:
+            return (200, {}, json.dumps({'count': 3, 'build': listing}))
+        ids = [int(i) for i in re.findall(r'item:\(id:(\d+)\)', request.url)]
+        # The server only expands statistics of build 1
+        found = []
+        for d in listing:
+            if d['id'] in ids:
+                d = dict(d)
+                if d['id'] == 1:
+                    d['statistics'] = {'property': statistics[1]}
+                found.append(d)
+        return (200, {}, json.dumps({'count': len(found), 'build': found}))
+
+    def statistics_callback(request):
+        build_id = int(re.search(r'id:(\d+)/statistics', request.url).group(1))
+        return (200, {}, json.dumps({'property': statistics[build_id]}))
+
+    responses.add_callback(
+        responses.GET, teamcity.relative_url('app/rest/builds/'),
+        callback=builds_callback, content_type='application/json')
+    responses.add_callback(
+        responses.GET,
+        re.compile(r'.*/app/rest/builds/id:\d+/statistics'),
+        callback=statistics_callback, content_type='application/json')
+
+    stats = teamcity.builds.statistics(
+        keys=['BuildDuration', 'FailedTestCount'], workers=2)
+    assert len(responses.calls) == 4
+    assert list(stats.ids) == [1, 2, 3]
+    assert list(stats['BuildDuration']) == [1000, 3000, 500]
+    assert stats['FailedTestCount'][0] == 2
+    assert numpy.isnan(stats['FailedTestCount'][1])
+    assert sorted(teamcity.statistics_cache) == [1, 2]
+
+    # Finished builds come from the cache, only the running one is fetched
+    responses.calls.reset()
+    stats = teamcity.builds.statistics(keys=['BuildDuration'])
+    assert list(stats['BuildDuration']) == [1000, 3000, 500]
+    urls = [call.request.url for call in responses.calls]
+    assert len(urls) == 3
+    assert 'item:(id:3)' in urls[1] and 'item:(id:1)' not in urls[1]
+    assert urls[2].endswith('/builds/id:3/statistics')
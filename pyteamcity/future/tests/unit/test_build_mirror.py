@@ -0,0 +1,119 @@
+import json
+
+import responses
+
+from pyteamcity.future import TeamCity
+
+tc = TeamCity()
+
+
+def _build(id, state='finished', status='SUCCESS'):
+    return {
+        "id": id, "number": str(id), "buildTypeId": "Dummysvc_Py27",
+        "state": state, "status": status, "branchName": "master",
+        "href": "/guestAuth/app/rest/builds/id:%d" % id,
+        "startDate": "20160810T172802-0700",
+        "finishDate": "20160810T173802-0700" if state == 'finished' else None,
+        "buildType": {"id": "Dummysvc_Py27", "name": "py27",
+                      "projectId": "Dummysvc", "projectName": "dummysvc"},
+        "agent": {"id": 70, "name": "tcagent103"},
+        "triggered": {"user": {"id": 16, "username": "marca"}},
+    }
+
+
+@responses.activate
+def test_sync_to(tmpdir):
+    pages = {
+        'first': {"count": 2, "nextHref": "/guestAuth/app/rest/builds/"
+                                          "?locator=start:2&page=2",
+                  "build": [_build(12, state='running'), _build(11)]},
+        'second': {"count": 1, "build": [_build(10, status='FAILURE')]},
+        'since': {"count": 1, "build": [_build(13)]},
+    }
+
+    def builds_callback(request):
+        if 'sinceBuild' in request.url:
+            page = pages['since']
+        elif 'page=2' in request.url:
+            page = pages['second']
+        else:
+            page = pages['first']
+        return (200, {}, json.dumps(page))
+
+    responses.add_callback(
+        responses.GET, tc.relative_url('app/rest/builds/'),
+        callback=builds_callback, content_type='application/json',
+    )
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/builds/id:12'),
+        json=_build(12, status='FAILURE'), status=200,
+        content_type='application/json',
+    )
+
+    db_path = str(tmpdir.join('builds.db'))
+    mirror = tc.builds.filter(build_type='Dummysvc_Py27').sync_to(db_path)
+    first_url = responses.calls[0].request.url
+    assert 'buildType:Dummysvc_Py27' in first_url
+    assert 'state:any' in first_url
+    assert 'fields=count,nextHref,build(' in first_url
+    assert 'fields=' in responses.calls[1].request.url
+    assert mirror.fetched == 3
+    assert mirror.watermark == 11
+    assert mirror.execute(
+        "SELECT state FROM builds WHERE id = 12").fetchone() == ('running',)
+    assert mirror.execute(
+        "SELECT finish_date FROM builds WHERE id = 11"
+    ).fetchone() == ('2016-08-11T00:38:02+00:00',)
+    mirror.close()
+
+    responses.calls.reset()
+    mirror = tc.builds.filter(build_type='Dummysvc_Py27').sync_to(db_path)
+    assert 'sinceBuild:(id:11)' in responses.calls[0].request.url
+    assert mirror.fetched == 1
+    assert mirror.rechecked == 1
+    assert mirror.watermark == 13
+    rows = mirror.execute(
+        "SELECT id, state, status FROM builds ORDER BY id").fetchall()
+    assert rows == [(10, 'finished', 'FAILURE'),
+                    (11, 'finished', 'SUCCESS'),
+                    (12, 'finished', 'FAILURE'),
+                    (13, 'finished', 'SUCCESS')]
+    assert mirror.execute("SELECT * FROM build_types").fetchall() == [
+        ('Dummysvc_Py27', 'py27', 'Dummysvc', 'dummysvc')]
+    assert mirror.execute("SELECT * FROM agents").fetchall() == [
+        (70, 'tcagent103')]
+    assert mirror.execute("SELECT id, username FROM users").fetchall() == [
+        (16, 'marca')]
+    mirror.close()
+
+
+@responses.activate
+def test_sync_to_queued_build(tmpdir):
+    # Build 100 is still queued when the newer build 101 finishes
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/builds/'),
+        json={"count": 2, "build": [_build(101), _build(100, state='queued')]},
+        content_type='application/json', match_querystring=False,
+    )
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/builds/'),
+        json={"count": 0, "build": []},
+        content_type='application/json', match_querystring=False,
+    )
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/builds/id:100'),
+        json=_build(100), content_type='application/json',
+    )
+
+    db_path = str(tmpdir.join('builds.db'))
+    mirror = tc.builds.all().sync_to(db_path)
+    assert mirror.watermark == 101
+    assert mirror.execute(
+        "SELECT state FROM builds WHERE id = 100").fetchone() == ('queued',)
+    mirror.close()
+
+    mirror = tc.builds.all().sync_to(db_path)
+    assert mirror.rechecked == 1
+    assert mirror.execute(
+        "SELECT state FROM builds WHERE id = 100").fetchone() == ('finished',)
+    mirror.close()
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 import responses
 
@@ -225,3 +227,132 @@ def test_unit_delete():
     )
     with pytest.raises(exceptions.HTTPError):
         build_type.delete()
+
+
+def _params(*pairs, **kwargs):
+    return {'parameters': {'property': [
+        dict(name=name, value=value, **kwargs) for name, value in pairs]}}
+
+
+@responses.activate
+def test_unit_parameter_resolver():
+    projects = [
+        dict(id='_Root', **_params(('env.REGION', 'us'),
+                                   ('deploy.target', '%env.REGION%-prod'))),
+        dict(id='App', parentProjectId='_Root',
+             **_params(('env.REGION', 'eu'), ('python', '2.7'))),
+    ]
+    template = dict(id='App_Tpl', projectId='App', templateFlag=True,
+                    **_params(('python', '3.6'), ('cmd', 'tox -e %py%')))
+    build_type = dict(
+        id='App_Test', projectId='App',
+        templates={'buildType': [{'id': 'App_Tpl'}]},
+        **_params(('py', 'py%python%'), ('cost', '100%%'),
+                  ('loop', '%loop%'), ('agent', '%teamcity.agent.name%')))
+    # Parameters TeamCity reports as inherited are resolved locally
+    build_type['parameters']['property'].append(
+        {'name': 'python', 'value': 'stale', 'inherited': True})
+    other = dict(id='Other', projectId='_Root')
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/projects/'),
+        json={'count': 2, 'project': projects})
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/buildTypes/'),
+        json={'count': 3, 'buildType': [template, build_type, other]})
+
+    resolver = tc.build_types.parameter_resolver()
+    assert len(responses.calls) == 3
+    assert 'fields=count,nextHref,project(id,parentProjectId,parameters' \
+        in responses.calls[0].request.url
+    assert 'locator=templateFlag:true' in responses.calls[1].request.url
+    assert 'locator=templateFlag:any' in responses.calls[2].request.url
+
+    params = resolver.parameters('App_Test')
+    assert params['python'].value == '3.6'
+    assert params['cmd'].value == 'tox -e py3.6'
+    assert params['deploy.target'].value == 'eu-prod'
+    assert params['cost'].value == '100%'
+    assert params['loop'].value == '%loop%'
+    assert params['agent'].value == '%teamcity.agent.name%'
+    assert resolver.raw_parameters('App_Test')['py'].value == 'py%python%'
+    assert resolver.parameters('Other')['deploy.target'].value == 'us-prod'
+
+    assert [bt.id for bt in resolver.find('env.REGION', 'eu')] == \
+        ['App_Test']
+    assert sorted(bt.id for bt in resolver.find('deploy.target')) == \
+        ['App_Test', 'Other']
+    assert resolver.find('cmd', 'tox -e py3.6')[0].id == 'App_Test'
+    assert len(responses.calls) == 3
+
+
+@responses.activate
+def test_unit_parameter_resolver_parent_template():
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/projects/'),
+        json={'count': 2, 'project': [
+            dict(id='_Root'), dict(id='App', parentProjectId='_Root')]})
+    template = dict(id='Root_Tpl', projectId='_Root', templateFlag=True,
+                    **_params(('python', '3.6')))
+    build_type = dict(id='App_Test', projectId='App',
+                      templates={'buildType': [{'id': 'Root_Tpl'}]},
+                      **_params(('python', '3.6'), inherited=True))
+
+    def build_types(request):
+        if 'templateFlag:true' in request.url:
+            page = [template]
+        else:
+            page = [build_type]
+        return (200, {}, json.dumps({'count': len(page), 'buildType': page}))
+
+    responses.add_callback(
+        responses.GET, tc.relative_url('app/rest/buildTypes/'),
+        callback=build_types, content_type='application/json')
+
+    resolver = tc.build_types.filter(project_id='App').parameter_resolver()
+    assert 'project:(id:App)' not in responses.calls[1].request.url
+    assert resolver.parameters('App_Test')['python'].value == '3.6'
+    assert [bt.id for bt in resolver.find('python', '3.6')] == ['App_Test']
+
+
+@responses.activate
+def test_unit_latest_status():
+    next_href = '/guestAuth/app/rest/buildTypes/?locator=count:2,start:2'
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/buildTypes/'),
+        match_querystring=False,
+        json={'count': 2, 'nextHref': next_href, 'buildType': [
+            {'id': 'App_Test', 'name': 'test', 'projectId': 'App',
+             'builds': {'count': 1, 'build': [
+                 {'id': 7, 'number': '12', 'status': 'FAILURE',
+                  'state': 'finished', 'branchName': 'master',
+                  'finishDate': '20160928T153541-0700'}]}},
+            {'id': 'App_New', 'name': 'new', 'projectId': 'App',
+             'builds': {'count': 0}},
+        ]})
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/buildTypes/'),
+        match_querystring=False,
+        json={'count': 1, 'buildType': [
+            {'id': 'App_Lint', 'name': 'lint', 'projectId': 'App',
+             'builds': {'count': 1, 'build': [
+                 {'id': 9, 'status': 'SUCCESS', 'state': 'finished'}]}},
+        ]})
+
+    rows = tc.build_types.latest_status(branch='master', project='App',
+                                        page_size=2)
+    url = responses.calls[0].request.url
+    assert 'locator=affectedProject:(id:App),count:2' in url
+    assert ('buildType(id,name,projectId,'
+            'builds($locator(count:1,branch:master),build(id,') in url
+    assert len(responses.calls) == 2
+    assert 'fields=' in responses.calls[1].request.url
+
+    assert [row.build_type_id for row in rows] == \
+        ['App_Test', 'App_New', 'App_Lint']
+    assert rows[0].status == 'FAILURE'
+    assert rows[0].build_id == 7
+    assert rows[0].finish_date.year == 2016
+    assert 'App_Test' in repr(rows[0])
+    assert rows[1].status is None
+    assert rows[1].finish_date is None
+    assert rows[2].status == 'SUCCESS'
@@ -0,0 +1,152 @@
+import json
+import re
+
+import responses
+
+from pyteamcity.future import TeamCity
+from pyteamcity.future.build_watcher import (
+    BuildFinished, BuildStarted, BuildStatusChanged)
+
+tc = TeamCity()
+
+
+def _build(id, state='running', status='SUCCESS'):
+    d = {"id": id, "buildTypeId": "Dummysvc_Py27", "state": state,
+         "status": status, "href": "/guestAuth/app/rest/builds/id:%d" % id}
+    if state != 'queued':
+        d['startDate'] = '20160810T172802-0700'
+    return d
+
+
+class FakeServer(object):
+    def __init__(self):
+        self.builds = {}
+
+    def callback(self, request):
+        builds = sorted(self.builds.values(), key=lambda b: -b['id'])
+        if 'running:True' in request.url:
+            builds = [b for b in builds if b['state'] == 'running']
+        if 'state:queued' in request.url:
+            builds = [b for b in builds if b['state'] == 'queued']
+        if 'item:(id:' in request.url:
+            ids = [int(build_id) for build_id in
+                   re.findall(r'item:\(id:(\d+)\)', request.url)]
+            builds = [self.builds[build_id] for build_id in ids]
+        if 'sinceBuild:(id:' in request.url:
+            since = int(request.url.split('sinceBuild:(id:')[1].split(')')[0])
+            builds = [b for b in builds if b['id'] > since]
+        if 'count:1' in request.url:
+            builds = builds[:1]
+        return (200, {}, json.dumps({'count': len(builds), 'build': builds}))
+
+    def detail_callback(self, request):
+        build_id = int(request.path_url.split('id:')[1].split('?')[0])
+        return (200, {}, json.dumps(self.builds[build_id]))
+
+
+@responses.activate
+def test_build_watcher():
+    server = FakeServer()
+    server.builds[1] = _build(1, state='finished')
+    server.builds[2] = _build(2)
+    responses.add_callback(
+        responses.GET, tc.relative_url('app/rest/builds/'),
+        callback=server.callback, content_type='application/json')
+    responses.add_callback(
+        responses.GET,
+        re.compile(re.escape(tc.relative_url('app/rest/builds/id:')) + '.*'),
+        callback=server.detail_callback, content_type='application/json')
+
+    sleeps = []
+    watcher = tc.builds.filter(project='id:Dummysvc').watcher(
+        min_interval=1, max_interval=8, backoff=2, sleep=sleeps.append)
+    received = []
+    watcher.subscribe(received.append)
+    finished = []
+    watcher.subscribe(finished.append, event_types=[BuildFinished])
+
+    assert watcher.poll() == []
+    assert watcher.last_seen_id == 2
+    assert watcher.running == {2: 'SUCCESS'}
+    assert all('fields=' in call.request.url for call in responses.calls)
+    assert all('project:(id:Dummysvc)' in call.request.url
+               for call in responses.calls)
+
+    # Nothing happens: the interval backs off
+    assert watcher.poll() == []
+    assert watcher.interval == 2
+
+    server.builds[2]['status'] = 'FAILURE'
+    server.builds[3] = _build(3)
+    server.builds[4] = _build(4, state='finished')
+    watcher.run(max_polls=1)
+    assert [type(e) for e in received] == [
+        BuildStarted, BuildStarted, BuildFinished, BuildStatusChanged]
+    assert [e.build.id for e in received] == [3, 4, 4, 2]
+    assert received[-1].previous_status == 'SUCCESS'
+    assert watcher.interval == 1
+
+    server.builds[2]['state'] = 'finished'
+    events = watcher.poll()
+    assert [(type(e), e.build.id) for e in events] == [(BuildFinished, 2)]
+    assert set(watcher.running) == set([3])
+
+    del received[:]
+    server.builds[3]['state'] = 'finished'
+    gen = watcher.events()
+    assert next(gen).build.id == 3
+    assert [e.build.id for e in finished] == [4]
+
+
+def _watch(server, query_set):
+    responses.add_callback(
+        responses.GET, tc.relative_url('app/rest/builds/'),
+        callback=server.callback, content_type='application/json')
+    responses.add_callback(
+        responses.GET,
+        re.compile(re.escape(tc.relative_url('app/rest/builds/id:')) + '.*'),
+        callback=server.detail_callback, content_type='application/json')
+    return query_set.watcher(sleep=lambda interval: None)
+
+
+@responses.activate
+def test_build_watcher_queued_build():
+    server = FakeServer()
+    server.builds[1] = _build(1, state='finished')
+    server.builds[2] = _build(2, state='queued')
+    watcher = _watch(server, tc.builds.all())
+    watcher.poll()
+    assert watcher.last_seen_id == 2
+    assert watcher.queued == set([2])
+
+    # 3 is queued behind 2, then 4 starts before either of them
+    server.builds[3] = _build(3, state='queued')
+    server.builds[4] = _build(4)
+    events = watcher.poll()
+    assert [(type(e), e.build.id) for e in events] == [(BuildStarted, 4)]
+    assert watcher.last_seen_id == 4
+    assert watcher.queued == set([2, 3])
+
+    # Both start and finish between two polls; 3 is removed from the queue
+    server.builds[2] = _build(2, state='finished')
+    server.builds[3] = _build(3, state='finished')
+    del server.builds[3]['startDate']
+    events = watcher.poll()
+    assert [(type(e), e.build.id) for e in events] == [
+        (BuildStarted, 2), (BuildFinished, 2)]
+    assert watcher.queued == set()
+
+
+@responses.activate
+def test_build_watcher_replaces_running_filter():
+    server = FakeServer()
+    server.builds[1] = _build(1)
+    watcher = _watch(server, tc.builds.filter(running=True))
+    watcher.poll()
+    server.builds[2] = _build(2)
+    watcher.poll()
+    for call in responses.calls:
+        locator = call.request.url.split('locator=')[1].split('&')[0]
+        dims = [pred.split(':')[0] for pred in locator.split(',')
+                if not pred.startswith('(')]
+        assert dims.count('running') + dims.count('state') == 1
@@ -314,3 +314,62 @@ def test_filter_by_version():
     assert changes[0].version == '09f63026bad685bc44bbf6b44ba35f8eb18748ca'
     assert changes[1].id == 314329
     assert changes[1].version == '09f63026bad685bc44bbf6b44ba35f8eb18748ca'
+
+
+def _change(change_id, username, files, vcs_root_id='Repo'):
+    return {'id': change_id, 'version': 'v%d' % change_id,
+            'username': username, 'date': '20160614T112304-0700',
+            'files': {'file': [{'relative-file': f} for f in files]},
+            'vcsRootInstance': {'id': '1', 'vcs-root-id': vcs_root_id}}
+
+
+@responses.activate
+def test_with_files():
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/changes/'),
+        json={'count': 1, 'change': [_change(1, 'alice', ['a.py', 'b.py'])]})
+
+    changes = tc.changes.filter(project='App').with_files()
+    change = changes[0]
+    url = responses.calls[0].request.url
+    assert 'locator=project:App' in url
+    assert 'files(file(relative-file,changeType))' in url
+    assert change.files == ['a.py', 'b.py']
+    assert change.vcs_root_id == 'Repo'
+
+
+@responses.activate
+def test_analytics():
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/buildTypes/'),
+        json={'count': 3, 'buildType': [
+            {'id': 'App_Test', 'vcs-root-entries': {'vcs-root-entry': [
+                {'id': 'Repo'}, {'id': 'Tools'}]}},
+            {'id': 'App_Lint', 'vcs-root-entries': {'vcs-root-entry': [
+                {'id': 'Repo'}]}},
+            {'id': 'Tools_Test', 'vcs-root-entries': {'vcs-root-entry': [
+                {'id': 'Tools'}]}},
+        ]})
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/changes/'),
+        match_querystring=False,
+        json={'count': 2,
+              'nextHref': '/guestAuth/app/rest/changes/?locator=start:2',
+              'change': [_change(3, 'alice', ['a.py', 'a.py', 'c.py']),
+                         _change(2, 'bob', ['a.py'])]})
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/changes/'),
+        match_querystring=False,
+        json={'count': 1,
+              'change': [_change(1, 'alice', ['b.py'], 'Tools')]})
+
+    analytics = tc.changes.analytics(page_size=2)
+    assert len(responses.calls) == 3
+    assert 'locator=count:2' in responses.calls[1].request.url
+    assert analytics.num_changes == 3
+    assert analytics.hot_files(1) == [('a.py', 2)]
+    assert dict(analytics.hot_files()) == {'a.py': 2, 'b.py': 1, 'c.py': 1}
+    assert analytics.changes_per_committer() == {'alice': 2, 'bob': 1}
+    assert analytics.build_type_impact() == [
+        ('App_Test', 3), ('App_Lint', 2), ('Tools_Test', 1)]
+    assert 'changes=3' in repr(analytics)
@@ -0,0 +1,154 @@
+import csv
+import json
+
+import pytest
+import responses
+
+from pyteamcity.future import TeamCity
+from pyteamcity.future.core import export
+
+tc = TeamCity()
+
+
+def _build(build_id, status='SUCCESS', build_type_name='Tests'):
+    return {'id': build_id, 'status': status,
+            'buildType': {'name': build_type_name}}
+
+
+def _add_build_pages(*pages):
+    for i, page in enumerate(pages):
+        json_data = {'count': len(page), 'build': page}
+        if i < len(pages) - 1:
+            json_data['nextHref'] = '/guestAuth/app/rest/builds/?p=%d' % i
+        responses.add(
+            responses.GET, tc.relative_url('app/rest/builds/'),
+            json=json_data, match_querystring=False)
+
+
+def test_unit_projection():
+    assert export._projection(
+        ['id', 'buildType.name', 'buildType.project.id', 'status']) == \
+        'id,buildType(name,project(id)),status'
+
+
+@responses.activate
+def test_unit_export_jsonl(tmpdir):
+    _add_build_pages([_build(1), _build(2)], [_build(3, 'FAILURE')])
+    path = str(tmpdir.join('builds.jsonl'))
+
+    num_rows = tc.builds.filter(build_type='App').export(
+        path, fields=['id', 'status', 'buildType.name'], page_size=2)
+
+    assert num_rows == 3
+    url = responses.calls[0].request.url
+    assert 'count:2' in url
+    assert 'fields=count,nextHref,build(id,status,buildType(name))' in url
+    assert len(responses.calls) == 2
+    with open(path) as f:
+        rows = [json.loads(line) for line in f]
+    assert rows[2] == {'id': 3, 'status': 'FAILURE',
+                       'buildType.name': 'Tests'}
+
+
+@responses.activate
+def test_unit_export_jsonl_raw(tmpdir):
+    _add_build_pages([_build(1)])
+    path = str(tmpdir.join('builds.jsonl'))
+
+    assert tc.builds.all().export(path) == 1
+    assert 'fields=' not in responses.calls[0].request.url
+    with open(path) as f:
+        assert json.loads(f.readline()) == _build(1)
+
+
+@responses.activate
+def test_unit_export_csv(tmpdir):
+    _add_build_pages([_build(1), {'id': 2, 'status': 'FAILURE'}])
+    path = str(tmpdir.join('builds.csv'))
+
+    tc.builds.all().export(path, format='csv',
+                           fields=['id', 'status', 'buildType.name'])
+
+    with open(path) as f:
+        rows = list(csv.reader(f))
+    assert rows == [['id', 'status', 'buildType.name'],
+                    ['1', 'SUCCESS', 'Tests'],
+                    ['2', 'FAILURE', '']]
+
+
+def test_unit_export_invalid(tmpdir):
+    path = str(tmpdir.join('builds'))
+    with pytest.raises(ValueError):
+        tc.builds.all().export(path, format='xml')
+    with pytest.raises(ValueError):
+        tc.builds.all().export(path, format='csv')
+
+
+@responses.activate
+def test_unit_export_error_stops(tmpdir):
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/builds/'),
+        json={'count': 1, 'build': [_build(1)],
+              'nextHref': '/guestAuth/app/rest/builds/?p=0'},
+        match_querystring=False)
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/builds/'),
+        status=500, match_querystring=False)
+    path = str(tmpdir.join('builds.jsonl'))
+
+    with pytest.raises(Exception):
+        tc.builds.all().export(path, fields=['id'])
+    with open(path) as f:
+        assert json.loads(f.readline()) == {'id': 1}
+
+
+@responses.activate
+def test_unit_export_parquet(tmpdir):
+    pq = pytest.importorskip('pyarrow.parquet')
+    _add_build_pages([_build(1), _build(2)], [_build(3, 'FAILURE')])
+    path = str(tmpdir.join('builds.parquet'))
+
+    num_rows = tc.builds.all().export(
+        path, format='parquet', fields=['id', 'status', 'buildType.name'],
+        page_size=2)
+
+    assert num_rows == 3
+    table = pq.read_table(path)
+    assert table.column_names == ['id', 'status', 'buildType.name']
+    assert table.column('id').to_pylist() == [1, 2, 3]
+    assert table.column('status').to_pylist() == [
+        'SUCCESS', 'SUCCESS', 'FAILURE']
+
+
+@responses.activate
+def test_unit_export_parquet_type_change(tmpdir):
+    pa = pytest.importorskip('pyarrow')
+    pq = pytest.importorskip('pyarrow.parquet')
+    # No agent on the first page; ids later
+    pages = [{'id': 1}], [{'id': 2, 'agent': {'id': 7}}]
+    _add_build_pages(*pages)
+    path = str(tmpdir.join('builds.parquet'))
+    with pytest.raises(ValueError) as excinfo:
+        tc.builds.all().export(path, format='parquet',
+                               fields=['id', 'agent.id'], page_size=1)
+    assert 'agent.id' in str(excinfo.value)
+
+    responses.reset()
+    _add_build_pages(*pages)
+    tc.builds.all().export(path, format='parquet', fields=['id', 'agent.id'],
+                           page_size=1, schema={'agent.id': pa.int64()})
+    assert pq.read_table(path).column('agent.id').to_pylist() == [None, 7]
+
+
+@responses.activate
+def test_unit_export_parquet_no_truncation(tmpdir):
+    pytest.importorskip('pyarrow')
+    pq = pytest.importorskip('pyarrow.parquet')
+    _add_build_pages([{'id': 1, 'size': 1}], [{'id': 2, 'size': 2.0}],
+                     [{'id': 3, 'size': 1.5}])
+    path = str(tmpdir.join('builds.parquet'))
+    with pytest.raises(ValueError):
+        tc.builds.all().export(path, format='parquet', fields=['id', 'size'],
+                               page_size=1)
+    # Lossless values are still written
+    assert pq.read_table(path).column('size').to_pylist() == [1, 2]
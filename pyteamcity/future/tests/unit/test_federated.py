@@ -0,0 +1,119 @@
+import time
+
+import mock
+import pytest
+import requests
+import responses
+
+from pyteamcity.future import exceptions, FederatedTeamCity, TeamCity
+
+servers = dict((name, TeamCity(server='%s.example.com' % name))
+               for name in ('eu', 'us', 'ap', 'sa'))
+
+
+def _builds(*builds):
+    return {'count': len(builds), 'build': [
+        {'id': build_id, 'buildTypeId': 'Svc_Test', 'status': 'FAILURE',
+         'state': 'finished', 'finishDate': finish_date}
+        for build_id, finish_date in builds]}
+
+
+def test_unit_managers():
+    federation = FederatedTeamCity(servers)
+    assert list(federation.servers) == ['ap', 'eu', 'sa', 'us']
+    query_set = federation.builds.filter(status='FAILURE')
+    for name, server_query_set in query_set.query_sets.items():
+        assert server_query_set._get_url() == (
+            'http://%s.example.com/guestAuth/app/rest/builds/'
+            '?locator=status:FAILURE' % name)
+    assert 'eu' in repr(query_set)
+    with pytest.raises(AttributeError):
+        federation.session
+
+
+@responses.activate
+def test_unit_partial_results():
+    responses.add(
+        responses.GET, servers['eu'].relative_url('app/rest/builds/'),
+        match_querystring=False,
+        json=_builds((10, '20161001T120000+0200'),
+                     (9, '20161001T090000+0200')))
+    responses.add(
+        responses.GET, servers['us'].relative_url('app/rest/builds/'),
+        match_querystring=False,
+        json=_builds((31, '20161001T080000-0400'),
+                     (30, None)))
+    responses.add(
+        responses.GET, servers['ap'].relative_url('app/rest/builds/'),
+        match_querystring=False, status=500, body='down')
+
+    running = []
+
+    def hung(url, timeout=None):
+        # A server that never answers: the request times out
+        assert timeout is not None and timeout <= 0.3
+        running.append(url)
+        time.sleep(timeout)
+        running.remove(url)
+        raise requests.Timeout()
+
+    sa = TeamCity(server='sa.example.com',
+                  session=mock.MagicMock(get=mock.Mock(side_effect=hung)))
+    federation = FederatedTeamCity(dict(servers, sa=sa), timeout=0.3)
+    query_set = federation.builds.filter(status='FAILURE').sort(
+        '-finish_date')
+    start = time.time()
+    builds = list(query_set)
+    assert time.time() - start < 0.9
+    assert sa.session.get.called
+    assert not running
+
+    # Dates compare across time zones: us #31 (12:00Z) is newer than eu #10
+    # (10:00Z); builds without a finish date go last
+    assert [(b.origin, b.id) for b in builds] == [
+        ('us', 31), ('eu', 10), ('eu', 9), ('us', 30)]
+    assert query_set.partial
+    assert sorted(query_set.errors) == ['ap', 'sa']
+    assert isinstance(query_set.errors['ap'], exceptions.HTTPError)
+    assert isinstance(query_set.errors['sa'], exceptions.WaitTimeout)
+
+    assert federation.builds.map(len) == {'eu': 2, 'us': 2}
+    assert not running
+
+    answered = [name for name, _ in
+                federation.builds.all().as_completed()]
+    assert sorted(answered) == ['eu', 'us']
+
+
+@responses.activate
+def test_unit_all_pages_merged():
+    eu, us = servers['eu'], servers['us']
+
+    def add_responses():
+        page = dict(
+            _builds((10, '20161001T120000Z'), (8, '20161001T080000Z')),
+            nextHref='/guestAuth/app/rest/builds/?locator=start:2')
+        responses.add(
+            responses.GET, eu.relative_url('app/rest/builds/'),
+            match_querystring=False, json=page)
+        responses.add(
+            responses.GET, eu.relative_url('app/rest/builds/'),
+            match_querystring=False,
+            json=_builds((5, '20161001T050000Z'), (4, None)))
+        responses.add(
+            responses.GET, us.relative_url('app/rest/builds/'),
+            match_querystring=False,
+            json=_builds((31, '20161001T090000Z'),
+                         (30, '20161001T060000Z')))
+
+    add_responses()
+    federation = FederatedTeamCity({'eu': eu, 'us': us})
+    builds = list(federation.builds.all().sort('-finish_date'))
+    assert [(b.origin, b.id) for b in builds] == [
+        ('eu', 10), ('us', 31), ('eu', 8), ('us', 30), ('eu', 5), ('eu', 4)]
+
+    responses.reset()
+    add_responses()
+    assert len(federation.builds.all()) == 6
+    assert all('fields=count,nextHref' in call.request.url
+               for call in responses.calls)
@@ -0,0 +1,62 @@
+import subprocess
+import sys
+
+import pytest
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 7),
+                                reason='lazy imports need PEP 562')
+
+HEAVY_MODULES = ('bs4', 'dateutil', 'xml.etree.ElementTree', 'sqlite3',
+                 'concurrent.futures', 'webbrowser')
+
+
+def loaded_modules(statement):
+    code = 'import sys\n%s\nprint("\\n".join(sys.modules))' % statement
+    output = subprocess.check_output([sys.executable, '-c', code])
+    return set(output.decode('utf-8').split())
+
+
+def test_import_pyteamcity_is_lazy():
+    modules = loaded_modules('import pyteamcity')
+    assert 'pyteamcity.legacy' not in modules
+    assert 'requests' not in modules
+    for module in HEAVY_MODULES:
+        assert module not in modules
+
+
+def test_import_future_teamcity_is_lazy():
+    modules = loaded_modules('from pyteamcity.future import TeamCity')
+    assert 'pyteamcity.future.teamcity' in modules
+    assert 'pyteamcity.legacy' not in modules
+    for module in HEAVY_MODULES:
+        assert module not in modules
+
+
+def test_import_legacy_teamcity_is_lazy():
+    modules = loaded_modules('from pyteamcity import TeamCity')
+    assert 'pyteamcity.legacy.legacy' in modules
+    for module in HEAVY_MODULES:
+        assert module not in modules
+
+
+def test_legacy_names_still_exported():
+    import pyteamcity
+    from pyteamcity.legacy import legacy
+
+    assert pyteamcity.TeamCity is legacy.TeamCity
+    assert pyteamcity.HTTPError is legacy.HTTPError
+    for name in pyteamcity.__all__:
+        assert getattr(pyteamcity, name) is getattr(legacy, name)
+    with pytest.raises(AttributeError):
+        pyteamcity.does_not_exist
+
+
+def test_future_names_still_exported():
+    import pyteamcity.future
+    from pyteamcity.future.page_joiner import PageJoiner
+    from pyteamcity.future.teamcity import TeamCity
+
+    assert pyteamcity.future.TeamCity is TeamCity
+    assert pyteamcity.future.PageJoiner is PageJoiner
+    with pytest.raises(AttributeError):
+        pyteamcity.future.does_not_exist
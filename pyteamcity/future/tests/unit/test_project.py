@@ -378,3 +378,64 @@ def test_unit_filter_by_name():
 def test_unit_get_by_id():
     url = tc.projects.all().get(id='Txtasvc_Branches', just_url=True)
     assert url.endswith('/projects/id:Txtasvc_Branches')
+
+
+def _tree_project(id, parent=None, archived=False, name=None):
+    d = {'id': id, 'name': name or id.lower(), 'archived': archived,
+         'href': '/guestAuth/app/rest/projects/id:%s' % id}
+    if parent is not None:
+        d['parentProjectId'] = parent
+    return d
+
+
+@responses.activate
+def test_unit_tree():
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/projects/'),
+        json={'count': 5, 'project': [
+            _tree_project('_Root'),
+            _tree_project('A', '_Root'),
+            _tree_project('A_1', 'A'),
+            _tree_project('A_1_x', 'A_1'),
+            _tree_project('B', '_Root', archived=True),
+        ]}, status=200,
+    )
+    tree = tc.projects.tree()
+    assert len(responses.calls) == 1
+    assert 'fields=count,nextHref,project(id,name,parentProjectId,archived' \
+        in responses.calls[0].request.url
+    assert len(tree) == 5
+    assert 'A_1' in tree
+    assert [p.id for p in tree.children('_Root')] == ['A', 'B']
+    assert [p.id for p in tree.children(tree['A'])] == ['A_1']
+    assert tree.children('A_1_x') == []
+    assert [p.id for p in tree.descendants('A')] == ['A_1', 'A_1_x']
+    assert [p.id for p in tree.ancestors('A_1_x')] == ['A_1', 'A', '_Root']
+    assert [p.name for p in tree.path('A_1_x')] == ['_root', 'a', 'a_1',
+                                                    'a_1_x']
+    assert tree.parent('_Root') is None
+    assert tree.roots == ['_Root']
+
+    # Move A_1 under B, drop A, add C
+    responses.reset()
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/projects/'),
+        json={'count': 5, 'project': [
+            _tree_project('_Root'),
+            _tree_project('A_1', 'B'),
+            _tree_project('A_1_x', 'A_1'),
+            _tree_project('B', '_Root', archived=True),
+            _tree_project('C', '_Root'),
+        ]}, status=200,
+    )
+    changes = tree.refresh()
+    assert changes.added == ['C']
+    assert changes.removed == ['A']
+    assert changes.changed == ['A_1']
+    assert 'A' not in tree
+    assert [p.id for p in tree.children('_Root')] == ['B', 'C']
+    assert [p.id for p in tree.path('A_1_x')] == ['_Root', 'B', 'A_1',
+                                                  'A_1_x']
+    assert not tree.refresh()
@@ -0,0 +1,128 @@
+import json
+import re
+
+import responses
+
+from pyteamcity.future import TeamCity
+from pyteamcity.future.queue_monitor import (
+    QueuedBuildAdded, QueuedBuildRemoved, QueuedBuildStarted,
+    RollingPercentiles)
+
+tc = TeamCity()
+
+
+def _queued(id, build_type_id='Dummysvc_Py27', reason='Waiting for agent'):
+    return {"id": id, "buildTypeId": build_type_id,
+            "queuedDate": "20160812T154200-0700", "waitReason": reason,
+            "href": "/guestAuth/app/rest/buildQueue/id:%d" % id}
+
+
+def _builds_callback(builds):
+    def callback(request):
+        ids = [int(build_id) for build_id in
+               re.findall(r'item:\(id:(\d+)\)', request.url)]
+        if any(build_id not in builds for build_id in ids):
+            return (404, {}, 'Nothing is found')
+        page = [builds[build_id] for build_id in ids]
+        return (200, {}, json.dumps({'count': len(page), 'build': page}))
+    return callback
+
+
+@responses.activate
+def test_queue_monitor():
+    queue = [
+        _queued(1),
+        _queued(2, reason='Build settings have not been finalized'),
+        _queued(3),
+    ]
+
+    def queue_callback(request):
+        return (200, {}, json.dumps({'count': len(queue), 'build': queue}))
+
+    responses.add_callback(
+        responses.GET, tc.relative_url('app/rest/buildQueue/'),
+        callback=queue_callback, content_type='application/json')
+    builds = {
+        1: {"id": 1, "state": "running",
+            "queuedDate": "20160812T154200-0700",
+            "startDate": "20160812T154330-0700"},
+        2: {"id": 2, "state": "finished",
+            "queuedDate": "20160812T154200-0700",
+            "canceledInfo": {"timestamp": "20160812T154300-0700"}},
+        # Failed to start
+        3: {"id": 3, "state": "finished"},
+    }
+    responses.add_callback(
+        responses.GET, tc.relative_url('app/rest/builds/'),
+        callback=_builds_callback(builds), content_type='application/json')
+
+    monitor = tc.queued_builds.filter(project='Dummysvc').monitor(window=10)
+    assert monitor.poll() == []
+    url = responses.calls[0].request.url
+    assert 'project:(Dummysvc)' in url
+    assert 'fields=count,nextHref,build(id,buildTypeId' in url
+
+    del queue[:]
+    queue.append(_queued(4, build_type_id='Other'))
+    responses.calls.reset()
+    events = monitor.poll()
+    # One request for the queue and one for all the builds that left it
+    assert len(responses.calls) == 2
+    assert 'item:(id:1),item:(id:2),item:(id:3)' in \
+        responses.calls[1].request.url
+    assert [(type(e), e.queued_build.id) for e in events] == [
+        (QueuedBuildAdded, 4),
+        (QueuedBuildStarted, 1),
+        (QueuedBuildRemoved, 2),
+        (QueuedBuildRemoved, 3),
+    ]
+    assert events[1].wait_time == 90
+    assert monitor.wait_times_by_build_type['Dummysvc_Py27'].percentiles() == {
+        50: 90, 90: 90, 99: 90}
+    assert len(monitor.wait_times_by_reason['Waiting for agent']) == 1
+    assert 'Build settings have not been finalized' not in \
+        monitor.wait_times_by_reason
+
+
+@responses.activate
+def test_queue_monitor_deleted_build():
+    queue = [_queued(1), _queued(2)]
+
+    def queue_callback(request):
+        return (200, {}, json.dumps({'count': len(queue), 'build': queue}))
+
+    responses.add_callback(
+        responses.GET, tc.relative_url('app/rest/buildQueue/'),
+        callback=queue_callback, content_type='application/json')
+    builds = {1: {"id": 1, "state": "running",
+                  "queuedDate": "20160812T154200-0700",
+                  "startDate": "20160812T154210-0700"}}
+    responses.add_callback(
+        responses.GET, tc.relative_url('app/rest/builds/'),
+        callback=_builds_callback(builds), content_type='application/json')
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/builds/id:1'),
+        json=builds[1], status=200, content_type='application/json')
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/builds/id:2'),
+        status=404)
+
+    monitor = tc.queued_builds.monitor(chunk_size=10)
+    monitor.poll()
+    del queue[:]
+    events = monitor.poll()
+    assert [(type(e), e.queued_build.id) for e in events] == [
+        (QueuedBuildStarted, 1),
+        (QueuedBuildRemoved, 2),
+    ]
+    assert events[0].wait_time == 10
+
+
+def test_rolling_percentiles():
+    percentiles = RollingPercentiles(window=100)
+    assert percentiles.percentile(50) is None
+    for value in range(1, 201):
+        percentiles.add(value)
+    assert len(percentiles) == 100
+    assert percentiles.percentiles((0, 50, 90, 100)) == {
+        0: 101, 50: 150, 90: 190, 100: 200}
@@ -256,3 +256,139 @@ def test_trigger_build_exception_with_responses():
         tc.queued_builds.all().trigger_build(
             build_type_id='Dummysvc_Branches_Py27',
         )
+
+
+def test_build_request_template():
+    import json
+
+    template = tc.queued_builds.all().build_template(
+        'Dummysvc_Branches_Py27',
+        comment='release <1.0> & "friends"',
+        parameters={'env.A': '1', 'env.B': 2})
+    assert template.body() is template.body()
+    assert json.loads(template.body()) == {
+        'buildType': {'id': 'Dummysvc_Branches_Py27'},
+        'comment': {'text': 'release <1.0> & "friends"'},
+        'properties': {'property': [{'name': 'env.A', 'value': '1'},
+                                    {'name': 'env.B', 'value': '2'}]},
+    }
+    body = json.loads(template.body(branch='feature/x', agent_id=70,
+                                    parameters={'env.B': '3', 'env.C': '4'}))
+    assert body['branchName'] == 'feature/x'
+    assert body['agent'] == {'id': 70}
+    assert body['comment'] == {'text': 'release <1.0> & "friends"'}
+    assert body['properties']['property'] == [
+        {'name': 'env.A', 'value': '1'},
+        {'name': 'env.B', 'value': '3'},
+        {'name': 'env.C', 'value': '4'},
+    ]
+    with pytest.raises(ValueError):
+        template.body(build_type_id='Other')
+
+    body = json.loads(template.body(parameters={'env.A': u'd\xe9j\xe0 vu'}))
+    assert body['properties']['property'][0] == {
+        'name': 'env.A', 'value': u'd\xe9j\xe0 vu'}
+
+
+@responses.activate
+def test_trigger_builds_with_responses():
+    import json
+
+    def request_callback(request):
+        body = json.loads(request.body)
+        if body.get('branchName') == 'broken':
+            return (500, {}, 'Internal error')
+        return (200, {}, json.dumps({
+            'id': len(responses.calls) + 1,
+            'buildTypeId': body['buildType']['id'],
+            'branchName': body.get('branchName'),
+            'href': '/guestAuth/app/rest/buildQueue/id:1',
+        }))
+
+    responses.add_callback(
+        responses.POST,
+        tc.relative_url('app/rest/buildQueue/'),
+        callback=request_callback,
+        content_type='application/json',
+    )
+
+    queued_builds = tc.queued_builds.all()
+    template = queued_builds.build_template(
+        'Dummysvc_Branches_Py27', parameters={'env.A': '1'})
+    branches = ['b%d' % i for i in range(10)] + ['broken']
+    results = queued_builds.trigger_builds(
+        [{'branch': branch} for branch in branches],
+        template=template, workers=4)
+    assert [r.item['branch'] for r in results] == branches
+    assert all(r.ok for r in results[:-1])
+    assert [r.value.branch_name for r in results[:-1]] == branches[:-1]
+    assert isinstance(results[-1].error, exceptions.HTTPError)
+    assert 'error' in repr(results[-1])
+    assert all(call.request.headers['Content-Type'] == 'application/json'
+               for call in responses.calls)
+
+    results = queued_builds.trigger_builds(
+        ['Dummysvc_Branches_Py27',
+         {'build_type_id': 'Other', 'branch': 'master'}],
+        workers=1)
+    assert [r.value.build_type_id for r in results] == [
+        'Dummysvc_Branches_Py27', 'Other']
+
+
+@responses.activate
+def test_cancel_all_with_responses():
+    response_list_json = {
+        "count": 3,
+        "build": [
+            {"id": 1, "href": "/guestAuth/app/rest/buildQueue/id:1"},
+            {"id": 2, "href": "/guestAuth/app/rest/buildQueue/id:2"},
+            {"id": 3, "href": "/guestAuth/app/rest/buildQueue/id:3"},
+        ],
+    }
+    responses.add(
+        responses.GET,
+        tc.relative_url('app/rest/buildQueue/'),
+        json=response_list_json, status=200,
+        content_type='application/json',
+    )
+    for build_id, status in [(1, 200), (2, 404), (3, 500)]:
+        responses.add(
+            responses.POST,
+            tc.relative_url('app/rest/buildQueue/id:%d' % build_id),
+            json={}, status=status,
+            content_type='application/json',
+        )
+
+    sleeps = []
+    tc_limited = TeamCity(rate_limit=10)
+    tc_limited.rate_limiter.sleep = sleeps.append
+    tc_limited.rate_limiter.clock = lambda: 0.0
+    report = tc_limited.queued_builds.filter(
+        build_type='Dummysvc_Branches_Py27',
+    ).cancel_all(comment="oops <it's> me", workers=3)
+
+    assert report.canceled == [1]
+    assert report.gone == [2]
+    assert list(report.errors) == [3]
+    assert 'gone=1' in repr(report)
+    assert len(sleeps) == 2
+    list_url = responses.calls[0].request.url
+    assert 'buildType:Dummysvc_Branches_Py27' in list_url
+    assert 'fields=count,nextHref,build(id,href)' in list_url
+    body = [call.request.body for call in responses.calls
+            if call.request.method == 'POST'][0]
+    assert 'comment="oops &lt;it\'s&gt; me"' in body
+
+
+def test_rate_limiter():
+    from pyteamcity.future.core.concurrency import RateLimiter
+
+    now = [100.0]
+    sleeps = []
+    limiter = RateLimiter(rate=4, clock=lambda: now[0], sleep=sleeps.append)
+    for _ in range(3):
+        limiter.acquire()
+    assert sleeps == [0.25, 0.5]
+    now[0] += 10
+    limiter.acquire()
+    assert sleeps == [0.25, 0.5]
@@ -157,3 +157,55 @@ def test_unit_plugins_error():
 
     with pytest.raises(exceptions.HTTPError):
         tc.plugins()
+
+
+@responses.activate
+def test_wait_for_builds():
+    import json
+    import re
+
+    tc = TeamCity()
+    states = {
+        1: ['queued', 'running', 'finished'],
+        2: ['running', 'running', 'running', 'finished'],
+        3: ['finished'],
+    }
+    polls = []
+
+    def request_callback(request):
+        ids = [int(x) for x in re.findall(r'item:\(id:(\d+)\)', request.url)]
+        polls.append(ids)
+        builds = []
+        for build_id in ids:
+            state = states[build_id].pop(0) if len(states[build_id]) > 1 \
+                else states[build_id][0]
+            builds.append({'id': build_id, 'state': state,
+                           'status': 'SUCCESS',
+                           'buildTypeId': 'Dummysvc_Py27'})
+        return (200, {}, json.dumps({'count': len(builds), 'build': builds}))
+
+    responses.add_callback(
+        responses.GET, tc.relative_url('app/rest/builds/'),
+        callback=request_callback, content_type='application/json')
+
+    sleeps = []
+    waiter = tc.wait_for_builds([1, 2, 3], poll=2, chunk_size=2,
+                                sleep=sleeps.append)
+    transitions = [(b.id, b.state) for b in waiter]
+    assert transitions == [
+        (1, 'queued'), (2, 'running'), (3, 'finished'),
+        (1, 'running'),
+        (1, 'finished'),
+        (2, 'finished'),
+    ]
+    assert polls == [[1, 2], [3], [1, 2], [1, 2], [2]]
+    assert sleeps == [2, 2, 2]
+    assert [b.state for b in waiter.wait()] == ['finished'] * 3
+    assert 'fields=count,nextHref,build(' in responses.calls[0].request.url
+
+    states[4] = ['running']
+    ticks = iter(range(100))
+    waiter = tc.wait_for_builds([4], timeout=3, sleep=sleeps.append,
+                                clock=lambda: next(ticks))
+    with pytest.raises(exceptions.WaitTimeout):
+        waiter.wait()
@@ -0,0 +1,98 @@
+import responses
+
+from pyteamcity.future import TeamCity
+from pyteamcity.future import test_occurrence
+
+tc = TeamCity()
+
+
+def test_unit_get_all():
+    occurrences = tc.test_occurrences.all()
+    assert occurrences._get_url().endswith('/app/rest/testOccurrences/')
+
+
+def test_unit_filter():
+    occurrences = tc.test_occurrences.filter(
+        build_type='id:App_Test', status='FAILURE', count=100)
+    assert occurrences._get_url().endswith(
+        '/testOccurrences/?locator=buildType:id:App_Test,status:FAILURE,'
+        'count:100')
+
+
+def _occurrence(test_id, build_id, status):
+    return {'status': status,
+            'test': {'id': test_id, 'name': 'test_%s' % test_id},
+            'build': {'id': build_id}}
+
+
+@responses.activate
+def test_unit_iter_streams_pages():
+    next_href = ('/guestAuth/app/rest/testOccurrences/'
+                 '?locator=buildType:App,start:1,count:1')
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/testOccurrences/'),
+        json={'count': 1, 'nextHref': next_href,
+              'testOccurrence': [_occurrence(1, 10, 'SUCCESS')]})
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/testOccurrences/'),
+        json={'count': 1,
+              'testOccurrence': [_occurrence(2, 10, 'FAILURE')]})
+
+    occurrences = iter(tc.test_occurrences.filter(build_type='App'))
+    first = next(occurrences)
+    assert len(responses.calls) == 1
+    assert first.name == 'test_1'
+    assert first.build_id == 10
+    assert 'SUCCESS' in repr(first)
+    assert [o.test_id for o in occurrences] == [2]
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_unit_history():
+    # Newest builds first, as TeamCity returns them
+    outcomes = {
+        1: 'SSSSSSSS',   # stable
+        2: 'SFSFSFSF',   # flaky
+        3: 'SSSSSFFF',   # broken since build 105
+        4: 'SSFFSSSU',   # failed twice in a row; last run ignored
+    }
+    pages = []
+    for build_id in range(107, 99, -1):
+        pages.append([
+            _occurrence(test_id, build_id,
+                        {'S': 'SUCCESS', 'F': 'FAILURE',
+                         'U': 'UNKNOWN'}[s[build_id - 100]])
+            for test_id, s in sorted(outcomes.items())])
+    for i, page in enumerate(pages):
+        json_data = {'count': len(page), 'testOccurrence': page}
+        if i < len(pages) - 1:
+            json_data['nextHref'] = '/guestAuth/app/rest/testOccurrences/?p'
+        responses.add(
+            responses.GET, tc.relative_url('app/rest/testOccurrences/'),
+            json=json_data, match_querystring=False)
+
+    history = tc.test_occurrences.filter(build_type='App').history(
+        page_size=4)
+    assert 'count:4' in responses.calls[0].request.url
+    assert 'fields=count,nextHref,testOccurrence(status,test(id,name)' \
+        in responses.calls[0].request.url
+    assert len(responses.calls) == 8
+    assert isinstance(history, test_occurrence.TestHistory)
+    assert len(history) == 4
+    assert history.names[2] == 'test_2'
+
+    assert list(history.outcomes(3)) == [1, 1, 1, 1, 1, 0, 0, 0]
+    assert history.runs(4) == 7
+    assert history.failures(2) == 4
+    assert history.flip_rate(1) == 0.0
+    assert history.flip_rate(2) == 1.0
+    assert history.current_failure_streak(3) == 3
+    assert history.current_failure_streak(2) == 1
+    assert history.longest_failure_streak(4) == 2
+    assert history.current_failure_streak(4) == 0
+    assert history.flaky(min_flip_rate=0.3) == [(2, 1.0), (4, 2 / 6.0)]
+
+    history.add(5, 'test_5', 100, 'FAILURE')
+    assert history.flaky(min_flip_rate=0.0, min_runs=2)[-1][0] == 1
+    assert 5 in history
@@ -92,3 +92,60 @@ def test_unit_get_by_username_with_responses():
     assert user.groups[1].description == 'DevOps Extended Team'
     assert user.groups[2].name == 'TeamCity Admins'
     assert user.groups[2].description == 'Administrators'
+
+
+def _group(key, users=(), parents=(), roles=()):
+    return {'key': key, 'name': key.title(),
+            'href': '/guestAuth/app/rest/userGroups/key:%s' % key,
+            'parent-groups': {'group': [{'key': k} for k in parents]},
+            'users': {'user': [{'id': i, 'username': u} for i, u in users]},
+            'roles': {'role': [{'roleId': r, 'scope': s} for r, s in roles]}}
+
+
+@responses.activate
+def test_unit_membership_index():
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/userGroups/'),
+        json={'count': 4, 'group': [
+            _group('ALL_USERS_GROUP', roles=[('PROJECT_VIEWER', 'g')]),
+            _group('DEV', users=[(1, 'alice'), (2, 'bob')],
+                   parents=['ALL_USERS_GROUP'],
+                   roles=[('PROJECT_DEVELOPER', 'p:App')]),
+            _group('DEV_LEADS', users=[(1, 'alice')], parents=['DEV'],
+                   roles=[('PROJECT_ADMIN', 'p:App')]),
+            _group('OPS', users=[(3, 'carol')]),
+        ]})
+
+    index = tc.users.membership_index()
+    assert len(responses.calls) == 1
+    url = responses.calls[0].request.url
+    assert 'parent-groups(group(key))' in url
+    assert 'users(user(id,username' in url
+    assert 'roles(role(roleId,scope))' in url
+
+    assert [g.key for g in index.groups_of('alice')] == ['DEV', 'DEV_LEADS']
+    assert [g.key for g in index.groups_of(2, transitive=True)] == \
+        ['DEV', 'ALL_USERS_GROUP']
+    alice = index.users[1]
+    assert [g.key for g in index.groups_of(alice, transitive=True)] == \
+        ['DEV', 'DEV_LEADS', 'ALL_USERS_GROUP']
+    assert [u.username for u in index.users_of('DEV')] == ['alice', 'bob']
+    assert [u.username for u in index.users_of(
+        index.groups['ALL_USERS_GROUP'], transitive=True)] == \
+        ['alice', 'bob']
+    assert index.parent_groups('DEV_LEADS') == ['DEV', 'ALL_USERS_GROUP']
+    assert index.subgroups('ALL_USERS_GROUP') == ['DEV', 'DEV_LEADS']
+    assert index.roles_of('alice') == [
+        ('PROJECT_DEVELOPER', 'p:App'), ('PROJECT_ADMIN', 'p:App'),
+        ('PROJECT_VIEWER', 'g')]
+    assert index.groups_of('nobody') == []
+
+    responses.reset()
+    responses.add(
+        responses.GET, tc.relative_url('app/rest/userGroups/'),
+        json={'count': 1, 'group': [_group('OPS', users=[(3, 'carol'),
+                                                         (2, 'bob')])]})
+    index.refresh()
+    assert [g.key for g in index.groups_of('bob')] == ['OPS']
+    assert 'DEV' not in index.groups
+    assert 'users=2 groups=1' in repr(index)
@@ -52,6 +52,7 @@ class User(object):
 class UserQuerySet(QuerySet):
     uri = '/app/rest/users/'
     _entity_factory = User
+    _list_key = 'user'
 
     def filter(self, id=None, username=None):
         if id is not None:
@@ -63,3 +64,11 @@ class UserQuerySet(QuerySet):
     def __iter__(self):
         return (self.__class__._entity_factory.from_dict(d, self)
                 for d in self._data()['user'])
+
+    def membership_index(self):
+        """
+        Load all user groups with their users, parent groups and roles into
+        a `MembershipIndex`
+        """
+        from .user_membership import MembershipIndex
+        return MembershipIndex(self.teamcity)
@@ -43,6 +43,7 @@ class UserGroup(object):
 class UserGroupQuerySet(QuerySet):
     uri = '/app/rest/userGroups/'
     _entity_factory = UserGroup
+    _list_key = 'group'
 
     def filter(self, key=None, name=None):
         if key is not None:
@@ -0,0 +1,142 @@
+import collections
+
+from .user import User
+from .user_group import UserGroup, UserGroupQuerySet
+
+MEMBERSHIP_FIELDS = ('count,nextHref,group(key,name,description,href,'
+                     'parent-groups(group(key)),'
+                     'users(user(id,username,name,email,href)),'
+                     'roles(role(roleId,scope)))')
+
+
+class MembershipIndex(object):
+    """
+    Who is in which user group, in both directions
+
+    All groups are loaded with their direct users, parent groups and roles
+    through one `fields=` projection. Membership through subgroups is
+    resolved locally: `groups_of(user, transitive=True)` includes the
+    parent groups of the user's groups, and
+    `users_of(group, transitive=True)` the users of its subgroups.
+
+    Users and groups can be given as objects, user ids or usernames, and
+    group keys.
+    """
+
+    def __init__(self, teamcity):
+        self.teamcity = teamcity
+        self.refresh()
+
+    def __repr__(self):
+        return '<%s.%s: users=%r groups=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            len(self.users),
+            len(self.groups))
+
+    def refresh(self):
+        """
+        Reload all groups and rebuild the index
+        """
+        query_set = UserGroupQuerySet(self.teamcity).fields(MEMBERSHIP_FIELDS)
+        self.users = collections.OrderedDict()
+        self.groups = collections.OrderedDict()
+        self._usernames = {}
+        self._user_groups = collections.defaultdict(list)
+        self._group_users = collections.defaultdict(list)
+        self._parents = {}
+        self._children = collections.defaultdict(list)
+        self._ancestors = {}
+
+        for page in query_set._pages():
+            for d in page.get('group', []):
+                group = UserGroup.from_dict(d, query_set)
+                self.groups[group.key] = group
+                self._parents[group.key] = [
+                    parent['key'] for parent in
+                    d.get('parent-groups', {}).get('group', [])]
+                for parent_key in self._parents[group.key]:
+                    self._children[parent_key].append(group.key)
+                for user_dict in d.get('users', {}).get('user', []):
+                    user = self.users.setdefault(
+                        user_dict['id'], User.from_dict(user_dict))
+                    self._usernames[user.username] = user.id
+                    self._user_groups[user.id].append(group.key)
+                    self._group_users[group.key].append(user.id)
+        return self
+
+    def _user_id(self, user):
+        user = getattr(user, 'id', user)
+        return self._usernames.get(user, user)
+
+    @staticmethod
+    def _group_key(group):
+        return getattr(group, 'key', group)
+
+    def parent_groups(self, group):
+        """
+        Keys of all groups `group` is nested in, directly or not
+        """
+        key = self._group_key(group)
+        if key not in self._ancestors:
+            ret = []
+            stack = list(reversed(self._parents.get(key, [])))
+            while stack:
+                parent_key = stack.pop()
+                if parent_key in ret:
+                    continue
+                ret.append(parent_key)
+                stack.extend(reversed(self._parents.get(parent_key, [])))
+            self._ancestors[key] = ret
+        return self._ancestors[key]
+
+    def subgroups(self, group):
+        """
+        Keys of all groups nested in `group`, directly or not
+        """
+        ret = []
+        stack = list(reversed(self._children.get(self._group_key(group), [])))
+        while stack:
+            child_key = stack.pop()
+            if child_key in ret:
+                continue
+            ret.append(child_key)
+            stack.extend(reversed(self._children.get(child_key, [])))
+        return ret
+
+    def groups_of(self, user, transitive=False):
+        """
+        `UserGroup`s `user` belongs to
+        """
+        keys = list(self._user_groups.get(self._user_id(user), []))
+        if transitive:
+            for key in list(keys):
+                keys.extend(k for k in self.parent_groups(key)
+                            if k not in keys)
+        return [self.groups[key] for key in keys if key in self.groups]
+
+    def users_of(self, group, transitive=False):
+        """
+        `User`s in `group`
+        """
+        keys = [self._group_key(group)]
+        if transitive:
+            keys += self.subgroups(group)
+        ret = collections.OrderedDict()
+        for key in keys:
+            for user_id in self._group_users.get(key, []):
+                ret[user_id] = self.users[user_id]
+        return list(ret.values())
+
+    def roles_of(self, user):
+        """
+        `(roleId, scope)` of the roles `user` gets through its groups
+        """
+        ret = []
+        for group in self.groups_of(user, transitive=True):
+            roles = group._data_dict.get('roles', {}).get('role', [])
+            for role in roles:
+                item = (role.get('roleId'), role.get('scope'))
+                if item not in ret:
+                    ret.append(item)
+        return ret
@@ -1,7 +1,41 @@
+import collections
+import re
+
+from six.moves.urllib.parse import urlsplit
+
 from .core.parameter import Parameter
 from .core.queryset import QuerySet
 from .core.utils import raise_on_status
 
+INVENTORY_FIELDS = ('count,nextHref,vcs-root(id,name,href,vcsName,project(id),'
+                    'properties(property(name,value)))')
+
+_SCP_LIKE_RE = re.compile(r'^(?:[^@/]+@)?(?P<host>[^:/]+):(?P<path>[^/].*)$')
+
+
+def normalize_repository_url(url):
+    """
+    Reduce a repository URL to a comparable `host/path` key
+
+    The scheme, credentials, port, a trailing `/` or `.git` and the case are
+    dropped, and scp-like addresses (`git@host:org/repo.git`) are
+    understood, so that all the ways of spelling one repository map to the
+    same key.
+    """
+    if not url:
+        return url
+    url = url.strip()
+    match = None if '://' in url else _SCP_LIKE_RE.match(url)
+    if match:
+        host, path = match.group('host'), match.group('path')
+    else:
+        parts = urlsplit(url if '://' in url else '//' + url)
+        host, path = parts.hostname or '', parts.path
+    path = path.strip('/')
+    if path.endswith('.git'):
+        path = path[:-len('.git')]
+    return ('%s/%s' % (host, path)).lower()
+
 
 class VCSRoot(object):
     def __init__(self, id,
@@ -15,6 +49,7 @@ class VCSRoot(object):
         if self.teamcity is None and self.query_set is not None:
             self.teamcity = self.query_set.teamcity
         self._data_dict = data_dict
+        self._properties = None
 
     @property
     def url(self):
@@ -49,6 +84,9 @@ class VCSRoot(object):
 
     @property
     def properties(self):
+        if self._properties is not None:
+            return self._properties
+
         d = {}
 
         for param in self._data_dict['properties']['property']:
@@ -57,17 +95,92 @@ class VCSRoot(object):
                 param_obj.value = param['value']
             d[param['name']] = param_obj
 
+        self._properties = d
         return d
 
+    @property
+    def vcs_name(self):
+        return self._data_dict.get('vcsName')
+
+    @property
+    def project_id(self):
+        return self._data_dict.get('project', {}).get('id')
+
+    @property
+    def normalized_url(self):
+        url = self.properties.get('url')
+        return normalize_repository_url(url.value if url else None)
+
     def delete(self):
         url = self.teamcity.base_base_url + self.href
         res = self.teamcity.session.delete(url)
         raise_on_status(res)
 
 
+class VCSRootInventory(object):
+    """
+    All VCS roots with their properties, indexed by normalized repository
+    URL (see `normalize_repository_url`), VCS type and project
+    """
+
+    def __init__(self, query_set):
+        self.query_set = query_set
+        self.teamcity = query_set.teamcity
+        self.refresh()
+
+    def __repr__(self):
+        return '<%s.%s: vcs_roots=%r>' % (
+            self.__module__,
+            self.__class__.__name__,
+            len(self.vcs_roots))
+
+    def __len__(self):
+        return len(self.vcs_roots)
+
+    def __iter__(self):
+        return iter(self.vcs_roots.values())
+
+    def __getitem__(self, id):
+        return self.vcs_roots[id]
+
+    def refresh(self):
+        """
+        Reload the VCS roots (one request per page) and rebuild the indexes
+        """
+        query_set = self.query_set._clone().fields(INVENTORY_FIELDS)
+        self.vcs_roots = collections.OrderedDict()
+        self._by_url = collections.defaultdict(list)
+        self._by_vcs_name = collections.defaultdict(list)
+        self._by_project = collections.defaultdict(list)
+        for page in query_set._pages():
+            for d in page.get('vcs-root', []):
+                vcs_root = VCSRoot.from_dict(d, query_set)
+                self.vcs_roots[vcs_root.id] = vcs_root
+                self._by_url[vcs_root.normalized_url].append(vcs_root)
+                self._by_vcs_name[vcs_root.vcs_name].append(vcs_root)
+                self._by_project[vcs_root.project_id].append(vcs_root)
+        return self
+
+    def by_url(self, url):
+        """
+        VCS roots pointing at the repository `url`, however it is spelled
+        """
+        return list(self._by_url.get(normalize_repository_url(url), ()))
+
+    def by_vcs_name(self, vcs_name):
+        """
+        VCS roots of a VCS type such as `jetbrains.git`
+        """
+        return list(self._by_vcs_name.get(vcs_name, ()))
+
+    def by_project(self, project_id):
+        return list(self._by_project.get(project_id, ()))
+
+
 class VCSRootQuerySet(QuerySet):
     uri = '/app/rest/vcs-roots/'
     _entity_factory = VCSRoot
+    _list_key = 'vcs-root'
 
     def filter(self, id=None, name=None):
         if id is not None:
@@ -80,6 +193,13 @@ class VCSRootQuerySet(QuerySet):
         return (self.__class__._entity_factory.from_dict(d, self)
                 for d in self._data()['vcs-root'])
 
+    def inventory(self):
+        """
+        Load the matching VCS roots with their properties into a
+        `VCSRootInventory`
+        """
+        return VCSRootInventory(self)
+
     def create(self,
                name, vcs_name, url, branch, branch_spec='',
                id=None,
@@ -10,15 +10,28 @@ RESTful api definition: http://${TeamCity}/guestAuth/app/rest/application.wadl
 """
 
 import collections
+import functools
 import inspect
 import os
 import re
 import textwrap
-import xml.etree.ElementTree as ET
+import threading
+import time
 
-from bs4 import BeautifulSoup
 import requests
 
+# ElementTree, BeautifulSoup, concurrent.futures and html.unescape are
+# imported where they are used, so that importing the client stays cheap.
+
+
+def _unescape(s):
+    try:
+        from html import unescape
+    except ImportError:  # Python 2
+        from HTMLParser import HTMLParser
+        unescape = HTMLParser().unescape
+    return unescape(s)
+
 
 class ConnectionError(Exception):
     def __init__(self, host, port, orig_exception=None):
@@ -54,40 +67,125 @@ def _build_url(*args, **kwargs):
     return '/'.join(parts)
 
 
+class TTLCache(object):
+    """
+    Thread-safe mapping holding at most `max_size` entries, each expiring
+    `ttl` seconds after it was stored. The oldest entries are dropped first.
+    """
+
+    def __init__(self, max_size=1024, ttl=60, clock=time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires <= self.clock():
+                del self._data[key]
+                return default
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (self.clock() + self.ttl, value)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_BUILD_TYPE_NAME_RE = re.compile(
+    r"""<(?P<tag>\w+)[^>]*\bclass=["'][^"']*\bbuildTypeName\b[^"']*["'][^>]*>""",
+    re.I)
+_BUILD_TEXT_RE = re.compile(
+    r"""<(?P<tag>\w+)[^>]*\bid=["'][^"']*build:\d+:text[^"']*["'][^>]*>""",
+    re.I)
+
+
+def _find_element_text(html_doc, start_tag_re):
+    """
+    Text of the first element whose start tag matches `start_tag_re`, found
+    without parsing the whole document. Returns None if there is no such
+    element.
+    """
+    match = start_tag_re.search(html_doc)
+    if not match:
+        return None
+    tag_re = re.compile(r'<(/?)%s\b[^>]*>' % re.escape(match.group('tag')),
+                        re.I)
+    depth = 1
+    for tag_match in tag_re.finditer(html_doc, match.end()):
+        if tag_match.group(1):
+            depth -= 1
+        elif not tag_match.group(0).endswith('/>'):
+            depth += 1
+        if depth == 0:
+            inner = html_doc[match.end():tag_match.start()]
+            return _unescape(_TAG_RE.sub('', inner))
+    return None
+
+
 def get_default_kwargs(func):
     """Returns a sequence of tuples (kwarg_name, default_value) for func"""
-    argspec = inspect.getargspec(func)
+    try:
+        argspec = inspect.getfullargspec(func)
+    except AttributeError:  # Python 2
+        argspec = inspect.getargspec(func)
     if not argspec.defaults:
         return []
-    return zip(argspec.args[-len(argspec.defaults):],
-               argspec.defaults)
+    return list(zip(argspec.args[-len(argspec.defaults):],
+                    argspec.defaults))
 
 
-def endpoint(url_pattern, method='GET'):
-    def wrapped_func(f):
-        def get_url(*args, **kwargs):
-            # kwargs with default values declared by function
-            all_kwargs = dict(get_default_kwargs(f))
+class _URLTemplate(object):
+    """
+    URL pattern of an endpoint, analyzed once when the endpoint is declared
+    """
+
+    def __init__(self, url_pattern, func):
+        self.url_pattern = url_pattern
+        self.groups = tuple(re.findall(r'{(\w+)}', url_pattern))
+        self.defaults = dict(get_default_kwargs(func))
+
+    def url(self, base_url, args, kwargs):
+        if not self.groups:
+            return '/'.join([str(base_url), self.url_pattern])
 
-            # kwargs for positional arguments passed by caller
-            groups = re.findall('{(\w+)}', url_pattern)
-            all_kwargs.update(dict(zip(groups, args)))
+        all_kwargs = dict(self.defaults)
+        all_kwargs.update(zip(self.groups, args))
+        all_kwargs.update(kwargs)
+        return '/'.join([str(base_url),
+                         self.url_pattern.format(*args, **all_kwargs)])
 
-            # kwargs for keyword arguments passed by caller
-            all_kwargs.update(kwargs)
 
-            return _build_url(url_pattern.format(*args, **all_kwargs),
-                              **all_kwargs)
+def endpoint(url_pattern, method='GET'):
+    def wrapped_func(f):
+        template = _URLTemplate(url_pattern, f)
 
+        @functools.wraps(f)
         def inner_func(self, *args, **kwargs):
-            kwargs['base_url'] = self.base_url
-            url = get_url(*args, **kwargs)
-            request = self._get_request('GET', url)
+            url = template.url(self.base_url, args, kwargs)
             return_type = kwargs.get('return_type', 'data')
             if return_type == 'url':
                 return url
             if return_type == 'request':
-                return request
+                return self._get_request('GET', url)
             if method == 'GET':
                 response = self._get(url)
             elif method == 'POST':
@@ -105,6 +203,7 @@ def endpoint(url_pattern, method='GET'):
                     return response.content
             except Exception as e:
                 return response.text
+        inner_func.url_template = template
         return inner_func
     return wrapped_func
 
@@ -125,7 +224,8 @@ class TeamCity:
     error_handler = None
 
     def __init__(self, username=None, password=None, server=None, port=None,
-                 session=None, protocol=None):
+                 session=None, protocol=None,
+                 agent_cache_size=1024, agent_cache_ttl=60):
         self.username = username or os.getenv('TEAMCITY_USER')
         self.password = password or os.getenv('TEAMCITY_PASSWORD')
         self.host = server or os.getenv('TEAMCITY_HOST')
@@ -144,7 +244,8 @@ class TeamCity:
                 self.protocol, self.host, self.port)
             self.auth = None
         self.session = session or requests.Session()
-        self._agent_cache = {}
+        self._agent_cache = TTLCache(max_size=agent_cache_size,
+                                     ttl=agent_cache_ttl)
 
     def get_url(self, path):
         return '/'.join([self.base_base_url, path])
@@ -240,6 +341,64 @@ class TeamCity:
                 start=start, count=count,
                 **kwargs)
 
+    def iter_builds(self, page_size=100, prefetch=True, **filters):
+        """
+        Generator of build dicts matching `filters` (the `get_builds`
+        arguments), newest first, fetched `page_size` at a time.
+
+        Pages after the first are selected with `untilBuild` on the oldest
+        build id seen so far rather than with `start` offsets, so builds
+        that finish during the scan neither shift the pages nor show up
+        twice. With `prefetch`, the next page is requested in the
+        background while the current one is being consumed.
+        """
+        for name in ('start', 'count', 'return_type'):
+            filters.pop(name, None)
+
+        executor = None
+        if prefetch:
+            from concurrent import futures
+            executor = futures.ThreadPoolExecutor(max_workers=1)
+
+        def page_count(until_id):
+            # untilBuild includes the build itself, which is asked for on
+            # top of page_size older builds
+            return page_size if until_id is None else page_size + 1
+
+        def fetch(until_id):
+            page_filters = dict(filters)
+            if until_id is not None:
+                page_filters['until_build'] = '(id:%d)' % until_id
+            return self.get_builds(start=0, count=page_count(until_id),
+                                   **page_filters)
+
+        try:
+            page = fetch(None)
+            until_id = None
+            while True:
+                builds = [build for build in page.get('build', [])
+                          if until_id is None or build['id'] < until_id]
+                if not builds:
+                    return
+                last_page = len(page.get('build', [])) < page_count(until_id)
+                until_id = min(build['id'] for build in builds)
+                next_page = None
+                if not last_page:
+                    if executor is not None:
+                        next_page = executor.submit(fetch, until_id)
+                    else:
+                        next_page = fetch(until_id)
+                for build in builds:
+                    yield build
+                if last_page:
+                    return
+                if executor is not None:
+                    next_page = next_page.result()
+                page = next_page
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
     def _get_locator(self, **kwargs):
         if not kwargs:
             return ''
@@ -394,6 +553,7 @@ class TeamCity:
             headers={'Content-Type': 'application/xml'},
             data=data)
 
+        import xml.etree.ElementTree as ET
         root = ET.fromstring(response.text)
         new_build_attributes = root.findall('.')[0].attrib
         return new_build_attributes
@@ -479,13 +639,19 @@ class TeamCity:
         :param agent_name: the agent name to get
         """
 
-    def get_agent_statistics(self):
+    def get_agent_statistics(self, workers=8):
         counters = collections.Counter()
         counters['by_build_type'] = collections.Counter()
 
-        for agent in self.get_agents()['agent']:
+        from concurrent import futures
+
+        agent_ids = [agent['id'] for agent in self.get_agents()['agent']]
+        with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            build_types = list(executor.map(self.get_agent_build_type,
+                                            agent_ids))
+
+        for build_text in build_types:
             counters['num_total'] += 1
-            build_text = self.get_agent_build_type(agent['id'])
             counters['by_build_type'][build_text] += 1
             if 'Idle' in build_text:
                 counters['num_idle'] += 1
@@ -514,6 +680,14 @@ class TeamCity:
         if 'Running build' not in html_doc:
             build_type = build_text = 'Idle'
         else:
+            build_type = _find_element_text(html_doc, _BUILD_TYPE_NAME_RE)
+            build_text = _find_element_text(html_doc, _BUILD_TEXT_RE)
+
+        if build_type is not None and build_text is not None:
+            build_type = build_type.replace('\n', '').replace('\r', '')
+        else:
+            # Unexpected markup; fall back to parsing the whole page
+            from bs4 import BeautifulSoup
             soup = BeautifulSoup(html_doc)
             build_type_node = soup.find(class_='buildTypeName')
             build_text_node = soup.find(id=re.compile('build:(?P<build_type>\d+):text'))
@@ -1,4 +1,5 @@
 import json
+import time
 
 import mock
 import pytest
@@ -677,3 +678,160 @@ def test_get_test():
         test_locator='12345', return_type='request')
     assert req.method == 'GET'
     assert req.url == expected_url
+
+
+AGENT_DETAILS_RUNNING = """
+<html><body>
+<div class="agentDetails">
+  <h2>Running build</h2>
+  <span class="buildTypeName">dummysvc :: <b>py27</b>
+  </span>
+  <div id="build:1234:text">Tests passed: 42 &amp; counting</div>
+</div>
+</body></html>
+"""
+
+AGENT_DETAILS_IDLE = "<html><body><h2>Idle</h2></body></html>"
+
+
+def make_html_response(text):
+    response = requests.Response()
+    response.headers['Content-Type'] = 'text/html'
+    response.status_code = 200
+    response._content = text.encode('utf-8')
+    response.encoding = 'utf-8'
+    return response
+
+
+def test_find_element_text():
+    from pyteamcity.legacy.legacy import (
+        _find_element_text, _BUILD_TEXT_RE, _BUILD_TYPE_NAME_RE)
+
+    assert _find_element_text(
+        AGENT_DETAILS_RUNNING, _BUILD_TYPE_NAME_RE
+    ).strip() == 'dummysvc :: py27'
+    assert _find_element_text(
+        AGENT_DETAILS_RUNNING, _BUILD_TEXT_RE) == 'Tests passed: 42 & counting'
+    assert _find_element_text(AGENT_DETAILS_IDLE, _BUILD_TEXT_RE) is None
+
+
+def test_get_agent_statistics_mock_send():
+    tc = TeamCity(user, password, host, port)
+    agents = {'agent': [{'id': 1}, {'id': 2}, {'id': 3}]}
+
+    def send(request, **kwargs):
+        if 'id=2' in request.url:
+            return make_html_response(AGENT_DETAILS_IDLE)
+        return make_html_response(AGENT_DETAILS_RUNNING)
+
+    with mock.patch.object(tc, 'get_agents', return_value=agents), \
+            mock.patch.object(tc.session, 'send', side_effect=send) as m:
+        counters = tc.get_agent_statistics(workers=3)
+        assert counters['num_total'] == 3
+        assert counters['num_busy'] == 2
+        assert counters['num_idle'] == 1
+        assert counters['by_build_type']['Idle'] == 1
+        assert tc.get_agent_build_text(1) == 'Tests passed: 42 & counting'
+        assert m.call_count == 3
+
+        # Cached entries expire
+        tc._agent_cache.clock = lambda: time.time() + 3600
+        tc.get_agent_build_type(1)
+        assert m.call_count == 4
+
+
+def test_ttl_cache():
+    from pyteamcity.legacy.legacy import TTLCache
+
+    now = [0]
+    cache = TTLCache(max_size=2, ttl=10, clock=lambda: now[0])
+    cache['a'] = 1
+    cache['b'] = 2
+    cache['c'] = 3
+    assert len(cache) == 2
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+    assert 'c' in cache
+    now[0] = 10
+    assert cache.get('b') is None
+    assert cache.get('c', 'missing') == 'missing'
+    cache['d'] = 4
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_endpoint_prepares_one_request_per_call():
+    expected_url = ('http://teamcity_host:4567/httpAuth/app/rest'
+                    '/builds/id:42')
+    with mock.patch.object(tc.session, 'send') as mock_send, \
+            mock.patch.object(tc, '_get_request',
+                              wraps=tc._get_request) as mock_get_request, \
+            mock.patch('inspect.getfullargspec') as mock_getfullargspec:
+        mock_send.return_value = make_response(200, {'id': 42})
+        assert tc.get_build_by_build_id(42) == {'id': 42}
+        mock_get_request.assert_called_once_with('GET', expected_url)
+        assert not mock_getfullargspec.called
+
+
+def test_endpoint_url_template():
+    template = TeamCity._get_all_builds.url_template
+    assert template.groups == ('start', 'count')
+    assert template.defaults == {'start': 0, 'count': 100}
+    assert TeamCity._get_all_builds.__name__ == '_get_all_builds'
+
+
+def _fake_build_server(build_ids):
+    from six.moves.urllib.parse import parse_qs, urlparse
+
+    def send(request):
+        query = parse_qs(urlparse(request.url).query)
+        count = int(query['count'][0])
+        locator = dict(
+            dim.split(':', 1)
+            for dim in query.get('locator', [''])[0].split(',') if dim)
+        ids = sorted(build_ids, reverse=True)
+        if 'untilBuild' in locator:
+            until_id = int(locator['untilBuild'].strip('()').split(':')[1])
+            ids = [build_id for build_id in ids if build_id <= until_id]
+        if 'status' in locator:
+            ids = [build_id for build_id in ids if build_id % 2]
+        builds = [{'id': build_id} for build_id in ids[:count]]
+        return make_response(200, {'count': len(builds), 'build': builds})
+    return send
+
+
+@pytest.mark.parametrize('prefetch', [True, False])
+def test_iter_builds(prefetch):
+    build_ids = list(range(1, 251))
+    send = _fake_build_server(build_ids)
+    with mock.patch.object(tc.session, 'send', side_effect=send) as m:
+        builds = tc.iter_builds(page_size=100, prefetch=prefetch)
+        first = next(builds)
+        # A build finishing mid-scan must not shift the following pages
+        build_ids.append(251)
+        ids = [first['id']] + [build['id'] for build in builds]
+    assert ids == list(range(250, 0, -1))
+    assert m.call_count == 3
+    assert 'untilBuild:(id:151)' in m.call_args_list[1][0][0].url
+
+
+@pytest.mark.parametrize('page_size', [1, 2, 3, 5])
+def test_iter_builds_small_pages(page_size):
+    send = _fake_build_server(list(range(1, 6)))
+    with mock.patch.object(tc.session, 'send', side_effect=send) as m:
+        ids = [build['id'] for build in tc.iter_builds(page_size=page_size)]
+    assert ids == [5, 4, 3, 2, 1]
+    # Every page but the last brings page_size new builds
+    assert m.call_count == 5 // page_size + 1
+
+
+def test_iter_builds_filters():
+    send = _fake_build_server(list(range(1, 11)))
+    with mock.patch.object(tc.session, 'send', side_effect=send) as m:
+        ids = [build['id']
+               for build in tc.iter_builds(page_size=3, status='SUCCESS',
+                                           start=5)]
+    assert ids == [9, 7, 5, 3, 1]
+    for call in m.call_args_list:
+        assert 'status:SUCCESS' in call[0][0].url
+        assert 'start=0' in call[0][0].url
@@ -29,12 +29,15 @@ setup(
     zip_safe=False,
     install_requires=[
         'beautifulsoup4',
+        'futures; python_version < "3.0"',
         'python-dateutil',
         'pytz',
         'requests',
         'six',
     ],
     extras_require={
+        'numpy': ['numpy'],
+        'parquet': ['pyarrow'],
         'tests': [
             'mock >= 2.0.0',
             'pytest >= 3.0.2',